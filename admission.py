@@ -0,0 +1,200 @@
+"""
+Admission control for report requests, one gate per format.
+
+A gate lets `limit` requests run at once; up to `queue_size` more wait in
+arrival order for at most `max_wait` seconds. Anything beyond that is refused
+straight away with AdmissionRejected, which the app turns into 503 with a
+Retry-After estimated from how long recent requests held their slot. PDF
+requests are expensive (LibreOffice, up to PDF_TIMEOUT seconds each), so
+their gate is small; DOCX has its own, larger one. Limits are per process.
+
+Slots are taken around the actual render work in report_pipeline, so
+requests served from the rendered-report cache or joining an identical
+in-flight render do not use one. Background and streaming work (jobs, date
+ranges, exports) is checked once at the door with check() and then waits
+for its slots in a queue of its own (block=True): up to `job_queue_size`
+waiters for at most `job_max_wait` seconds each, so a stuck conversion
+cannot pile up threads without limit.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+WAIT_SECONDS = metrics.histogram(
+    "admission_wait_seconds", "Time report requests waited for an admission slot", ["format"]
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a gate is full; retry_after is the suggested wait in seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    """
+    name            format the gate guards (label in stats and metrics)
+    limit           requests running at once
+    queue_size      requests allowed to wait for a slot
+    max_wait        seconds a request may wait before it is refused
+    job_queue_size  background (block=True) callers allowed to wait
+    job_max_wait    seconds a background caller may wait
+    """
+
+    def __init__(self, name, limit, queue_size, max_wait, job_queue_size=64, job_max_wait=600):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.job_queue_size = job_queue_size
+        self.job_max_wait = job_max_wait
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._job_waiting = 0
+        # Rata-rata bergerak lama slot dipakai, dasar perkiraan Retry-After
+        self._hold_seconds = None
+        self._stats = {"admitted": 0, "waited": 0, "queue_full": 0, "timeout": 0}
+
+    def retry_after(self):
+        """Seconds until a slot is likely free for a request arriving now"""
+        with self._cond:
+            return self._retry_after_locked()
+
+    def _retry_after_locked(self):
+        hold = self._hold_seconds if self._hold_seconds is not None else self.max_wait
+        return min(600, max(1, math.ceil(hold * (self._waiting + 1) / self.limit)))
+
+    def _reject(self, reason):
+        self._stats[reason] += 1
+        logger.warning(f"Rejected {self.name} request ({reason}): {self._active} running, {self._waiting} waiting")
+        return AdmissionRejected(
+            f"Server sedang sibuk membuat laporan {self.name.upper()}. Coba lagi sebentar lagi.",
+            self._retry_after_locked()
+        )
+
+    def check(self):
+        """Raise AdmissionRejected when the background wait queue is already full"""
+        with self._cond:
+            if self._active >= self.limit and self._job_waiting >= self.job_queue_size:
+                raise self._reject("queue_full")
+
+    @contextmanager
+    def admit(self, block=False):
+        """
+        Hold one slot for the duration of the block. Raise AdmissionRejected when
+        none is free in time; block=True waits in the background queue
+        (job_queue_size, job_max_wait) instead of the request queue.
+        """
+        started = time.monotonic()
+        with self._cond:
+            # Yang datang belakangan tidak boleh menyalip antrean
+            if self._active >= self.limit or self._waiting:
+                if block:
+                    if self._job_waiting >= self.job_queue_size:
+                        raise self._reject("queue_full")
+                elif self._waiting - self._job_waiting >= self.queue_size:
+                    raise self._reject("queue_full")
+                self._waiting += 1
+                self._job_waiting += block
+                try:
+                    deadline = started + (self.job_max_wait if block else self.max_wait)
+                    while self._active >= self.limit:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise self._reject("timeout")
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+                    self._job_waiting -= block
+                self._stats["waited"] += 1
+            self._active += 1
+            self._stats["admitted"] += 1
+        waited = time.monotonic() - started
+        WAIT_SECONDS.observe(waited, self.name)
+
+        admitted = time.monotonic()
+        try:
+            yield
+        finally:
+            held = time.monotonic() - admitted
+            with self._cond:
+                self._active -= 1
+                self._hold_seconds = held if self._hold_seconds is None else 0.8 * self._hold_seconds + 0.2 * held
+                self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "active": self._active,
+                "waiting": self._waiting,
+                "job_waiting": self._job_waiting,
+                "limit": self.limit,
+                "queue_size": self.queue_size,
+                "max_wait": self.max_wait,
+                "job_queue_size": self.job_queue_size,
+                "job_max_wait": self.job_max_wait,
+                "hold_seconds": round(self._hold_seconds, 2) if self._hold_seconds is not None else None,
+            })
+        return stats
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+
+def get_gate(format_type):
+    """Process-wide gate for a format (anything but pdf shares the docx gate), sized from ADMISSION_*"""
+    name = 'pdf' if format_type == 'pdf' else 'docx'
+    with _gates_lock:
+        gate = _gates.get(name)
+        if gate is None:
+            if name == 'pdf':
+                # Satu request per worker LibreOffice, sisanya menunggu sebentar
+                gate = AdmissionGate(
+                    'pdf',
+                    limit=_env_int("ADMISSION_PDF_LIMIT", os.environ.get("PDF_WORKERS", 2)),
+                    queue_size=_env_int("ADMISSION_PDF_QUEUE", 4),
+                    max_wait=float(os.environ.get("ADMISSION_PDF_MAX_WAIT", 10)),
+                    job_queue_size=_env_int("ADMISSION_PDF_JOB_QUEUE", 32),
+                    job_max_wait=float(os.environ.get("ADMISSION_PDF_JOB_MAX_WAIT", 600)),
+                )
+            else:
+                gate = AdmissionGate(
+                    'docx',
+                    limit=_env_int("ADMISSION_DOCX_LIMIT", 8),
+                    queue_size=_env_int("ADMISSION_DOCX_QUEUE", 16),
+                    max_wait=float(os.environ.get("ADMISSION_DOCX_MAX_WAIT", 10)),
+                    job_queue_size=_env_int("ADMISSION_DOCX_JOB_QUEUE", 64),
+                    job_max_wait=float(os.environ.get("ADMISSION_DOCX_JOB_MAX_WAIT", 300)),
+                )
+            _gates[name] = gate
+        return gate
+
+
+def admit(format_type, block=False):
+    """Context manager holding a slot of the format's gate"""
+    return get_gate(format_type).admit(block)
+
+
+def check(format_type):
+    """Fast-fail (AdmissionRejected) when the format's background wait queue is already full"""
+    get_gate(format_type).check()
+
+
+def admission_stats():
+    return {name: get_gate(name).stats() for name in ('docx', 'pdf')}
@@ -1,40 +1,42 @@
-from flask import Flask, render_template, request, send_file, Response, jsonify
-from docx import Document
+from flask import Blueprint, Flask, render_template, request, send_file, Response, jsonify, url_for, g
 from datetime import datetime
-from docx.oxml.ns import qn
-from docx.oxml import OxmlElement
-import pandas as pd
-import requests
 import io
-import base64
 import os
 import sys
 import logging
-from werkzeug.utils import secure_filename
-import tempfile
 import subprocess
 import traceback
+import threading
+import time
 
-# Configure logging - Console only to avoid feedback loops
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-        # Removed FileHandler to avoid watchdog feedback loops
-    ]
+import metrics
+from admission import AdmissionRejected, admission_stats, check, get_gate
+from pdf_pool import LIBREOFFICE_PATH, PoolBusyError, pool_stats
+from precompute import start_precomputer
+from report_cache import rendered_reports
+from report_jobs import JobManager, JobQueueFull, JobStore, default_job_dir
+from report_pipeline import (
+    TEMPLATE_PATH, ReportError, build_report_from_params, coalescing_stats, iter_day_files,
+    parse_filter_date, parse_iso_week, pdf_backend_stats, prepare_range, resolve_tenant
 )
-logger = logging.getLogger(__name__)
+from sheet_data import parsed_sheets
+from sheet_source import sheet_queries, source_stats
+from sheet_store import store_stats
+from tenants import ALL_TENANTS, get_registry
+from zip_stream import stream_zip
 
-app = Flask(__name__)
+logger = logging.getLogger(__name__)
 
-# Create templates directory if it doesn't exist
-os.makedirs('templates', exist_ok=True)
+def configure_logging(level=None):
+    """Console logging for the app process; level from LOG_LEVEL (default INFO)"""
+    # Console only to avoid feedback loops (FileHandler memicu watchdog reload)
+    logging.basicConfig(
+        level=level or os.environ.get('LOG_LEVEL', 'INFO').upper(),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
 
-# Create a simple index.html file if it doesn't exist
-if not os.path.exists('templates/index.html'):
-    with open('templates/index.html', 'w') as f:
-        f.write('''
+DEFAULT_INDEX_HTML = '''
         <!DOCTYPE html>
         <html>
         <head>
@@ -74,344 +76,69 @@ if not os.path.exists('templates/index.html'):
             </div>
         </body>
         </html>
-        ''')
-
-# Fungsi untuk menyalin pemformatan warna sel
-def copy_cell_formatting(src_cell, dest_cell):
-    try:
-        tcPr = src_cell._tc.get_or_add_tcPr()
-        shd = tcPr.first_child_found_in("w:shd")
-        if shd is not None:
-            new_tcPr = dest_cell._tc.get_or_add_tcPr()
-            new_shd = OxmlElement('w:shd')
-            new_shd.set(qn('w:fill'), shd.get(qn('w:fill')))
-            new_shd.set(qn('w:val'), shd.get(qn('w:val')))
-            new_tcPr.append(new_shd)
-    except Exception as e:
-        logger.warning(f"Error copying cell formatting: {str(e)}")
-
-# Fungsi untuk menambahkan garis hitam pada sel
-def add_black_borders(cell):
-    try:
-        tcPr = cell._tc.get_or_add_tcPr()
-        tcBorders = OxmlElement('w:tcBorders')
-        for border_name in ['top', 'left', 'bottom', 'right']:
-            border = OxmlElement(f'w:{border_name}')
-            border.set(qn('w:val'), 'single')
-            border.set(qn('w:sz'), '4')
-            border.set(qn('w:space'), '0')
-            border.set(qn('w:color'), '000000')
-            tcBorders.append(border)
-        tcPr.append(tcBorders)
-    except Exception as e:
-        logger.warning(f"Error adding borders: {str(e)}")
+        '''
 
-# Fungsi untuk mengubah format tanggal
-def format_tanggal(tanggal_str, bulan_dict):
-    if isinstance(tanggal_str, str) and tanggal_str.strip():
-        try:
-            # Check for "NaT" string or empty string
-            if tanggal_str == "NaT" or tanggal_str == "":
-                return ""
-                
-            dt = datetime.strptime(tanggal_str.split()[0], "%Y-%m-%d")
-            hari = dt.strftime("%d")
-            bulan = bulan_dict[dt.strftime("%B")]
-            tahun = dt.strftime("%Y")
-            return f"{hari} {bulan} {tahun}"
-        except ValueError as e:
-            logger.warning(f"Error formatting date {tanggal_str}: {str(e)}")
-            return ""
-    return ""
-
-# Dictionary untuk hari dan bulan dalam bahasa Indonesia
-hari = {
-    'Monday': 'Senin', 'Tuesday': 'Selasa', 'Wednesday': 'Rabu', 'Thursday': 'Kamis',
-    'Friday': 'Jumat', 'Saturday': 'Sabtu', 'Sunday': 'Minggu'
-}
-bulan = {
-    'January': 'Januari', 'February': 'Februari', 'March': 'Maret', 'April': 'April',
-    'May': 'Mei', 'June': 'Juni', 'July': 'Juli', 'August': 'Agustus',
-    'September': 'September', 'October': 'Oktober', 'November': 'November', 'December': 'Desember'
-}
-
-def generate_docx_report(filter_date):
-    logger.info(f"Generating report for date: {filter_date}")
-    
-    # Ambil tanggal dari parameter
-    sekarang = filter_date if filter_date else datetime.now()
-    nama_hari = hari[sekarang.strftime("%A")]
-    nama_bulan = bulan[sekarang.strftime("%B")]
-    tanggal = sekarang.strftime("%d")
-    tahun = sekarang.strftime("%Y")
-    waktu_laporan = f"{nama_hari}, {tanggal} {nama_bulan} {tahun}"
-    
-    # Format untuk filter
-    filter_tanggal = sekarang.strftime("%Y-%m-%d")
-    
-    # Nama file untuk download
-    file_name = f"{tanggal} {nama_bulan} {tahun}_Daily Report Wildan Dzaky Ramadhani.docx"
-    
-    # URL ekspor Google Sheets untuk file Excel
-    file_id = "1wJlAUerJDxpaBRxMOLxOmcSzG5LdwUz4K8HJ3uc1v0s"
-    export_url = f"https://docs.google.com/spreadsheets/d/{file_id}/export?format=xlsx"
+def ensure_index_template():
+    """Write a simple templates/index.html if the page template is missing"""
+    os.makedirs('templates', exist_ok=True)
+    if not os.path.exists('templates/index.html'):
+        with open('templates/index.html', 'w') as f:
+            f.write(DEFAULT_INDEX_HTML)
 
-    # Unduh file Excel langsung dari Google Sheets
-    try:
-        logger.info(f"Downloading spreadsheet from Google Sheets: {file_id}")
-        response = requests.get(export_url)
-        if response.status_code != 200:
-            error_msg = f"Gagal mengunduh file: status code {response.status_code}"
-            logger.error(error_msg)
-            return {"error": error_msg}, None
-        excel_data = io.BytesIO(response.content)
-        logger.info("Spreadsheet downloaded successfully")
-        
-        logger.info("Reading Excel data")
-        df = pd.read_excel(excel_data, sheet_name="New Format")
-        logger.info(f"Excel data read successfully, shape: {df.shape}")
-    except Exception as e:
-        error_msg = f"Gagal mengunduh file: {str(e)}"
-        logger.error(error_msg)
-        logger.error(traceback.format_exc())
-        return {"error": error_msg}, None
-
-    # Filter data berdasarkan tanggal
-    logger.info(f"Filtering data for date: {filter_tanggal}")
-    df_filtered = df[df['Tanggal'] == filter_tanggal].fillna('')
-    logger.info(f"Filtered data shape: {df_filtered.shape}")
-
-    if df_filtered.empty:
-        error_msg = f"Tidak ada data untuk tanggal {filter_tanggal}"
-        logger.warning(error_msg)
-        return {"error": error_msg}, None
-
-    # Konversi data filtered ke format yang sesuai untuk tabel
-    data_baru = [
-        (
-            idx + 1,
-            row['Pekerjaan'] if not pd.isna(row['Pekerjaan']) else "",
-            format_tanggal(str(row['Batas Waktu']), bulan),
-            row['Status'] if not pd.isna(row['Status']) else "",
-            format_tanggal(str(row['Diselesaikan Pada']), bulan)
-        )
-        for idx, (_, row) in enumerate(df_filtered.iterrows())
-    ]
-
-    # Ambil semua keterangan dari data yang difilter dan gabungkan
-    keterangan_list = [str(row['Keterangan']).strip() for _, row in df_filtered.iterrows() if str(row['Keterangan']).strip()]
-    keterangan = "\n".join(keterangan_list) if keterangan_list else "-"
-
-    # Cek apakah template dokumen ada
-    template_path = "Weekly Daily Report Wildan Dzaky Ramadhani.docx"
-    
-    # If template doesn't exist, create a simple one
-    if not os.path.exists(template_path):
-        logger.warning(f"Template file '{template_path}' not found. Creating a simple template.")
-        doc = Document()
-        doc.add_heading('Daily Report', 0)
-        doc.add_paragraph(f"Waktu Laporan\t: {waktu_laporan}")
-        
-        # Add table with headers
-        table = doc.add_table(rows=1, cols=5)
-        table.style = 'Table Grid'
-        header_cells = table.rows[0].cells
-        headers = ["No", "Pekerjaan", "Batas Waktu", "Status", "Diselesaikan Pada"]
-        for i, header in enumerate(headers):
-            header_cells[i].text = header
-    else:
-        try:
-            logger.info(f"Opening template file: {template_path}")
-            doc = Document(template_path)
-            logger.info("Template file opened successfully")
-        except Exception as e:
-            error_msg = f"Gagal membuka template dokumen: {str(e)}"
-            logger.error(error_msg)
-            logger.error(traceback.format_exc())
-            return {"error": error_msg}, None
+# Route didaftarkan ke aplikasi oleh create_app()
+bp = Blueprint('reports', __name__)
 
-    # Update Waktu Laporan saja
-    for para in doc.paragraphs:
-        if "Waktu Laporan" in para.text:
-            para.text = f"Waktu Laporan\t: {waktu_laporan}"
-            break
-    else:
-        # If not found, add it
-        doc.add_paragraph(f"Waktu Laporan\t: {waktu_laporan}")
-
-    # Hapus paragraf Catatan jika ada
-    paragraphs_to_remove = []
-    for i, para in enumerate(doc.paragraphs):
-        if "Catatan" in para.text:
-            paragraphs_to_remove.append(para)
-    
-    for para in paragraphs_to_remove:
-        try:
-            doc.element.body.remove(para._element)
-        except Exception as e:
-            logger.warning(f"Error removing paragraph: {str(e)}")
-            
-    # Check if table exists, if not create one
-    if not doc.tables:
-        logger.warning("No table found in template, creating one")
-        table = doc.add_table(rows=1, cols=5)
-        table.style = 'Table Grid'
-        header_cells = table.rows[0].cells
-        headers = ["No", "Pekerjaan", "Batas Waktu", "Status", "Diselesaikan Pada"]
-        for i, header in enumerate(headers):
-            header_cells[i].text = header
-    else:
-        table = doc.tables[0]
-            
-    # Pertahankan baris header, hapus semua baris data (baris ke-2 dan seterusnya)
-    while len(table.rows) > 1:
-        try:
-            tr = table.rows[1]._tr
-            table._tbl.remove(tr)
-        except Exception as e:
-            logger.warning(f"Error removing table row: {str(e)}")
-            break
-            
-    # Tambahkan data baru ke tabel yang ada
-    logger.info(f"Adding {len(data_baru)} rows to table")
-    for no, pekerjaan, batas_waktu, status, selesai_pada in data_baru:
-        try:
-            row_cells = table.add_row().cells
-            row_cells[0].text = str(no)
-            row_cells[1].text = pekerjaan
-            row_cells[2].text = batas_waktu
-            row_cells[3].text = status
-            row_cells[4].text = selesai_pada
-            
-            # Tambahkan garis hitam
-            for i in range(len(row_cells)):
-                add_black_borders(row_cells[i])
-        except Exception as e:
-            logger.error(f"Error adding row to table: {str(e)}")
-            logger.error(traceback.format_exc())
-
-    # Tambahkan Keterangan setelah tabel
-    doc.add_paragraph(f"{keterangan}")
-
-    # Simpan ke BytesIO
-    logger.info("Saving document to memory")
-    docx_io = io.BytesIO()
-    doc.save(docx_io)
-    docx_io.seek(0)
-    logger.info("Document saved successfully")
-    
-    return {"success": True, "file_name": file_name}, docx_io
-
-def convert_to_pdf(docx_content, base_filename):
-    """
-    Convert DOCX content to PDF with improved error handling
-    """
-    logger.info("Starting PDF conversion")
-    
-    # Create temporary files with unique names to avoid conflicts
-    temp_dir = tempfile.mkdtemp()
-    temp_docx_path = os.path.join(temp_dir, f"{base_filename}.docx")
-    
-    with open(temp_docx_path, 'wb') as f:
-        f.write(docx_content)
-    
-    logger.info(f"Created temporary DOCX file: {temp_docx_path}")
-    
-    # Define output PDF path
-    temp_pdf_path = os.path.join(temp_dir, f"{base_filename}.pdf")
-    
-    try:
-        # Set environment variables for LibreOffice
-        env = os.environ.copy()
-        if 'HOME' not in env:
-            env['HOME'] = '/root'
-        
-        # Use absolute path to LibreOffice
-        libreoffice_path = '/usr/bin/libreoffice'
-        
-        logger.info(f"Running LibreOffice conversion: {temp_docx_path} -> {temp_pdf_path}")
-        
-        # Execute the command with detailed output capture
-        process = subprocess.run(
-            [
-                libreoffice_path,
-                '--headless',
-                '--convert-to', 'pdf',
-                '--outdir', temp_dir,
-                temp_docx_path
-            ],
-            env=env,
-            capture_output=True,
-            text=True,
-            timeout=180  # 3 minutes timeout
-        )
-        
-        logger.info(f"Command output: {process.stdout}")
-        if process.stderr:
-            logger.info(f"Command stderr: {process.stderr}")
-        
-        # Verify the PDF was created
-        if not os.path.exists(temp_pdf_path):
-            raise Exception("PDF file was not created after conversion")
-        
-        # Read the PDF content
-        with open(temp_pdf_path, 'rb') as f:
-            pdf_content = io.BytesIO(f.read())
-            pdf_content.seek(0)
-        
-        return pdf_content
-        
-    except subprocess.TimeoutExpired:
-        logger.error("LibreOffice conversion timed out")
-        raise Exception("PDF conversion timed out. Try downloading as DOCX instead.")
-        
-    except subprocess.CalledProcessError as e:
-        logger.error(f"LibreOffice conversion failed with exit code {e.returncode}")
-        logger.error(f"STDOUT: {e.stdout}")
-        logger.error(f"STDERR: {e.stderr}")
-        raise Exception(f"PDF conversion failed with exit code {e.returncode}. Try downloading as DOCX instead.")
-        
-    except Exception as e:
-        logger.error(f"PDF conversion failed: {str(e)}")
-        logger.error(traceback.format_exc())
-        raise
-        
-    finally:
-        # Clean up temporary files
-        try:
-            import shutil
-            shutil.rmtree(temp_dir)
-            logger.info(f"Cleaned up temporary directory: {temp_dir}")
-        except Exception as e:
-            logger.warning(f"Error cleaning up temporary files: {str(e)}")
-
-@app.route('/status')
+@bp.route('/status')
 def status():
     """Simple status endpoint to check if app is running"""
     libreoffice_info = check_libreoffice_availability()
     return jsonify({
         "status": "running",
-        "template_exists": os.path.exists("Weekly Daily Report Wildan Dzaky Ramadhani.docx"),
+        "template_exists": os.path.exists(TEMPLATE_PATH),
         "templates_dir_exists": os.path.exists("templates"),
         "index_html_exists": os.path.exists("templates/index.html"),
-        "libreoffice": libreoffice_info
+        "libreoffice": libreoffice_info,
+        "sheet_cache": source_stats(),
+        "sheet_query": sheet_queries.stats(),
+        "parsed_sheet_cache": parsed_sheets.stats(),
+        "sheet_store": store_stats(),
+        "pdf_pool": pool_stats(),
+        "pdf_backend": pdf_backend_stats(),
+        "report_jobs": report_jobs.stats(),
+        "rendered_cache": rendered_reports.stats(),
+        "report_coalescing": coalescing_stats(),
+        "admission": admission_stats(),
+        "precompute": precomputer.stats() if precomputer else {"enabled": False},
+        "tenants": [tenant.id for tenant in get_registry().all()]
+    })
+
+@bp.route('/tenants')
+def tenants():
+    """Tenants this process renders reports for"""
+    registry = get_registry()
+    return jsonify({
+        "default": registry.default_id,
+        "tenants": [
+            {"id": tenant.id, "name": tenant.name, "sheet_name": tenant.sheet_name, "template": tenant.template_path}
+            for tenant in registry.all()
+        ]
     })
 
 def check_libreoffice_availability():
     """Check if LibreOffice is available and working"""
     try:
-        result = subprocess.run(['/usr/bin/libreoffice', '--version'], 
+        result = subprocess.run([LIBREOFFICE_PATH, '--version'], 
                                capture_output=True, 
                                text=True, 
                                timeout=10)
         if result.returncode == 0:
-            return {"available": True, "path": "/usr/bin/libreoffice", "version": result.stdout.strip()}
+            return {"available": True, "path": LIBREOFFICE_PATH, "version": result.stdout.strip()}
     except Exception as e:
         return {"available": False, "error": str(e)}
     
     return {"available": False}
 
-@app.route('/debug')
+@bp.route('/debug')
 def debug():
     """Endpoint to get debug information"""
     import platform
@@ -429,75 +156,282 @@ def debug():
     
     return jsonify(debug_info)
 
-@app.route('/', methods=['GET', 'POST'])
+REPORT_PARAMS = ('filter_date', 'format_type', 'start_date', 'end_date', 'iso_week', 'range_mode', 'tenant')
+
+def run_report_job(params, progress):
+    # Job sudah diterima, jadi menunggu slot admission alih-alih ditolak
+    return build_report_from_params(params, progress, block=True)
+
+# Dibuat oleh create_app(); satu set per proses, status job dibagi lewat REPORT_JOB_DIR
+report_jobs = None
+precomputer = None
+
+# Metrik untuk /metrics dan header Server-Timing (SERVER_TIMING=0 untuk mematikan header)
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') != '0'
+REQUEST_SECONDS = None
+_in_flight = {"requests": 0}
+_in_flight_lock = threading.Lock()
+
+def _pdf_workers_busy():
+    return sum(1 for worker in pool_stats().get("workers", []) if worker["state"] == "busy")
+
+def _jobs_pending():
+    jobs = report_jobs.stats()["jobs"]
+    return jobs.get("queued", 0) + jobs.get("running", 0)
+
+def _sheet_requests():
+    totals = {}
+    for stats in source_stats():
+        for result in ("hits", "downloads", "not_modified", "coalesced", "stale_served", "errors"):
+            totals[(result,)] = totals.get((result,), 0) + stats[result]
+    return totals
+
+def _register_metrics():
+    """Register the app's metrics once per process"""
+    global REQUEST_SECONDS
+    if REQUEST_SECONDS is not None:
+        return
+    REQUEST_SECONDS = metrics.histogram(
+        "http_request_seconds", "HTTP request duration by endpoint", ["endpoint", "method", "status"]
+    )
+    metrics.gauge("http_requests_in_flight", "Requests currently being handled", lambda: _in_flight["requests"])
+    metrics.gauge("pdf_queue_depth", "PDF conversions waiting for a worker", lambda: pool_stats().get("queue_depth", 0))
+    metrics.gauge("pdf_workers_busy", "PDF workers currently converting", _pdf_workers_busy)
+    metrics.gauge("report_jobs_pending", "Background report jobs queued or running", _jobs_pending)
+    metrics.gauge("rendered_cache_hit_ratio", "Rendered-report cache hit ratio", lambda: rendered_reports.stats()["hit_ratio"])
+    metrics.gauge("rendered_cache_bytes", "Bytes held by the rendered-report cache in memory", lambda: rendered_reports.stats()["bytes"])
+    metrics.counter(
+        "rendered_cache_lookups_total", "Rendered-report cache lookups by result",
+        lambda: {(result,): rendered_reports.stats()[result] for result in ("hits", "disk_hits", "misses")},
+        ["result"]
+    )
+    metrics.counter(
+        "report_renders_total", "Single-date report requests by result (own render or joined an identical one)",
+        lambda: {("render",): coalescing_stats()["renders"], ("coalesced",): coalescing_stats()["coalesced"]},
+        ["result"]
+    )
+    metrics.gauge(
+        "admission_queue_length", "Report requests waiting for an admission slot by format",
+        lambda: {(name,): stats["waiting"] for name, stats in admission_stats().items()}, ["format"]
+    )
+    metrics.gauge(
+        "admission_active", "Report requests holding an admission slot by format",
+        lambda: {(name,): stats["active"] for name, stats in admission_stats().items()}, ["format"]
+    )
+    metrics.counter(
+        "admission_requests_total", "Report requests by format and admission result",
+        lambda: {
+            (name, result): stats[result]
+            for name, stats in admission_stats().items()
+            for result in ("admitted", "waited", "queue_full", "timeout")
+        },
+        ["format", "result"]
+    )
+    metrics.counter("sheet_fetch_total", "Spreadsheet cache requests by result", _sheet_requests, ["result"])
+    metrics.counter(
+        "sheet_query_total", "Single-date loads by the filtered CSV export (SHEET_SOURCE=query) by result",
+        lambda: {(result,): sheet_queries.stats()[result] for result in ("queries", "fallbacks", "skipped")},
+        ["result"]
+    )
+    metrics.counter(
+        "sheet_parse_total", "Parsed-sheet cache lookups by result",
+        lambda: {("hit",): parsed_sheets.stats()["hits"], ("parse",): parsed_sheets.stats()["parses"]},
+        ["result"]
+    )
+
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.timings_token = metrics.start_timings()
+    with _in_flight_lock:
+        _in_flight["requests"] += 1
+
+def record_request_metrics(response):
+    if "request_started" in g:
+        elapsed = time.perf_counter() - g.request_started
+        REQUEST_SECONDS.observe(elapsed, request.endpoint or "unknown", request.method, str(response.status_code))
+        if SERVER_TIMING:
+            timings = metrics.current_timings() + [("total", elapsed)]
+            response.headers["Server-Timing"] = metrics.server_timing_header(timings)
+    return response
+
+def finish_request_metrics(exc=None):
+    if "timings_token" in g:
+        metrics.stop_timings(g.pop("timings_token"))
+        with _in_flight_lock:
+            _in_flight["requests"] -= 1
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text-format metrics"""
+    return Response(metrics.render_metrics(), content_type=metrics.CONTENT_TYPE)
+
+@bp.route('/jobs', methods=['POST'])
+def create_job():
+    """Start generating a report in the background and return its job id"""
+    data = request.get_json(silent=True) or request.form
+    params = {key: data.get(key) for key in REPORT_PARAMS if data.get(key)}
+    logger.info(f"Received job request: {params}")
+    
+    try:
+        check(params.get('format_type') or 'docx')
+        job = report_jobs.submit(params)
+    except AdmissionRejected as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": url_for('.job_status', job_id=job.id),
+        "file_url": url_for('.job_file', job_id=job.id)
+    }), 202
+
+@bp.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Report the stage of a background job"""
+    job = report_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job tidak ditemukan"}), 404
+    return jsonify(job.to_dict())
+
+@bp.route('/jobs/<job_id>/file')
+def job_file(job_id):
+    """Download the finished report of a background job"""
+    job = report_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job tidak ditemukan"}), 404
+    if job.status != 'done':
+        return jsonify(job.to_dict()), 409
+    
+    return send_file(
+        report_jobs.result_path(job),
+        mimetype=job.mimetype,
+        as_attachment=True,
+        download_name=job.file_name
+    )
+
+@bp.route('/export', methods=['GET', 'POST'])
+def export():
+    """
+    Stream a ZIP of every day's report in a range (start_date/end_date or
+    iso_week) for one tenant; include_pdf=1 adds the PDF next to each DOCX.
+    Each file is sent as soon as it is rendered, the archive is never held in memory.
+    """
+    params = request.values
+    try:
+        if params.get('iso_week'):
+            start_date, end_date = parse_iso_week(params['iso_week'])
+        else:
+            if not params.get('start_date') or not params.get('end_date'):
+                raise ReportError("Parameter start_date dan end_date (atau iso_week) wajib diisi")
+            start_date = parse_filter_date(params['start_date'])
+            end_date = parse_filter_date(params['end_date'])
+        template, days, range_name = prepare_range(start_date, end_date, tenant=resolve_tenant(params.get('tenant')))
+    except ReportError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    formats = ['docx', 'pdf'] if params.get('include_pdf') in ('1', 'true', 'yes') else ['docx']
+    try:
+        # Ditolak hanya sebelum streaming dimulai; setiap tanggal lalu menunggu slot
+        check('pdf' if 'pdf' in formats else 'docx')
+    except AdmissionRejected as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+    logger.info(f"Streaming export of {len(days)} days, formats={formats}")
+    
+    def entries():
+        errors = []
+        yield from iter_day_files(template, days, formats, errors)
+        if errors:
+            yield "ERRORS.txt", "\n".join(errors).encode()
+    
+    return Response(
+        stream_zip(entries()),
+        mimetype='application/zip',
+        headers={"Content-Disposition": f'attachment; filename="{range_name}.zip"'},
+        direct_passthrough=True
+    )
+
+def render_index(**context):
+    """The report form; the tenant picker is shown when there is more than one tenant"""
+    registry = get_registry()
+    return render_template('index.html', date=datetime.now().strftime("%Y-%m-%d"), tenants=registry.all(),
+                           all_tenants=ALL_TENANTS, **context)
+
+@bp.route('/', methods=['GET', 'POST'])
 def index():
     try:
         if request.method == 'POST':
             logger.info("Received POST request")
-            filter_date_str = request.form.get('filter_date')
-            format_type = request.form.get('format_type', 'docx')
+            params = {key: request.form.get(key) for key in REPORT_PARAMS if request.form.get(key)}
+            format_type = params.get('format_type', 'docx')
             
-            logger.info(f"Request parameters: date={filter_date_str}, format={format_type}")
+            logger.info(f"Request parameters: {params}")
             
-            # Parse date string to datetime object
             try:
-                filter_date = datetime.strptime(filter_date_str, "%Y-%m-%d")
+                # Slot admission diambil di pipeline, hanya untuk render yang benar-benar berjalan
+                download_name, mimetype, content = build_report_from_params(params)
+            except AdmissionRejected as e:
+                return render_index(error=str(e)), 503, {"Retry-After": str(e.retry_after)}
+            except PoolBusyError as e:
+                return render_index(error=str(e)), 503, {"Retry-After": str(get_gate('pdf').retry_after())}
+            except ReportError as e:
+                return render_index(error=str(e))
             except Exception as e:
-                logger.warning(f"Invalid date format: {str(e)}. Using current date.")
-                filter_date = datetime.now()
-            
-            # Generate the DOCX report first
-            result, docx_io = generate_docx_report(filter_date)
-            
-            if 'error' in result:
-                return render_template('index.html', error=result['error'], date=datetime.now().strftime("%Y-%m-%d"))
-            
-            # Generate file name
-            nama_hari = hari[filter_date.strftime("%A")]
-            nama_bulan = bulan[filter_date.strftime("%B")]
-            tanggal = filter_date.strftime("%d")
-            tahun = filter_date.strftime("%Y")
-            base_filename = f"{tanggal} {nama_bulan} {tahun}_Daily Report Wildan Dzaky Ramadhani"
-            
-            logger.info(f"Preparing to send file: {base_filename}.{format_type}")
+                if format_type != 'pdf':
+                    raise
+                logger.error(f"Error in PDF conversion: {str(e)}")
+                return render_index(error=f"Error converting to PDF. Please try DOCX format instead. Technical details: {str(e)}")
             
-            # Return according to format requested
-            if format_type == 'docx':
-                # Send the DOCX file directly
-                return send_file(
-                    docx_io, 
-                    mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-                    as_attachment=True,
-                    download_name=f"{base_filename}.docx"
-                )
-            elif format_type == 'pdf':
-                try:
-                    # Use the improved PDF conversion function
-                    pdf_io = convert_to_pdf(docx_io.getvalue(), base_filename)
-                    
-                    # Send the PDF file
-                    return send_file(
-                        pdf_io,
-                        mimetype='application/pdf',
-                        as_attachment=True,
-                        download_name=f"{base_filename}.pdf"
-                    )
-                except Exception as e:
-                    logger.error(f"Error in PDF conversion: {str(e)}")
-                    return render_template('index.html', 
-                                          error=f"Error converting to PDF. Please try DOCX format instead. Technical details: {str(e)}",
-                                          date=datetime.now().strftime("%Y-%m-%d"))
+            return send_file(
+                io.BytesIO(content),
+                mimetype=mimetype,
+                as_attachment=True,
+                download_name=download_name
+            )
         
         # GET request or initial page load
         logger.info("Handling GET request")
-        return render_template('index.html', date=datetime.now().strftime("%Y-%m-%d"))
+        return render_index()
     
     except Exception as e:
         logger.error(f"Unhandled exception: {str(e)}")
         logger.error(traceback.format_exc())
         return jsonify({"error": str(e), "traceback": traceback.format_exc()})
 
+def create_app(start_background=True):
+    """
+    Build the Flask app. Importing this module has no side effects; logging,
+    templates/index.html and background threads are set up explicitly by the
+    caller (see __main__ and wsgi.py). start_background=False leaves the
+    precompute thread to the caller, e.g. to start it after a fork.
+    """
+    global report_jobs, precomputer
+    app = Flask(__name__)
+    app.register_blueprint(bp)
+    app.before_request(start_request_metrics)
+    app.after_request(record_request_metrics)
+    app.teardown_request(finish_request_metrics)
+    
+    if report_jobs is None:
+        report_jobs = JobManager(
+            run_report_job,
+            JobStore(default_job_dir()),
+            max_workers=int(os.environ.get('REPORT_JOB_WORKERS', 4)),
+            max_pending=int(os.environ.get('REPORT_JOB_MAX_PENDING', 32)),
+            ttl=int(os.environ.get('REPORT_JOB_TTL', 3600)),
+            prune_interval=int(os.environ.get('REPORT_JOB_PRUNE_INTERVAL', 30))
+        )
+    _register_metrics()
+    
+    # Render ulang tanggal terbaru di background setiap kali sheet berubah (PRECOMPUTE_ENABLED=1)
+    if start_background and precomputer is None:
+        precomputer = start_precomputer()
+    return app
+
 if __name__ == '__main__':
+    configure_logging()
+    ensure_index_template()
     print("Starting Flask application...")
     print(f"Current directory: {os.getcwd()}")
     print(f"Python version: {sys.version}")
@@ -511,6 +445,8 @@ if __name__ == '__main__':
     # Create a test docx if template doesn't exist (for demo purposes)
     if not os.path.exists("Weekly Daily Report Wildan Dzaky Ramadhani.docx"):
         try:
+            from docx import Document
+            
             doc = Document()
             doc.add_heading('Daily Report Template', 0)
             doc.add_paragraph("Waktu Laporan\t: Template")
@@ -524,4 +460,4 @@ if __name__ == '__main__':
         except Exception as e:
             print(f"Failed to create sample template: {e}")
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,162 @@
+"""
+Command-line renderer for the daily reports, for cron jobs and offline runs.
+
+    python -m autoreport render --from 2026-10-01 --to 2026-10-31 --format pdf --out reports/ --workers 8
+    python -m autoreport render --date 2026-10-17 --xlsx export.xlsx --out reports/
+    python -m autoreport render --week 2026-W42 --tenant budi --format pdf
+
+The sheet is downloaded (or read from --xlsx) and parsed once in the parent
+process; each day's rows are then rendered on a process pool using the same
+pipeline as the web app.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from report_pipeline import (
+    ReportError, load_report_template, parse_iso_week, prepare_range, render_day_docx, render_pdf, resolve_tenant
+)
+
+logger = logging.getLogger("autoreport")
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}', expected YYYY-MM-DD")
+
+
+def _init_worker(pdf_workers, log_level):
+    from pdf_pool import shutdown_pool
+
+    logging.basicConfig(level=log_level, format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s')
+    # Setiap proses cukup satu worker LibreOffice; paralelisme datang dari process pool
+    os.environ.setdefault("PDF_WORKERS", str(pdf_workers))
+    multiprocessing.util.Finalize(None, shutdown_pool, exitpriority=10)
+
+
+def render_day_files(day, formats, out_dir, template_path=None):
+    """Render one prepared day into out_dir, return (date, written paths, seconds)"""
+    started = time.perf_counter()
+    template = load_report_template(template_path)
+    docx_content = render_day_docx(template, day)
+    written = []
+    if 'docx' in formats:
+        written.append(_write(out_dir, f"{day['base_filename']}.docx", docx_content))
+    if 'pdf' in formats:
+        pdf_content = render_pdf(day["report_key"], docx_content, day["base_filename"])
+        written.append(_write(out_dir, f"{day['base_filename']}.pdf", pdf_content))
+    return day["date"], written, time.perf_counter() - started
+
+
+def _write(out_dir, name, content):
+    path = os.path.join(out_dir, name)
+    tmp_path = f"{path}.part"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return path
+
+
+def cmd_render(args):
+    if args.week:
+        start_date, end_date = parse_iso_week(args.week)
+    else:
+        start_date = args.date or args.start or datetime.now()
+        end_date = args.date or args.end or start_date
+    formats = ['docx', 'pdf'] if args.format == 'both' else [args.format]
+    os.makedirs(args.out, exist_ok=True)
+
+    started = time.perf_counter()
+    tenant = resolve_tenant(args.tenant)
+    _, days, _ = prepare_range(start_date, end_date, xlsx_path=args.xlsx, tenant=tenant)
+    print(f"Rendering {len(days)} report(s) {start_date:%Y-%m-%d} - {end_date:%Y-%m-%d} "
+          f"as {'+'.join(formats)} with {args.workers} worker(s)", file=sys.stderr)
+
+    failures = 0
+    if args.workers <= 1:
+        results = ((day, _call(render_day_files, day, formats, args.out, tenant.template_path)) for day in days)
+        failures = _report_progress(results, len(days))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=args.workers,
+            initializer=_init_worker,
+            initargs=(args.pdf_workers, logging.getLogger().level)
+        ) as executor:
+            futures = {executor.submit(render_day_files, day, formats, args.out, tenant.template_path): day for day in days}
+            results = ((futures[future], _outcome(future)) for future in as_completed(futures))
+            failures = _report_progress(results, len(days))
+
+    elapsed = time.perf_counter() - started
+    print(f"Done: {len(days) - failures} ok, {failures} failed in {elapsed:.1f}s -> {args.out}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def _call(fn, *args):
+    try:
+        return fn(*args), None
+    except Exception as e:
+        return None, e
+
+
+def _outcome(future):
+    try:
+        return future.result(), None
+    except Exception as e:
+        return None, e
+
+
+def _report_progress(results, total):
+    failures = 0
+    for done, (day, (result, error)) in enumerate(results, start=1):
+        if error is not None:
+            failures += 1
+            print(f"[{done}/{total}] {day['date']} FAILED: {error}", file=sys.stderr)
+        else:
+            _, written, seconds = result
+            names = ", ".join(os.path.basename(path) for path in written)
+            print(f"[{done}/{total}] {day['date']} {names} ({seconds:.2f}s)", file=sys.stderr)
+    return failures
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m autoreport", description="Daily report renderer")
+    parser.add_argument('-v', '--verbose', action='count', default=0, help="-v for INFO, -vv for DEBUG logs")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    render = commands.add_parser('render', help="render reports for a date or a date range")
+    when = render.add_mutually_exclusive_group()
+    when.add_argument('--date', type=_parse_date, help="single date (YYYY-MM-DD)")
+    when.add_argument('--from', dest='start', type=_parse_date, help="first date of the range")
+    when.add_argument('--week', help="ISO week, e.g. 2026-W42")
+    render.add_argument('--to', dest='end', type=_parse_date, help="last date of the range (default: --from)")
+    render.add_argument('--format', choices=['docx', 'pdf', 'both'], default='docx')
+    render.add_argument('--out', default='reports', help="output directory (default: reports/)")
+    render.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="render processes")
+    render.add_argument('--pdf-workers', type=int, default=1, help="LibreOffice workers per process")
+    render.add_argument('--xlsx', help="read a local xlsx export instead of Google Sheets")
+    render.add_argument('--tenant', help="tenant id from TENANTS_FILE (default: the default tenant)")
+    render.set_defaults(func=cmd_render)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    level = {0: logging.WARNING, 1: logging.INFO}.get(args.verbose, logging.DEBUG)
+    logging.basicConfig(level=level, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        return args.func(args)
+    except ReportError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
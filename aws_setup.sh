@@ -41,7 +41,13 @@ After=network.target
 User=$(whoami)
 WorkingDirectory=$(pwd)
 Environment="PATH=$(pwd)/venv/bin"
-ExecStart=$(pwd)/venv/bin/python3 app.py
+Environment="GUNICORN_BIND=0.0.0.0:8502"
+# Jumlah worker gunicorn; default min(jumlah CPU, 4)
+#Environment="WEB_CONCURRENCY=4"
+ExecStart=$(pwd)/venv/bin/gunicorn -c gunicorn.conf.py wsgi:app
+ExecReload=/bin/kill -HUP \$MAINPID
+KillMode=mixed
+TimeoutStopSec=90
 Restart=always
 
 [Install]
@@ -56,4 +62,5 @@ sudo systemctl start flask_app
 echo "Setup completed! Your Flask application should now be running as a service."
 echo "To check the status, run: sudo systemctl status flask_app"
 echo "To view logs, run: sudo journalctl -u flask_app"
+echo "To recycle workers gracefully, run: sudo systemctl reload flask_app (code updates need a restart)"
 echo "You can access your application at: http://YOUR_SERVER_IP:8502"
@@ -0,0 +1,307 @@
+"""
+End-to-end benchmark of the report web app.
+
+For every workbook size a synthetic "New Format" sheet is generated, served by
+mock_sheet_server.py and the app is started in its own process pointed at it.
+Then, per format:
+
+  * cold request  first POST / (downloads and parses the sheet)
+  * latency       sequential POST / over recent dates: p50/p95/max and the
+                  per-stage breakdown from the Server-Timing header
+  * throughput    concurrent POST / at each --concurrency level
+  * peak RSS      high-water mark (VmHWM) of the app process
+
+The rendered-report cache is disabled (REPORT_CACHE_MAX_MB=0) unless
+--with-cache is given, so every request really renders. Results are written
+as JSON; --compare prints the change between two result files.
+
+    python benchmarks/bench_pipeline.py --sizes 1000x30 10000x365 --formats docx pdf
+    python benchmarks/bench_pipeline.py --compare results/old.json results/new.json
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from synthetic import write_workbook  # noqa: E402
+
+APP_RUNNER = ("import app; app.configure_logging(); "
+              "app.create_app().run(host='127.0.0.1', port={port}, threaded=True, use_reloader=False)")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=2).status_code < 500:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def peak_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def parse_server_timing(header):
+    stages = {}
+    for item in filter(None, (part.strip() for part in (header or "").split(","))):
+        name, _, params = item.partition(";")
+        if params.startswith("dur="):
+            stages[name] = float(params[4:])
+    return stages
+
+
+def summarise(latencies_ms):
+    return {
+        "count": len(latencies_ms),
+        "p50_ms": round(statistics.median(latencies_ms), 1),
+        "p95_ms": round(percentile(latencies_ms, 95), 1),
+        "max_ms": round(max(latencies_ms), 1),
+    }
+
+
+class AppProcess:
+    """
+    The mock export server plus the app, both on free local ports. command is
+    the app's argv with {port} placeholders (default: the dev server).
+    """
+
+    def __init__(self, workbook, workdir, env_overrides, command=None):
+        self.workbook = workbook
+        self.workdir = workdir
+        self.env_overrides = env_overrides
+        self.command = command or [sys.executable, "-c", APP_RUNNER]
+        self.processes = []
+
+    def __enter__(self):
+        sheet_port, app_port = free_port(), free_port()
+        self.logs = open(os.path.join(self.workdir, "server.log"), "ab")
+        self.processes.append(subprocess.Popen(
+            [sys.executable, "mock_sheet_server.py", "--xlsx", self.workbook, "--port", str(sheet_port)],
+            cwd=REPO_DIR, stdout=self.logs, stderr=subprocess.STDOUT
+        ))
+        env = dict(os.environ, SHEET_EXPORT_BASE_URL=f"http://127.0.0.1:{sheet_port}", **self.env_overrides)
+        self.app = subprocess.Popen(
+            [part.format(port=app_port) for part in self.command],
+            cwd=REPO_DIR, env=env, stdout=self.logs, stderr=subprocess.STDOUT
+        )
+        self.processes.append(self.app)
+        self.url = f"http://127.0.0.1:{app_port}"
+        wait_for(f"http://127.0.0.1:{sheet_port}/_admin/stats")
+        wait_for(f"{self.url}/status")
+        return self
+
+    def __exit__(self, *exc):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.logs.close()
+
+
+def post_report(session, url, date, format_type):
+    started = time.perf_counter()
+    response = session.post(f"{url}/", data={"filter_date": date, "format_type": format_type}, timeout=600)
+    elapsed = (time.perf_counter() - started) * 1000
+    content_type = response.headers.get("Content-Type", "")
+    ok = response.status_code == 200 and not content_type.startswith("text/html")
+    return ok, elapsed, parse_server_timing(response.headers.get("Server-Timing"))
+
+
+def run_format(app, dates, format_type, requests_per_level, concurrency_levels):
+    session = requests.Session()
+    ok, cold_ms, cold_stages = post_report(session, app.url, dates[0], format_type)
+    if not ok:
+        raise RuntimeError(f"{format_type} report for {dates[0]} failed, see server.log")
+
+    latencies, stages = [], {}
+    for i in range(requests_per_level):
+        ok, elapsed, timing = post_report(session, app.url, dates[i % len(dates)], format_type)
+        if ok:
+            latencies.append(elapsed)
+            for name, duration in timing.items():
+                stages.setdefault(name, []).append(duration)
+
+    throughput = []
+    for level in concurrency_levels:
+        sessions = [requests.Session() for _ in range(level)]
+        jobs = [(sessions[i % level], dates[i % len(dates)]) for i in range(requests_per_level)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=level) as executor:
+            results = list(executor.map(lambda job: post_report(job[0], app.url, job[1], format_type), jobs))
+        wall = time.perf_counter() - started
+        ok_latencies = [elapsed for ok, elapsed, _ in results if ok]
+        throughput.append({
+            "concurrency": level,
+            "requests": len(results),
+            "errors": len(results) - len(ok_latencies),
+            "requests_per_second": round(len(ok_latencies) / wall, 2),
+            **(summarise(ok_latencies) if ok_latencies else {}),
+        })
+
+    return {
+        "cold_ms": round(cold_ms, 1),
+        "cold_stages_ms": {name: round(value, 1) for name, value in cold_stages.items()},
+        "latency": summarise(latencies) if latencies else None,
+        "stages_p50_ms": {name: round(statistics.median(values), 1) for name, values in stages.items()},
+        "throughput": throughput,
+    }
+
+
+def run(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix="autoreport-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    env_overrides = {"SERVER_TIMING": "1"}
+    if not args.with_cache:
+        env_overrides["REPORT_CACHE_MAX_MB"] = "0"
+    if args.libreoffice:
+        env_overrides["LIBREOFFICE_PATH"] = args.libreoffice
+
+    scenarios = []
+    for size in args.sizes:
+        rows, days = (int(part) for part in size.lower().split("x"))
+        workbook = os.path.join(workdir, f"sheet-{rows}x{days}-{args.seed}.xlsx")
+        if not os.path.exists(workbook):
+            print(f"Generating {rows} rows over {days} days ...", file=sys.stderr)
+            write_workbook(workbook, rows, days, args.end, args.seed)
+        end = datetime.strptime(args.end, "%Y-%m-%d")
+        dates = [(end - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(min(days, args.dates))]
+
+        for format_type in args.formats:
+            print(f"[{rows}x{days}] {format_type} ...", file=sys.stderr)
+            with AppProcess(workbook, workdir, env_overrides) as app:
+                result = run_format(app, dates, format_type, args.requests, args.concurrency)
+                result["peak_rss_mb"] = peak_rss_mb(app.app.pid)
+            scenario = {"rows": rows, "days": days, "format": format_type, **result}
+            scenarios.append(scenario)
+            latency = result["latency"] or {}
+            print(f"[{rows}x{days}] {format_type}: cold {result['cold_ms']} ms, p50 {latency.get('p50_ms')} ms, "
+                  f"peak RSS {result['peak_rss_mb']} MB", file=sys.stderr)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key != "compare"},
+        },
+        "scenarios": scenarios,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    old_scenarios = {(s["rows"], s["days"], s["format"]): s for s in old["scenarios"]}
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    print(f"{'scenario':<22} {'metric':<18} {'old':>10} {'new':>10} {'change':>8}")
+    for scenario in new["scenarios"]:
+        key = (scenario["rows"], scenario["days"], scenario["format"])
+        before = old_scenarios.get(key)
+        if before is None:
+            continue
+        metrics = [
+            ("cold_ms", before["cold_ms"], scenario["cold_ms"]),
+            ("p50_ms", (before["latency"] or {}).get("p50_ms"), (scenario["latency"] or {}).get("p50_ms")),
+            ("p95_ms", (before["latency"] or {}).get("p95_ms"), (scenario["latency"] or {}).get("p95_ms")),
+            ("peak_rss_mb", before["peak_rss_mb"], scenario["peak_rss_mb"]),
+        ]
+        old_rps = {t["concurrency"]: t["requests_per_second"] for t in before["throughput"]}
+        for level in scenario["throughput"]:
+            if level["concurrency"] in old_rps:
+                metrics.append((f"rps@{level['concurrency']}", old_rps[level["concurrency"]],
+                                level["requests_per_second"]))
+        name = f"{key[0]}x{key[1]} {key[2]}"
+        for metric, a, b in metrics:
+            if a is None or b is None:
+                continue
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            print(f"{name:<22} {metric:<18} {a:>10} {b:>10} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["1000x30", "10000x365", "50000x1000"],
+                        help="workbook sizes as ROWSxDAYS")
+    parser.add_argument("--formats", nargs="+", choices=["docx", "pdf"], default=["docx", "pdf"])
+    parser.add_argument("--requests", type=int, default=40, help="requests per latency run and per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--dates", type=int, default=14, help="recent dates cycled through")
+    parser.add_argument("--end", default="2026-10-31", help="last date in the synthetic sheets")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--with-cache", action="store_true", help="keep the rendered-report cache enabled")
+    parser.add_argument("--libreoffice", help="LIBREOFFICE_PATH for the app process")
+    parser.add_argument("--workdir", help="where workbooks and server.log are kept (default: a temp dir)")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<commit>-<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = run(args)
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", f"{results['meta']['commit'] or 'unknown'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
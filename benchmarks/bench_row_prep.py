@@ -0,0 +1,113 @@
+"""
+Micro-benchmark: row preparation with iterrows + a per-cell date formatter
+versus the live path (prepare_day() then report_rows(), as
+build_day_document() runs it), on a synthetic day with many rows.
+
+    python benchmarks/bench_row_prep.py --rows 1000 100000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_pipeline import bulan, load_report_template, prepare_day, report_rows  # noqa: E402
+from sheet_data import ParsedSheet  # noqa: E402
+
+DAY = datetime(2026, 1, 1)
+
+
+def synthetic_frame(count, seed=0):
+    """Mixed cells like a real export: timestamps, date strings, blanks and free text"""
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp("2026-01-01")
+    batas = (base + pd.to_timedelta(rng.integers(0, 365, count), unit="D")).to_numpy(dtype=object)
+    selesai = (base + pd.to_timedelta(rng.integers(0, 365, count), unit="D")).strftime("%Y-%m-%d %H:%M:%S").to_numpy(dtype=object)
+    selesai[rng.random(count) < 0.3] = ""
+    batas[rng.random(count) < 0.05] = "belum ditentukan"
+    keterangan = np.where(rng.random(count) < 0.5, "", "  catatan pekerjaan  ").astype(object)
+    frame = pd.DataFrame({
+        "Tanggal": pd.Timestamp(DAY),
+        "Pekerjaan": [f"Pekerjaan nomor {i}" for i in range(count)],
+        "Batas Waktu": batas,
+        "Status": np.where(rng.random(count) < 0.5, "Done", "On Progress"),
+        "Diselesaikan Pada": selesai,
+        "Keterangan": keterangan,
+    })
+    return frame.fillna('')
+
+
+def format_tanggal(tanggal_str, bulan_dict):
+    """The previous per-cell formatter: 'DD <bulan> YYYY' or ''"""
+    if isinstance(tanggal_str, str) and tanggal_str.strip():
+        try:
+            if tanggal_str == "NaT":
+                return ""
+            dt = datetime.strptime(tanggal_str.split()[0], "%Y-%m-%d")
+            return f"{dt.strftime('%d')} {bulan_dict[dt.strftime('%B')]} {dt.strftime('%Y')}"
+        except ValueError:
+            return ""
+    return ""
+
+
+def legacy_rows(sheet):
+    """The previous preparation: filter, two iterrows passes, format_tanggal per cell"""
+    df_filtered = sheet.rows_for(DAY.strftime("%Y-%m-%d")).fillna('')
+    data_baru = [
+        (
+            idx + 1,
+            row['Pekerjaan'] if not pd.isna(row['Pekerjaan']) else "",
+            format_tanggal(str(row['Batas Waktu']), bulan),
+            row['Status'] if not pd.isna(row['Status']) else "",
+            format_tanggal(str(row['Diselesaikan Pada']), bulan)
+        )
+        for idx, (_, row) in enumerate(df_filtered.iterrows())
+    ]
+    keterangan_list = [str(row['Keterangan']).strip() for _, row in df_filtered.iterrows() if str(row['Keterangan']).strip()]
+    return data_baru, "\n".join(keterangan_list) if keterangan_list else "-"
+
+
+def live_rows(sheet, template):
+    """prepare_day() and the report_rows() of build_day_document()"""
+    day = prepare_day(sheet, DAY, template)
+    return report_rows(day["frame"])
+
+
+def timed(fn, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # prepare_day mencatat log info untuk setiap tanggal
+    import logging
+    logging.disable(logging.WARNING)
+
+    template = load_report_template()
+    print(f"{'rows':>8} {'iterrows (s)':>13} {'prepare_day (s)':>16} {'speedup':>8}")
+    for count in args.rows:
+        sheet = ParsedSheet("bench", synthetic_frame(count))
+        legacy_time, legacy = timed(legacy_rows, sheet, repeat=args.repeat)
+        live_time, live = timed(live_rows, sheet, template, repeat=args.repeat)
+        if legacy != live:
+            raise SystemExit(f"Output mismatch at {count} rows")
+        print(f"{count:>8} {legacy_time:>13.3f} {live_time:>16.3f} {legacy_time / live_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
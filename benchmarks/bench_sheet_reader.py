@@ -0,0 +1,121 @@
+"""
+Sheet reader benchmark: read_excel of the whole sheet (SHEET_READER=pandas)
+versus the streaming, column-pruned reader (SHEET_READER=stream) that keeps
+only the requested dates, on synthetic workbooks of growing size.
+
+    python benchmarks/bench_sheet_reader.py --rows 10000 100000 1000000
+    python benchmarks/bench_sheet_reader.py --rows 100000 --extra-columns 10 --output reader.json
+
+Every measurement runs in a fresh interpreter, so the reported peak RSS
+belongs to that reader alone; "parse MB" is the peak minus the RSS right
+before parsing (interpreter, pandas and the workbook bytes).
+
+    pandas       read_excel of every row and column, the current cached path
+    stream-day   streaming reader, one date
+    stream-week  streaming reader, seven dates
+    stream-all   streaming reader, every date (columns pruned only)
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+MODES = ("pandas", "stream-day", "stream-week", "stream-all")
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmRSS:")) / 1024
+
+
+def measure(mode, path, end):
+    """Run one reader in this process, return its timings and memory"""
+    # sheet_data mengimpor pandas, jadi pandas sudah termasuk baseline RSS
+    from sheet_data import ParsedSheet, parse_sheet, stream_sheet
+    from sheet_source import snapshot_from_file
+
+    snapshot = snapshot_from_file(path)
+    end = datetime.strptime(end, "%Y-%m-%d")
+    dates = {
+        "stream-day": [end.strftime("%Y-%m-%d")],
+        "stream-week": [(end - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(7)],
+    }.get(mode)
+    base = rss_mb()
+
+    started = time.perf_counter()
+    if mode == "pandas":
+        sheet = parse_sheet(snapshot)
+    else:
+        sheet = ParsedSheet(snapshot.revision, stream_sheet(snapshot.content, dates=dates))
+    seconds = time.perf_counter() - started
+    rows = len(sheet.rows_for(end.strftime("%Y-%m-%d")))
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "seconds": round(seconds, 3),
+        "rows_kept": len(sheet),
+        "rows_for_day": rows,
+        "peak_rss_mb": round(peak, 1),
+        "parse_mb": round(peak - base, 1),
+    }
+
+
+def run_child(mode, path, end):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode, path, "--end", end],
+        capture_output=True, text=True, cwd=REPO_DIR
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{mode} failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--end", default="2026-10-31")
+    parser.add_argument("--extra-columns", type=int, default=4, help="unused columns in the workbook")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--workdir", help="where to keep the generated workbooks (reused between runs)")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child[0], args.child[1], args.end)))
+        return
+
+    from synthetic import write_workbook
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="autoreport-reader-")
+    os.makedirs(workdir, exist_ok=True)
+    results = []
+    print(f"{'rows':>9} {'mode':<12} {'seconds':>8} {'rows kept':>10} {'peak MB':>8} {'parse MB':>9}")
+    for rows in args.rows:
+        workbook = os.path.join(workdir, f"sheet-{rows}x{args.days}+{args.extra_columns}.xlsx")
+        if not os.path.exists(workbook):
+            started = time.perf_counter()
+            write_workbook(workbook, rows, args.days, args.end, extra_columns=args.extra_columns)
+            print(f"  wrote {workbook} ({os.path.getsize(workbook) / 1e6:.1f} MB) in {time.perf_counter() - started:.0f}s")
+        for mode in args.modes:
+            result = {"rows": rows, "mode": mode, **run_child(mode, workbook, args.end)}
+            results.append(result)
+            print(f"{rows:>9} {mode:<12} {result['seconds']:>8.2f} {result['rows_kept']:>10} "
+                  f"{result['peak_rss_mb']:>8.1f} {result['parse_mb']:>9.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
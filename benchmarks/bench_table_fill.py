@@ -0,0 +1,92 @@
+"""
+Micro-benchmark: per-cell table fill (add_row + .text + tcBorders per cell)
+versus the bulk fill_table() writer, on the real report template.
+
+    python benchmarks/bench_table_fill.py --rows 10 100 1000 5000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from docx.oxml import OxmlElement  # noqa: E402
+from docx.oxml.ns import qn  # noqa: E402
+
+from report_template import fill_table, get_template  # noqa: E402
+
+TEMPLATE_PATH = os.path.join(REPO_DIR, "Weekly Daily Report Wildan Dzaky Ramadhani.docx")
+
+
+def synthetic_rows(count):
+    return [
+        (i + 1, f"Pekerjaan nomor {i} untuk laporan", "05 Oktober 2026", "Done" if i % 2 else "On Progress",
+         "03 Oktober 2026" if i % 2 else "")
+        for i in range(count)
+    ]
+
+
+def legacy_fill(table, rows):
+    """The previous row loop: add_row().cells, five .text sets, tcBorders per cell"""
+    for no, pekerjaan, batas_waktu, status, selesai_pada in rows:
+        row_cells = table.add_row().cells
+        row_cells[0].text = str(no)
+        row_cells[1].text = pekerjaan
+        row_cells[2].text = batas_waktu
+        row_cells[3].text = status
+        row_cells[4].text = selesai_pada
+        for cell in row_cells:
+            tcPr = cell._tc.get_or_add_tcPr()
+            tcBorders = OxmlElement('w:tcBorders')
+            for border_name in ['top', 'left', 'bottom', 'right']:
+                border = OxmlElement(f'w:{border_name}')
+                border.set(qn('w:val'), 'single')
+                border.set(qn('w:sz'), '4')
+                border.set(qn('w:space'), '0')
+                border.set(qn('w:color'), '000000')
+                tcBorders.append(border)
+            tcPr.append(tcBorders)
+
+
+def measure(template, rows, bulk, repeat):
+    best_fill = best_total = float('inf')
+    for _ in range(repeat):
+        report = template.new_document()
+        start = time.perf_counter()
+        if bulk:
+            fill_table(report.table._tbl, rows)
+        else:
+            legacy_fill(report.table, rows)
+        filled = time.perf_counter()
+        report.save(io.BytesIO())
+        done = time.perf_counter()
+        best_fill = min(best_fill, filled - start)
+        best_total = min(best_total, done - start)
+    return best_fill, best_total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10, 100, 1000, 5000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--template', default=TEMPLATE_PATH)
+    args = parser.parse_args()
+    # Tanpa template, hasil benchmark tidak mewakili laporan sebenarnya
+    if not os.path.isfile(args.template):
+        parser.error(f"template not found: {args.template}")
+
+    template = get_template(args.template)
+    print(f"{'rows':>7} {'legacy fill':>12} {'bulk fill':>12} {'speedup':>8} {'legacy+save':>12} {'bulk+save':>12}")
+    for count in args.rows:
+        rows = synthetic_rows(count)
+        legacy_fill_s, legacy_total = measure(template, rows, bulk=False, repeat=args.repeat)
+        bulk_fill_s, bulk_total = measure(template, rows, bulk=True, repeat=args.repeat)
+        print(f"{count:>7} {legacy_fill_s * 1000:>10.1f}ms {bulk_fill_s * 1000:>10.1f}ms "
+              f"{legacy_fill_s / bulk_fill_s:>7.1f}x {legacy_total * 1000:>10.1f}ms {bulk_total * 1000:>10.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Load test of the gunicorn serving mode: throughput per worker count.
+
+The app is started with gunicorn.conf.py (preload, gthread workers) for every
+--workers value against a synthetic sheet served by mock_sheet_server.py, then
+hit with --concurrency parallel POST / requests. The rendered-report cache is
+disabled so every request renders; throughput should grow with the worker
+count until the cores (or the PDF pools) are saturated. Every level also
+submits --jobs background jobs and polls them to the end; with several
+workers the polls land on workers other than the one running the job.
+
+    python benchmarks/load_test.py --workers 1 2 4 --concurrency 16 --format docx
+    python benchmarks/load_test.py --workers 1 2 4 --format pdf --output load.json --min-speedup 1.5
+
+Exits 1 when a request or job failed (more than --max-errors) or when the
+throughput of the largest worker count is below --min-speedup times the
+first one.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+
+from bench_pipeline import AppProcess, post_report, summarise
+from synthetic import write_workbook
+
+GUNICORN = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", "127.0.0.1:{port}", "wsgi:app"]
+
+
+def process_tree_rss_mb(pid):
+    """Resident memory of pid and its direct children (gunicorn master + workers)"""
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(child) for child in f.read().split()]
+    except OSError:
+        pass
+    total = 0
+    for process in pids:
+        try:
+            with open(f"/proc/{process}/status") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        except (OSError, StopIteration):
+            pass
+    return round(total / 1024, 1)
+
+
+def run_job(session, url, date, format_type, timeout=600):
+    """Submit a report job and poll it until done; True when the file downloaded"""
+    response = session.post(f"{url}/jobs", data={"filter_date": date, "format_type": format_type}, timeout=30)
+    if response.status_code != 202:
+        return False
+    job = response.json()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        # Koneksi baru per poll supaya gunicorn membagi poll ke worker yang berbeda
+        state = requests.get(f"{url}{job['status_url']}", timeout=30)
+        if state.status_code != 200:
+            return False
+        status = state.json()["status"]
+        if status == "failed":
+            return False
+        if status == "done":
+            download = requests.get(f"{url}{job['file_url']}", timeout=60)
+            return download.status_code == 200 and len(download.content) == state.json()["size"]
+        time.sleep(0.2)
+    return False
+
+
+def run_level(app, dates, args):
+    sessions = [requests.Session() for _ in range(args.concurrency)]
+    # Satu request per tanggal dulu supaya semua worker sudah hangat
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(lambda i: post_report(sessions[i % len(sessions)], app.url, dates[i % len(dates)],
+                                                args.format), range(args.concurrency * 2)))
+
+    jobs = [(sessions[i % args.concurrency], dates[i % len(dates)]) for i in range(args.requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda job: post_report(job[0], app.url, job[1], args.format), jobs))
+    wall = time.perf_counter() - started
+    latencies = [elapsed for ok, elapsed, _ in results if ok]
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        jobs = list(executor.map(lambda i: run_job(sessions[i % len(sessions)], app.url, dates[i % len(dates)],
+                                                   args.format), range(args.jobs)))
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(latencies),
+        "jobs": len(jobs),
+        "job_errors": jobs.count(False),
+        "requests_per_second": round(len(latencies) / wall, 2),
+        **(summarise(latencies) if latencies else {}),
+        "rss_mb": process_tree_rss_mb(app.app.pid),
+    }
+
+
+def check(results, args):
+    """Failures of a load test run, empty when it passed"""
+    failures = []
+    for result in results:
+        if result["errors"] + result["job_errors"] > args.max_errors:
+            failures.append(f"workers={result['workers']}: {result['errors']} request(s) and "
+                            f"{result['job_errors']} job(s) failed")
+    if args.min_speedup and len(results) > 1:
+        speedup = results[-1]["requests_per_second"] / (results[0]["requests_per_second"] or 1)
+        if speedup < args.min_speedup:
+            failures.append(f"workers={results[-1]['workers']}: x{speedup:.2f} throughput of "
+                            f"workers={results[0]['workers']}, expected at least x{args.min_speedup}")
+    return failures
+
+
+def run(args):
+    """Run every worker count of args, return the list of results"""
+    workdir = args.workdir or tempfile.mkdtemp(prefix="autoreport-load-")
+    os.makedirs(workdir, exist_ok=True)
+    workbook = os.path.join(workdir, f"sheet-{args.rows}x{args.days}.xlsx")
+    if not os.path.exists(workbook):
+        write_workbook(workbook, args.rows, args.days, args.end)
+    end = datetime.strptime(args.end, "%Y-%m-%d")
+    dates = [(end - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(min(args.days, 14))]
+
+    results = []
+    for workers in args.workers:
+        env = {
+            "WEB_CONCURRENCY": str(workers),
+            "GUNICORN_THREADS": str(args.threads),
+            "GUNICORN_ACCESS_LOG": "",
+            "PDF_WORKERS": str(args.pdf_workers),
+            "REPORT_CACHE_MAX_MB": "0",
+            "REPORT_JOB_DIR": os.path.join(workdir, f"jobs-{workers}"),
+        }
+        with AppProcess(workbook, workdir, env, command=GUNICORN) as app:
+            result = {"workers": workers, **run_level(app, dates, args)}
+        results.append(result)
+        base = results[0]["requests_per_second"] or 1
+        print(f"workers={workers}: {result['requests_per_second']} req/s (x{result['requests_per_second'] / base:.2f}), "
+              f"p50 {result.get('p50_ms')} ms, p95 {result.get('p95_ms')} ms, errors {result['errors']}, "
+              f"jobs {result['jobs'] - result['job_errors']}/{result['jobs']}, RSS {result['rss_mb']} MB")
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="gunicorn worker counts")
+    parser.add_argument("--threads", type=int, default=4, help="threads per worker")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--format", choices=["docx", "pdf"], default="docx")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--end", default="2026-10-31")
+    parser.add_argument("--pdf-workers", type=int, default=1, help="PDF_WORKERS per gunicorn worker")
+    parser.add_argument("--workdir")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--jobs", type=int, default=8, help="background jobs submitted and polled per level")
+    parser.add_argument("--max-errors", type=int, default=0, help="failed requests and jobs allowed per level")
+    parser.add_argument("--min-speedup", type=float, default=0.0,
+                        help="minimum throughput of the last worker count relative to the first (0: not checked)")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    results = run(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "cpus": os.cpu_count(), "results": results}, f, indent=2)
+    failures = check(results, args)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Synthetic "New Format" workbooks for benchmarks.
+
+    python benchmarks/synthetic.py --rows 10000 --days 365 --out sheet.xlsx
+
+Rows are spread evenly over `days` consecutive dates ending at --end, with
+the same columns and cell types as the real export (Tanggal / Batas Waktu /
+Diselesaikan Pada as dates, blanks in Diselesaikan Pada and Keterangan).
+--extra-columns adds text columns the report does not use, like the other
+columns of a real sheet. Output depends only on the arguments, so runs are
+reproducible. The workbook is written in openpyxl's write-only mode, so
+million-row sheets do not need the whole workbook in memory.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sheet_data import SHEET_NAME  # noqa: E402
+
+STATUSES = np.array(["Done", "On Progress", "Pending"], dtype=object)
+
+
+def synthetic_sheet(rows, days, end="2026-10-31", seed=0, extra_columns=0):
+    """DataFrame with `rows` rows spread over `days` dates ending at `end`"""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end)
+    offsets = np.sort(rng.integers(0, days, rows))[::-1]
+    tanggal = end - pd.to_timedelta(offsets, unit="D")
+    batas = tanggal + pd.to_timedelta(rng.integers(0, 14, rows), unit="D")
+    selesai = pd.Series(tanggal + pd.to_timedelta(rng.integers(0, 3, rows), unit="D"))
+    selesai[rng.random(rows) < 0.4] = pd.NaT
+    keterangan = np.where(rng.random(rows) < 0.7, None, "Menunggu review dari tim").astype(object)
+    frame = pd.DataFrame({
+        "Tanggal": tanggal,
+        "Pekerjaan": [f"Pekerjaan {i}: menyiapkan laporan dan data pendukung" for i in range(rows)],
+        "Batas Waktu": batas,
+        "Status": STATUSES[rng.integers(0, len(STATUSES), rows)],
+        "Diselesaikan Pada": selesai,
+        "Keterangan": keterangan,
+    })
+    for i in range(extra_columns):
+        frame[f"Kolom Tambahan {i + 1}"] = [f"nilai {i + 1}-{row % 97}" for row in range(rows)]
+    return frame
+
+
+def write_workbook(path, rows, days, end="2026-10-31", seed=0, extra_columns=0, chunk_rows=50000):
+    """Write the synthetic sheet as an xlsx with a "New Format" sheet, return the frame"""
+    import openpyxl
+
+    frame = synthetic_sheet(rows, days, end, seed, extra_columns)
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(SHEET_NAME)
+    sheet.append(list(frame.columns))
+    for start in range(0, len(frame), chunk_rows):
+        chunk = frame.iloc[start:start + chunk_rows].astype(object)
+        for row in chunk.where(chunk.notna(), None).itertuples(index=False, name=None):
+            sheet.append(row)
+    workbook.save(path)
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--end", default="2026-10-31", help="last date in the sheet")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--extra-columns", type=int, default=0, help="unused text columns to add")
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    write_workbook(args.out, args.rows, args.days, args.end, args.seed, args.extra_columns)
+    print(f"Wrote {args.rows} rows over {args.days} days to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+gunicorn configuration, every setting can be overridden from the environment:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+    WEB_CONCURRENCY=4 GUNICORN_THREADS=8 gunicorn -c gunicorn.conf.py wsgi:app
+
+Each worker is a separate process with its own PDF pool (PDF_WORKERS soffice
+processes), rendered-report cache and job list, so size WEB_CONCURRENCY *
+PDF_WORKERS to the cores available for LibreOffice. Report jobs are kept in
+REPORT_JOB_DIR, so any worker can answer a poll for a job another one runs.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count(), 4)))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+
+# Laporan PDF / rentang tanggal bisa lama; worker yang macet lebih dari ini di-restart
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 300))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 60))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Daur ulang worker secara bertahap supaya memori (pandas, soffice) tidak terus tumbuh
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+preload_app = True
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-") or None
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    # Master sudah memuat aplikasi; bangun template dan sheet sekali sebelum fork
+    import wsgi
+    wsgi.preload()
+
+
+def post_fork(server, worker):
+    import wsgi
+    wsgi.start_worker()
+
+
+def worker_exit(server, worker):
+    import wsgi
+    wsgi.stop_worker()
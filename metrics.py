@@ -0,0 +1,171 @@
+"""
+Stage timings and a Prometheus text-format exporter.
+
+Each step of a report (download, parse, filter, fill, save, convert, ...) is
+wrapped in span(stage), which records its duration in a histogram. The
+durations of the current request are also collected so the app can return
+them in a Server-Timing header. Gauges (queue depths, cache hit ratios, ...)
+are registered as callbacks and read when /metrics is scraped.
+"""
+import contextvars
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, math.inf)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry = []
+_registry_lock = threading.Lock()
+_timings = contextvars.ContextVar("timings", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        for labelvalues, (counts, total, count) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                le = ("le", _number(float(bound)))
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {bucket_count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    Gauge or counter whose value is read at scrape time. fn returns a number,
+    or a dict {label values tuple: number} when labelnames are given.
+    """
+
+    def __init__(self, name, help, fn, kind="gauge", labelnames=()):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        try:
+            value = self.fn()
+        except Exception as e:
+            logger.warning(f"Metric {self.name} failed: {str(e)}")
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        values = value if isinstance(value, dict) else {(): value}
+        for labelvalues, number in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(number)}")
+        return lines
+
+
+def register(metric):
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+
+def histogram(name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return register(Histogram(name, help, labelnames, buckets))
+
+
+def gauge(name, help, fn, labelnames=()):
+    return register(CallbackMetric(name, help, fn, "gauge", labelnames))
+
+
+def counter(name, help, fn, labelnames=()):
+    return register(CallbackMetric(name, help, fn, "counter", labelnames))
+
+
+def render_metrics():
+    """All registered metrics in the Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = histogram("report_stage_seconds", "Duration of each report pipeline stage", ["stage"])
+
+
+@contextmanager
+def span(stage):
+    """Time a block as `stage` in report_stage_seconds (and the current request's timings)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+def start_timings():
+    """Start collecting span durations for the current request; returns a token for stop_timings()"""
+    return _timings.set([])
+
+
+def current_timings():
+    return _timings.get() or []
+
+
+def stop_timings(token):
+    _timings.reset(token)
+
+
+def server_timing_header(timings):
+    """Server-Timing value, e.g. 'download;dur=12.1, convert;dur=850.3' (repeated stages are summed)"""
+    totals = {}
+    for stage, elapsed in timings:
+        totals[stage] = totals.get(stage, 0.0) + elapsed
+    return ", ".join(f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in totals.items())
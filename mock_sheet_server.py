@@ -0,0 +1,185 @@
+"""
+Local stand-in for the Google Sheets export endpoint.
+
+Serves an xlsx file the same way docs.google.com does, so the app can be run
+against it by pointing SHEET_EXPORT_BASE_URL at this server:
+
+    python mock_sheet_server.py --xlsx data.xlsx --port 8600
+    SHEET_EXPORT_BASE_URL=http://127.0.0.1:8600 python app.py
+
+It also answers the filtered CSV export (gviz query) used by SHEET_SOURCE=query,
+for the one query the app sends: select * where <column> = date 'YYYY-MM-DD'.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+from datetime import date, datetime
+from email.utils import formatdate, parsedate_to_datetime
+
+from flask import Flask, Response, jsonify, request
+
+app = Flask(__name__)
+
+state = {
+    "xlsx_path": None,
+    "delay": 0.0,
+    "fail_status": None,
+    "query_fail_status": None,
+    "csv_date_format": "%d/%m/%Y",
+}
+stats = {"requests": 0, "full": 0, "not_modified": 0, "failed": 0, "queries": 0}
+
+QUERY_RE = re.compile(r"^\s*select\s+\*\s+where\s+([A-Z]+)\s*=\s*date\s+'(\d{4}-\d{2}-\d{2})'\s*$", re.IGNORECASE)
+stats_lock = threading.Lock()
+
+
+def _count(name):
+    with stats_lock:
+        stats[name] += 1
+
+
+def _load_workbook():
+    path = state["xlsx_path"]
+    with open(path, 'rb') as f:
+        content = f.read()
+    etag = '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+    mtime = int(os.path.getmtime(path))
+    return content, etag, mtime
+
+
+@app.route('/spreadsheets/d/<file_id>/export')
+def export(file_id):
+    _count("requests")
+    if state["delay"]:
+        time.sleep(state["delay"])
+    if state["fail_status"]:
+        _count("failed")
+        return Response("export unavailable", status=state["fail_status"])
+    if request.args.get('format', 'xlsx') != 'xlsx':
+        return Response("unsupported format", status=400)
+
+    content, etag, mtime = _load_workbook()
+    last_modified = formatdate(mtime, usegmt=True)
+
+    not_modified = False
+    if request.headers.get('If-None-Match'):
+        not_modified = request.headers['If-None-Match'] == etag
+    elif request.headers.get('If-Modified-Since'):
+        try:
+            since = parsedate_to_datetime(request.headers['If-Modified-Since']).timestamp()
+            not_modified = mtime <= since
+        except (TypeError, ValueError):
+            pass
+
+    headers = {"ETag": etag, "Last-Modified": last_modified}
+    if not_modified:
+        _count("not_modified")
+        return Response(status=304, headers=headers)
+
+    _count("full")
+    return Response(
+        content,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        headers=headers
+    )
+
+
+def _csv_cell(value):
+    # Seperti Google: tanggal ditulis sesuai format tampilan, angka bulat tanpa .0
+    if isinstance(value, datetime):
+        if value.time() == datetime.min.time():
+            return value.strftime(state["csv_date_format"])
+        return value.strftime(state["csv_date_format"] + " %H:%M:%S")
+    if isinstance(value, date):
+        return value.strftime(state["csv_date_format"])
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return "" if value is None else value
+
+
+@app.route('/spreadsheets/d/<file_id>/gviz/tq')
+def query(file_id):
+    """Filtered CSV export: header row plus the rows whose date cell in the given column matches"""
+    import openpyxl
+    from openpyxl.utils import column_index_from_string
+
+    _count("queries")
+    if state["delay"]:
+        time.sleep(state["delay"])
+    fail_status = state["query_fail_status"] or state["fail_status"]
+    if fail_status:
+        _count("failed")
+        return Response("query unavailable", status=fail_status)
+    if 'out:csv' not in request.args.get('tqx', ''):
+        return Response("unsupported output", status=400)
+    match = QUERY_RE.match(request.args.get('tq', ''))
+    if not match:
+        return Response("unsupported query", status=400)
+    column = column_index_from_string(match.group(1).upper()) - 1
+    wanted = datetime.strptime(match.group(2), "%Y-%m-%d").date()
+
+    content, _, _ = _load_workbook()
+    workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        sheet_name = request.args.get('sheet') or workbook.sheetnames[0]
+        if sheet_name not in workbook.sheetnames:
+            return Response(f"no worksheet named {sheet_name}", status=400)
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = next(rows, ())
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(["" if name is None else name for name in header])
+        for row in rows:
+            # Seperti gviz: sel teks di kolom bertipe tanggal tidak ikut dibandingkan
+            value = row[column] if column < len(row) else None
+            if not isinstance(value, date) or (value.date() if isinstance(value, datetime) else value) != wanted:
+                continue
+            row = tuple(row) + (None,) * (len(header) - len(row))
+            writer.writerow([_csv_cell(cell) for cell in row[:len(header)]])
+    finally:
+        workbook.close()
+
+    body = out.getvalue().encode()
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    if request.headers.get('If-None-Match') == etag:
+        _count("not_modified")
+        return Response(status=304, headers={"ETag": etag})
+    return Response(body, mimetype='text/csv', headers={"ETag": etag})
+
+
+@app.route('/_admin/config', methods=['POST'])
+def configure():
+    """Change behaviour at runtime, e.g. {"fail_status": 503}, {"query_fail_status": 404} or {"delay": 2}"""
+    config = request.get_json(force=True) or {}
+    for key in ("xlsx_path", "delay", "fail_status", "query_fail_status", "csv_date_format"):
+        if key in config:
+            state[key] = config[key]
+    return jsonify(state)
+
+
+@app.route('/_admin/stats')
+def admin_stats():
+    with stats_lock:
+        return jsonify(dict(stats))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local Google Sheets export stand-in")
+    parser.add_argument('--xlsx', required=True, help="workbook to serve")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--delay', type=float, default=0.0, help="seconds to wait before answering")
+    parser.add_argument('--csv-date-format', default=state["csv_date_format"], help="how dates are written in CSV exports")
+    parser.add_argument('--no-query', action='store_true', help="answer the filtered CSV export with 404")
+    args = parser.parse_args()
+
+    state["xlsx_path"] = args.xlsx
+    state["delay"] = args.delay
+    state["csv_date_format"] = args.csv_date_format
+    state["query_fail_status"] = 404 if args.no_query else None
+    app.run(host=args.host, port=args.port, threaded=True)
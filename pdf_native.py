@@ -0,0 +1,861 @@
+"""
+In-process DOCX -> PDF rendering for the report template.
+
+LibreOffice is a full office suite; for the one document shape we produce
+(heading paragraphs with an anchored logo and rule, a few lines of text, one
+bordered table and the notes) that is a lot of process, memory and latency
+per conversion. This module reads that structure from the DOCX and draws it
+with fpdf2: standard PDF fonts (Helvetica / Times / Courier stand in for
+Arial / Times New Roman / Courier New), the logo, the rule and the table with
+its borders and header shading.
+
+Anything outside that structure (numbering, fields, headers/footers, text
+boxes, merged cells, text outside Latin-1, ...) raises NativePdfUnsupported
+so the caller can fall back to LibreOffice instead of producing a wrong
+document.
+"""
+import hashlib
+import io
+import logging
+import posixpath
+import re
+import threading
+import zipfile
+
+from fpdf import FPDF
+from fpdf.enums import CellBordersLayout
+from fpdf.errors import FPDFException
+from fpdf.fonts import FontFace
+from fpdf.image_parsing import get_img_info
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+WP = "http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"
+A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+WPS = "http://schemas.microsoft.com/office/word/2010/wordprocessingShape"
+MC = "http://schemas.openxmlformats.org/markup-compatibility/2006"
+PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+EMU_PER_PT = 12700
+
+
+class NativePdfUnsupported(Exception):
+    """The document uses something the native renderer does not lay out"""
+
+
+def w(tag):
+    return f"{{{W}}}{tag}"
+
+
+def _attr(el, name, default=None):
+    if el is None:
+        return default
+    return el.get(w(name), default)
+
+
+def _twips(value, default=0.0):
+    try:
+        return float(value) / 20.0
+    except (TypeError, ValueError):
+        return default
+
+
+def _on(el):
+    """Value of a toggle property such as <w:b/> or <w:b w:val="0"/>"""
+    return _attr(el, "val", "true") not in ("0", "false", "off")
+
+
+def _rgb(hex_value):
+    if not hex_value or hex_value == "auto" or not re.fullmatch(r"[0-9A-Fa-f]{6}", hex_value):
+        return None
+    return tuple(int(hex_value[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def _local(el):
+    return etree.QName(el).localname if isinstance(el.tag, str) else None
+
+
+# ---------------------------------------------------------------------------
+# Fonts
+
+# Tinggi baris dan ascent per em dari font metrik-kompatibel (Liberation), seperti yang dipakai Word/LibreOffice
+FAMILY_METRICS = {
+    "Helvetica": (1.149, 0.905),
+    "Times": (1.150, 0.891),
+    "Courier": (1.133, 0.833),
+}
+SERIF_FONTS = ("times", "cambria", "georgia", "garamond", "book antiqua", "palatino", "liberation serif",
+               "dejavu serif", "noto serif")
+MONO_FONTS = ("courier", "consolas", "liberation mono", "dejavu sans mono", "lucida console", "menlo")
+
+
+def font_family(name):
+    lowered = (name or "").lower()
+    if any(lowered.startswith(font) for font in MONO_FONTS):
+        return "Courier"
+    if any(lowered.startswith(font) for font in SERIF_FONTS):
+        return "Times"
+    return "Helvetica"
+
+
+def encode_text(text):
+    """Text for the standard PDF fonts, which only cover Latin-1"""
+    try:
+        text.encode("latin-1")
+    except UnicodeEncodeError as e:
+        raise NativePdfUnsupported(f"character {text[e.start]!r} outside Latin-1")
+    return text
+
+
+class TextStyle:
+    __slots__ = ("font", "bold", "italic", "size", "color", "underline", "strike", "hidden")
+
+    def __init__(self, props):
+        self.font = font_family(props["font"])
+        for key in ("bold", "italic", "size", "color", "underline", "strike", "hidden"):
+            setattr(self, key, props[key])
+
+    @property
+    def emphasis(self):
+        return ("B" if self.bold else "") + ("I" if self.italic else "") + \
+            ("U" if self.underline else "") + ("S" if self.strike else "")
+
+    @property
+    def line_height(self):
+        return self.size * FAMILY_METRICS[self.font][0]
+
+    @property
+    def ascent(self):
+        return self.size * FAMILY_METRICS[self.font][1]
+
+    def key(self):
+        return self.font, self.emphasis, self.size, self.color
+
+    def font_face(self, fill=None):
+        return FontFace(family=self.font, emphasis=self.emphasis, size_pt=self.size,
+                        color=self.color or (0, 0, 0), fill_color=fill)
+
+
+# ---------------------------------------------------------------------------
+# Images
+
+# Logo sama di setiap laporan; hasil dekode dan kompresi fpdf2 disimpan per isi gambar
+_image_infos = {}
+_image_lock = threading.Lock()
+IMAGE_CACHE_SIZE = 16
+
+
+def add_image(pdf, content):
+    """Register an image with the document, decoding each distinct image once per process"""
+    key = hashlib.md5(content.strip(), usedforsecurity=False).hexdigest()
+    with _image_lock:
+        info = _image_infos.get(key)
+    if info is None:
+        info = get_img_info(key, io.BytesIO(content), pdf.image_cache.image_filter)
+        if info.get("iccp") is not None:
+            return
+        with _image_lock:
+            if len(_image_infos) >= IMAGE_CACHE_SIZE:
+                _image_infos.pop(next(iter(_image_infos)))
+            _image_infos[key] = info
+    if key not in pdf.image_cache.images:
+        # pdf.image() mencari gambar dengan md5 yang sama dan menaikkan usages
+        entry = type(info)(info)
+        entry.update(i=len(pdf.image_cache.images) + 1, usages=0, iccp_i=None)
+        pdf.image_cache.images[key] = entry
+
+
+# ---------------------------------------------------------------------------
+# DOCX package and style resolution
+
+class DocxPackage:
+    def __init__(self, content):
+        try:
+            self.zip = zipfile.ZipFile(io.BytesIO(content))
+        except zipfile.BadZipFile:
+            raise NativePdfUnsupported("not a DOCX file")
+        self.document = self._xml("word/document.xml")
+        if self.document is None:
+            raise NativePdfUnsupported("DOCX without word/document.xml")
+        self.rels = self._rels("word/document.xml")
+        self.styles = {}
+        self.default_style = {}
+        self.default_rpr = None
+        self.default_ppr = None
+        styles = self._xml("word/styles.xml")
+        if styles is not None:
+            for style in styles.iter(w("style")):
+                self.styles[_attr(style, "styleId")] = style
+                if _attr(style, "default") in ("1", "true"):
+                    self.default_style[_attr(style, "type")] = _attr(style, "styleId")
+            defaults = styles.find(w("docDefaults"))
+            if defaults is not None:
+                self.default_rpr = defaults.find(f"{w('rPrDefault')}/{w('rPr')}")
+                self.default_ppr = defaults.find(f"{w('pPrDefault')}/{w('pPr')}")
+
+        settings = self._xml("word/settings.xml")
+        self.default_tab = _twips(_attr(settings.find(w("defaultTabStop")), "val") if settings is not None else None,
+                                  36.0) or 36.0
+        self.compat_mode = 12
+        if settings is not None:
+            for setting in settings.iter(w("compatSetting")):
+                if _attr(setting, "name") == "compatibilityMode":
+                    self.compat_mode = int(_attr(setting, "val", "12"))
+
+        self.theme_fonts = {}
+        theme_target = next((target for target, kind in self.rels.values() if kind.endswith("/theme")), None)
+        theme = self._xml(self._resolve(theme_target)) if theme_target else None
+        if theme is not None:
+            for scheme, prefix in (("majorFont", "major"), ("minorFont", "minor")):
+                latin = theme.find(f".//{{{A}}}{scheme}/{{{A}}}latin")
+                if latin is not None:
+                    self.theme_fonts[prefix] = latin.get("typeface")
+
+    def _xml(self, name):
+        try:
+            return etree.fromstring(self.zip.read(name))
+        except KeyError:
+            return None
+
+    def _rels(self, part):
+        directory, name = posixpath.split(part)
+        rels = self._xml(posixpath.join(directory, "_rels", name + ".rels"))
+        if rels is None:
+            return {}
+        return {rel.get("Id"): (rel.get("Target"), rel.get("Type", "")) for rel in rels.iter(f"{{{PKG_REL}}}Relationship")
+                if rel.get("TargetMode") != "External"}
+
+    def _resolve(self, target):
+        return posixpath.normpath(posixpath.join("word", target)) if not target.startswith("/") else target[1:]
+
+    def related_bytes(self, rel_id):
+        target = self.rels.get(rel_id)
+        if target is None:
+            raise NativePdfUnsupported("linked (external) image")
+        return self.zip.read(self._resolve(target[0]))
+
+    def style_chain(self, style_id, kind):
+        """Style elements from the root of the basedOn chain down to style_id"""
+        if style_id is None:
+            style_id = self.default_style.get(kind)
+        chain, seen = [], set()
+        while style_id and style_id not in seen and style_id in self.styles:
+            seen.add(style_id)
+            style = self.styles[style_id]
+            chain.append(style)
+            style_id = _attr(style.find(w("basedOn")), "val")
+        return list(reversed(chain))
+
+
+def _merge_rpr(props, rpr, theme_fonts):
+    if rpr is None:
+        return props
+    props = dict(props)
+    fonts = rpr.find(w("rFonts"))
+    if fonts is not None:
+        name = _attr(fonts, "ascii") or _attr(fonts, "hAnsi")
+        theme = _attr(fonts, "asciiTheme") or _attr(fonts, "hAnsiTheme")
+        if name:
+            props["font"] = name
+        elif theme:
+            props["font"] = theme_fonts.get("major" if theme.startswith("major") else "minor", "Calibri")
+    for tag, key in (("b", "bold"), ("i", "italic"), ("strike", "strike"), ("vanish", "hidden")):
+        el = rpr.find(w(tag))
+        if el is not None:
+            props[key] = _on(el)
+    size = rpr.find(w("sz"))
+    if size is not None:
+        try:
+            props["size"] = float(_attr(size, "val")) / 2.0
+        except (TypeError, ValueError):
+            pass
+    color = rpr.find(w("color"))
+    if color is not None:
+        props["color"] = _rgb(_attr(color, "val"))
+    underline = rpr.find(w("u"))
+    if underline is not None:
+        props["underline"] = _attr(underline, "val", "single") != "none"
+    return props
+
+
+def _merge_ppr(props, ppr):
+    if ppr is None:
+        return props
+    props = dict(props)
+    for tag in ("numPr", "pBdr", "framePr", "shd"):
+        el = ppr.find(w(tag))
+        if el is not None:
+            if tag == "numPr" and _attr(el.find(w("numId")), "val", "0") == "0":
+                continue
+            if tag == "shd" and _attr(el, "fill", "auto") in ("auto", "FFFFFF"):
+                continue
+            raise NativePdfUnsupported(f"paragraph property {tag}")
+    jc = ppr.find(w("jc"))
+    if jc is not None:
+        props["jc"] = {"start": "left", "end": "right", "distribute": "both"}.get(_attr(jc, "val"), _attr(jc, "val"))
+    ind = ppr.find(w("ind"))
+    if ind is not None:
+        for attr, key in (("left", "left"), ("start", "left"), ("right", "right"), ("end", "right")):
+            if _attr(ind, attr) is not None:
+                props[key] = _twips(_attr(ind, attr))
+        if _attr(ind, "firstLine") is not None:
+            props["first_line"] = _twips(_attr(ind, "firstLine"))
+        if _attr(ind, "hanging") is not None:
+            props["first_line"] = -_twips(_attr(ind, "hanging"))
+    spacing = ppr.find(w("spacing"))
+    if spacing is not None:
+        if _attr(spacing, "before") is not None:
+            props["before"] = _twips(_attr(spacing, "before"))
+        if _attr(spacing, "after") is not None:
+            props["after"] = _twips(_attr(spacing, "after"))
+        if _attr(spacing, "line") is not None:
+            props["line"] = float(_attr(spacing, "line"))
+            props["line_rule"] = _attr(spacing, "lineRule", "auto")
+    tabs = ppr.find(w("tabs"))
+    if tabs is not None:
+        stops = dict(props.get("tabs", ()))
+        for tab in tabs.findall(w("tab")):
+            position = _twips(_attr(tab, "pos"))
+            if _attr(tab, "val") == "clear":
+                stops.pop(position, None)
+            elif _attr(tab, "val", "left") not in ("left", "start"):
+                raise NativePdfUnsupported(f"{_attr(tab, 'val')} tab stop")
+            else:
+                stops[position] = "left"
+        props["tabs"] = tuple(sorted(stops))
+    page_break = ppr.find(w("pageBreakBefore"))
+    if page_break is not None:
+        props["page_break_before"] = _on(page_break)
+    return props
+
+
+BASE_PPR = {"jc": "left", "left": 0.0, "right": 0.0, "first_line": 0.0, "before": 0.0, "after": 0.0,
+            "line": 240.0, "line_rule": "auto", "tabs": (), "page_break_before": False}
+BASE_RPR = {"font": "Times New Roman", "bold": False, "italic": False, "size": 10.0, "color": None,
+            "underline": False, "strike": False, "hidden": False}
+
+
+class Paragraph:
+    """Resolved properties and content of one w:p"""
+
+    def __init__(self, ppr, mark_style, tokens, anchors, section_break):
+        self.ppr = ppr
+        self.mark_style = mark_style
+        self.tokens = tokens        # (kind, style, text) dengan kind "text", "tab" atau "break"
+        self.anchors = anchors
+        self.section_break = section_break
+
+    def line_height(self, styles):
+        rule, value = self.ppr["line_rule"], self.ppr["line"]
+        natural = max(style.line_height for style in styles or [self.mark_style])
+        if rule == "exact":
+            return value / 20.0
+        if rule == "atLeast":
+            return max(value / 20.0, natural)
+        return natural * value / 240.0
+
+
+class Section:
+    def __init__(self, sect_pr):
+        if sect_pr is None:
+            raise NativePdfUnsupported("document without section properties")
+        for tag in ("headerReference", "footerReference", "titlePg", "pgBorders", "lnNumType", "vAlign"):
+            if sect_pr.find(w(tag)) is not None:
+                raise NativePdfUnsupported(f"section property {tag}")
+        cols = sect_pr.find(w("cols"))
+        if cols is not None and int(_attr(cols, "num", "1")) > 1:
+            raise NativePdfUnsupported("multiple columns")
+        size = sect_pr.find(w("pgSz"))
+        margin = sect_pr.find(w("pgMar"))
+        self.page = (_twips(_attr(size, "w"), 612.0), _twips(_attr(size, "h"), 792.0))
+        self.margins = tuple(_twips(_attr(margin, side), 72.0) for side in ("top", "right", "bottom", "left"))
+
+    def same_page(self, other):
+        return (self.page, self.margins) == (other.page, other.margins)
+
+
+# ---------------------------------------------------------------------------
+# Renderer
+
+_WORDS = re.compile(r"[^ ]+| ")
+_VALIGN = {"top": "TOP", "center": "MIDDLE", "bottom": "BOTTOM"}
+_ALIGN = {"left": "LEFT", "center": "CENTER", "right": "RIGHT", "both": "JUSTIFY"}
+_SIDES = (("left", CellBordersLayout.LEFT), ("right", CellBordersLayout.RIGHT),
+          ("top", CellBordersLayout.TOP), ("bottom", CellBordersLayout.BOTTOM))
+
+
+class Renderer:
+    def __init__(self, package):
+        self.package = package
+        body = package.document.find(w("body"))
+        if body is None:
+            raise NativePdfUnsupported("document without body")
+        self.body = body
+        section = Section(body.find(w("sectPr")))
+        self.section = section
+        self.width, self.height = section.page
+        self.top, self.right, self.bottom, self.left = section.margins
+        self.pdf = FPDF(unit="pt", format=section.page)
+        self.pdf.set_margins(self.left, self.top, self.right)
+        self.pdf.set_auto_page_break(True, self.bottom)
+        self.floats = []
+
+    @property
+    def y(self):
+        return self.pdf.get_y()
+
+    def new_page(self):
+        self.pdf.add_page()
+        self.floats = []
+
+    def render(self):
+        self.new_page()
+        for child in self.body:
+            tag = _local(child)
+            if tag == "p":
+                self.body_paragraph(child)
+            elif tag == "tbl":
+                self.table(child)
+            elif tag not in ("sectPr", "bookmarkStart", "bookmarkEnd", "proofErr", None):
+                raise NativePdfUnsupported(f"body element {tag}")
+        try:
+            return bytes(self.pdf.output())
+        except FPDFException as e:
+            raise NativePdfUnsupported(str(e))
+
+    # -- paragraphs -------------------------------------------------------
+
+    def paragraph(self, p, in_table=False):
+        package = self.package
+        ppr_el = p.find(w("pPr"))
+        style_id = _attr(ppr_el.find(w("pStyle")), "val") if ppr_el is not None else None
+
+        ppr = _merge_ppr(BASE_PPR, package.default_ppr)
+        rpr = _merge_rpr(BASE_RPR, package.default_rpr, package.theme_fonts)
+        for style in package.style_chain(style_id, "paragraph"):
+            ppr = _merge_ppr(ppr, style.find(w("pPr")))
+            rpr = _merge_rpr(rpr, style.find(w("rPr")), package.theme_fonts)
+        ppr = _merge_ppr(ppr, ppr_el)
+
+        mark_rpr = ppr_el.find(w("rPr")) if ppr_el is not None else None
+        mark_style = TextStyle(_merge_rpr(rpr, mark_rpr, package.theme_fonts))
+        section_break = ppr_el is not None and ppr_el.find(w("sectPr")) is not None
+        if section_break:
+            if in_table or not Section(ppr_el.find(w("sectPr"))).same_page(self.section):
+                raise NativePdfUnsupported("section with a different page setup")
+
+        tokens, anchors = [], []
+        self._collect_runs(p, rpr, tokens, anchors, in_table)
+        return Paragraph(ppr, mark_style, tokens, anchors, section_break)
+
+    def _collect_runs(self, parent, rpr, tokens, anchors, in_table):
+        for child in parent:
+            tag = _local(child)
+            if tag == "r":
+                self._run(child, rpr, tokens, anchors, in_table)
+            elif tag in ("hyperlink", "ins", "smartTag", "customXml"):
+                self._collect_runs(child, rpr, tokens, anchors, in_table)
+            elif tag in ("pPr", "proofErr", "bookmarkStart", "bookmarkEnd", "del", "permStart", "permEnd",
+                         "commentRangeStart", "commentRangeEnd", None):
+                continue
+            elif child.find(f".//{w('t')}") is not None or child.find(f".//{{{WP}}}anchor") is not None:
+                raise NativePdfUnsupported(f"paragraph content {tag}")
+
+    def _run(self, run, rpr, tokens, anchors, in_table):
+        package = self.package
+        run_rpr = run.find(w("rPr"))
+        props = rpr
+        if run_rpr is not None:
+            style_id = _attr(run_rpr.find(w("rStyle")), "val")
+            if style_id:
+                for style in package.style_chain(style_id, "character"):
+                    props = _merge_rpr(props, style.find(w("rPr")), package.theme_fonts)
+            if _attr(run_rpr.find(w("vertAlign")), "val", "baseline") != "baseline":
+                raise NativePdfUnsupported("superscript/subscript text")
+            props = _merge_rpr(props, run_rpr, package.theme_fonts)
+        style = TextStyle(props)
+
+        for child in run:
+            tag = _local(child)
+            if tag == "t":
+                if not style.hidden and child.text:
+                    tokens.append(("text", style, encode_text(child.text)))
+            elif tag == "tab":
+                tokens.append(("tab", style, "\t"))
+            elif tag in ("br", "cr"):
+                kind = _attr(child, "type", "textWrapping")
+                if kind == "column" or (kind == "page" and in_table):
+                    raise NativePdfUnsupported(f"{kind} break")
+                tokens.append(("break", style, "page" if kind == "page" else "line"))
+            elif tag == "noBreakHyphen":
+                tokens.append(("text", style, "-"))
+            elif tag in ("rPr", "softHyphen", "lastRenderedPageBreak", "proofErr", None):
+                continue
+            elif tag == "drawing":
+                self._drawing(child, anchors, in_table)
+            elif tag == "AlternateContent" and child.tag == f"{{{MC}}}AlternateContent":
+                choice = child.find(f"{{{MC}}}Choice")
+                drawing = choice.find(w("drawing")) if choice is not None else None
+                if drawing is None:
+                    raise NativePdfUnsupported("alternate content without a drawing")
+                self._drawing(drawing, anchors, in_table)
+            else:
+                raise NativePdfUnsupported(f"run content {tag}")
+
+    def _drawing(self, drawing, anchors, in_table):
+        for frame in drawing:
+            if _local(frame) != "anchor" or in_table:
+                raise NativePdfUnsupported("inline drawing or drawing inside a table")
+            extent = frame.find(f"{{{WP}}}extent")
+            size = (int(extent.get("cx", 0)) / EMU_PER_PT, int(extent.get("cy", 0)) / EMU_PER_PT)
+            anchors.append((frame, size, self._graphic(frame.find(f"{{{A}}}graphic/{{{A}}}graphicData"))))
+
+    def _graphic(self, graphic):
+        if graphic is None:
+            raise NativePdfUnsupported("empty drawing")
+        if graphic.get("uri", "").endswith("/picture"):
+            blip = graphic.find(f".//{{{A}}}blip")
+            rel_id = blip.get(f"{{{R}}}embed") if blip is not None else None
+            if not rel_id:
+                raise NativePdfUnsupported("picture without embedded image")
+            return "image", self.package.related_bytes(rel_id)
+        shape = graphic.find(f"{{{WPS}}}wsp")
+        if shape is None:
+            raise NativePdfUnsupported("unsupported graphic")
+        geometry = shape.find(f".//{{{A}}}prstGeom")
+        if geometry is None or geometry.get("prst") not in ("line", "straightConnector1"):
+            raise NativePdfUnsupported("shape other than a straight line")
+        if shape.find(f"{{{WPS}}}txbx") is not None:
+            raise NativePdfUnsupported("text box")
+        outline = shape.find(f".//{{{WPS}}}spPr/{{{A}}}ln")
+        if outline is not None and outline.find(f"{{{A}}}noFill") is not None:
+            return "none", None
+        width = int(outline.get("w", 9525)) / EMU_PER_PT if outline is not None else 0.75
+        srgb = outline.find(f"{{{A}}}solidFill/{{{A}}}srgbClr") if outline is not None else None
+        xfrm = shape.find(f".//{{{WPS}}}spPr/{{{A}}}xfrm")
+        flip = tuple(xfrm is not None and xfrm.get(name) == "1" for name in ("flipH", "flipV"))
+        return "line", (width, _rgb(srgb.get("val")) if srgb is not None else None, flip)
+
+    def place_anchors(self, anchors, paragraph_top):
+        pdf = self.pdf
+        column_width = self.width - self.left - self.right
+        for frame, (width, height), (kind, content) in anchors:
+            x = self._anchor_axis(frame.find(f"{{{WP}}}positionH"), width, {
+                "margin": (self.left, column_width), "column": (self.left, column_width),
+                "character": (self.left, column_width), "page": (0.0, self.width),
+            })
+            y = self._anchor_axis(frame.find(f"{{{WP}}}positionV"), height, {
+                "paragraph": (paragraph_top, 0.0), "line": (paragraph_top, 0.0),
+                "margin": (self.top, self.height - self.top - self.bottom), "page": (0.0, self.height),
+            })
+            if kind == "image":
+                try:
+                    add_image(pdf, content)
+                    pdf.image(io.BytesIO(content), x, y, width, height)
+                except Exception as e:
+                    raise NativePdfUnsupported(f"image: {str(e)}")
+            elif kind == "line":
+                line_width, color, (flip_h, flip_v) = content
+                pdf.set_line_width(line_width)
+                pdf.set_draw_color(*(color or (0, 0, 0)))
+                pdf.line(x + (width if flip_h else 0), y + (height if flip_v else 0),
+                         x + (0 if flip_h else width), y + (0 if flip_v else height))
+
+            wrap = next((_local(el) for el in frame if (_local(el) or "").startswith("wrap")), "wrapNone")
+            if wrap in ("wrapSquare", "wrapTight", "wrapThrough") and kind == "image":
+                dist = [int(frame.get(name, 0)) / EMU_PER_PT for name in ("distT", "distB", "distL", "distR")]
+                self.floats.append((x - dist[2], y - dist[0], x + width + dist[3], y + height + dist[1]))
+            elif wrap not in ("wrapNone", "wrapSquare", "wrapTight", "wrapThrough"):
+                raise NativePdfUnsupported(f"anchor {wrap}")
+
+    @staticmethod
+    def _anchor_axis(position, size, references):
+        if position is None or position.get("relativeFrom") not in references:
+            raise NativePdfUnsupported("anchor position")
+        origin, extent = references[position.get("relativeFrom")]
+        offset = position.find(f"{{{WP}}}posOffset")
+        if offset is not None:
+            return origin + int(offset.text) / EMU_PER_PT
+        align = position.find(f"{{{WP}}}align")
+        value = align.text if align is not None else "left"
+        if value == "center":
+            return origin + (extent - size) / 2
+        if value in ("right", "bottom", "outside"):
+            return origin + extent - size
+        return origin
+
+    def text_area(self, top, height):
+        """Left/right of the body text between top and top + height, beside floating images"""
+        left, right = self.left, self.width - self.right
+        for x1, y1, x2, y2 in self.floats:
+            if top + height <= y1 or top >= y2:
+                continue
+            if (x1 + x2) / 2 <= (left + right) / 2:
+                left = max(left, x2)
+            else:
+                right = min(right, x1)
+        return left, right
+
+    def lines(self, paragraph, width_for):
+        """
+        Break the paragraph into lines of (x, style, text) pieces.
+        width_for(line_index) returns (left, right) of the text area for that line.
+        """
+        pdf, ppr, tab = self.pdf, paragraph.ppr, self.package.default_tab
+        pieces = [(kind, style, piece) for kind, style, text in paragraph.tokens
+                  for piece in (_WORDS.findall(text) if kind == "text" else [text])]
+        index, line_no = 0, 0
+        while True:
+            left, right = width_for(line_no)
+            line_left = left + ppr["left"] + (ppr["first_line"] if line_no == 0 else 0.0)
+            avail = right - ppr["right"] - line_left
+            items, x, page_break = [], 0.0, False
+            while index < len(pieces):
+                kind, style, text = pieces[index]
+                if kind == "break":
+                    index += 1
+                    page_break = text == "page"
+                    break
+                if kind == "tab":
+                    position = line_left + x - self.left
+                    stop = next((stop for stop in ppr["tabs"] if stop > position + 0.01), None)
+                    x = (stop if stop is not None else (int(position / tab) + 1) * tab) - (line_left - self.left)
+                    items.append((x, None, ""))
+                    index += 1
+                    continue
+                pdf.set_font(style.font, style.emphasis.replace("U", "").replace("S", ""), style.size)
+                width = pdf.get_string_width(text)
+                if text != " " and x + width > avail + 0.01 and any(piece != " " for _, _, piece in items):
+                    break
+                items.append((x, style, text))
+                x += width
+                index += 1
+            yield line_left, avail, items, page_break, index >= len(pieces)
+            if index >= len(pieces):
+                return
+            line_no += 1
+
+    def body_paragraph(self, p):
+        paragraph = self.paragraph(p)
+        ppr = paragraph.ppr
+        if ppr["page_break_before"] and self.y > self.top:
+            self.new_page()
+        self.pdf.set_y(self.y + ppr["before"])
+        self.place_anchors(paragraph.anchors, self.y)
+
+        estimate = paragraph.line_height([style for kind, style, _ in paragraph.tokens if kind == "text"])
+
+        def width_for(line_no):
+            if self.y + estimate > self.height - self.bottom and self.y > self.top:
+                self.new_page()
+            return self.text_area(self.y, estimate)
+
+        for line_left, avail, items, page_break, last in self.lines(paragraph, width_for):
+            height = paragraph.line_height([style for _, style, _ in items if style is not None])
+            if self.y + height > self.height - self.bottom and self.y > self.top:
+                self.new_page()
+            self.draw_line(paragraph, line_left, avail, items, self.y, height, last or page_break)
+            self.pdf.set_y(self.y + height)
+            if page_break:
+                self.new_page()
+        if paragraph.section_break:
+            self.new_page()
+        else:
+            self.pdf.set_y(self.y + ppr["after"])
+
+    def draw_line(self, paragraph, line_left, avail, items, top, height, last):
+        pdf = self.pdf
+        while items and (items[-1][1] is None or items[-1][2] == " "):
+            items = items[:-1]
+        if not items:
+            return
+        x_end, style, text = items[-1]
+        pdf.set_font(style.font, style.emphasis, style.size)
+        slack = avail - x_end - pdf.get_string_width(text)
+        styles = [style for _, style, _ in items if style is not None]
+        natural = max(style.line_height for style in styles)
+        ascent = max(style.ascent for style in styles)
+        baseline = top + (ascent * height / natural if paragraph.ppr["line_rule"] == "auto" else ascent)
+
+        jc, offset, extra = paragraph.ppr["jc"], 0.0, 0.0
+        if jc == "center":
+            offset = slack / 2
+        elif jc == "right":
+            offset = slack
+        elif jc == "both" and not last:
+            spaces = sum(1 for _, _, text in items if text == " ")
+            extra = slack / spaces if spaces else 0.0
+
+        # Potongan bergaya sama digabung jadi satu teks, kecuali dipisah tab; pada rata kiri-kanan spasi melebar
+        runs, shift = [], 0.0
+        for x, style, text in items:
+            if style is None or (text == " " and extra):
+                shift += extra if style is not None else 0.0
+                runs.append(None)
+            elif runs and runs[-1] is not None and runs[-1][1].key() == style.key():
+                runs[-1][2] += text
+            else:
+                runs.append([line_left + offset + x + shift, style, text])
+        for run in filter(None, runs):
+            x, style, text = run
+            pdf.set_font(style.font, style.emphasis, style.size)
+            pdf.set_text_color(*(style.color or (0, 0, 0)))
+            pdf.text(x, baseline, text)
+
+    # -- tables -----------------------------------------------------------
+
+    def table(self, tbl):
+        package = self.package
+        tbl_pr = tbl.find(w("tblPr"))
+        chain = package.style_chain(_attr(tbl_pr.find(w("tblStyle")), "val") if tbl_pr is not None else None, "table")
+        if any(style.find(w("tblStylePr")) is not None for style in chain):
+            raise NativePdfUnsupported("table style with conditional formatting")
+
+        borders, margins, indent, jc = {}, {"top": 0.0, "bottom": 0.0, "left": 5.4, "right": 5.4}, 0.0, "left"
+        for props in [style.find(w("tblPr")) for style in chain] + [tbl_pr]:
+            if props is None:
+                continue
+            borders.update(self._sides(props.find(w("tblBorders")), self._border))
+            margins.update(self._sides(props.find(w("tblCellMar")), lambda side: _twips(_attr(side, "w"))))
+            if props.find(w("tblInd")) is not None:
+                indent = _twips(_attr(props.find(w("tblInd")), "w"))
+            if props.find(w("jc")) is not None:
+                jc = _attr(props.find(w("jc")), "val")
+
+        grid = [_twips(_attr(col, "w")) for col in tbl.findall(f"{w('tblGrid')}/{w('gridCol')}")]
+        if not grid:
+            raise NativePdfUnsupported("table without grid")
+        if jc == "center":
+            x0 = (self.left + self.width - self.right - sum(grid)) / 2
+        elif jc in ("right", "end"):
+            x0 = self.width - self.right - sum(grid)
+        else:
+            # Sebelum Word 2013 tabel digeser ke kiri selebar margin sel
+            x0 = self.left + indent - (margins["left"] if package.compat_mode < 15 else 0.0)
+
+        rows = [self._table_row(tr, len(grid), margins) for tr in tbl.findall(w("tr"))]
+        headers = next((index for index, row in enumerate(rows) if not row["header"]), len(rows))
+        cell_borders = self._cell_borders(rows, borders)
+        used = {border for row in cell_borders for cell in row for border in cell.values() if border is not None}
+        if len(used) > 1:
+            raise NativePdfUnsupported("table borders with different widths or colors")
+        line_width, color = used.pop() if used else (0.5, None)
+
+        pdf = self.pdf
+        pdf.set_line_width(line_width)
+        pdf.set_draw_color(*(color or (0, 0, 0)))
+        page = pdf.page
+        pdf.set_left_margin(x0)
+        try:
+            with pdf.table(col_widths=grid, width=sum(grid), align="LEFT", first_row_as_headings=headers > 0,
+                           num_heading_rows=max(headers, 1), repeat_headings=1, headings_style=FontFace(),
+                           line_height=max(row["line_height"] for row in rows) if rows else None,
+                           borders_layout="NONE") as table:
+                for row, sides in zip(rows, cell_borders):
+                    table_row = table.row()
+                    for cell, cell_sides in zip(row["cells"], sides):
+                        layout = CellBordersLayout(0)
+                        for side, flag in _SIDES:
+                            if cell_sides[side] is not None:
+                                layout |= flag
+                        table_row.cell(cell["text"], align=cell["align"], v_align=cell["valign"],
+                                       style=cell["style"], padding=cell["padding"], border=layout)
+        except FPDFException as e:
+            raise NativePdfUnsupported(f"table: {str(e)}")
+        finally:
+            pdf.set_left_margin(self.left)
+        if pdf.page != page:
+            self.floats = []
+
+    @staticmethod
+    def _sides(element, value):
+        if element is None:
+            return {}
+        return {{"start": "left", "end": "right"}.get(_local(side), _local(side)): value(side)
+                for side in element if _local(side)}
+
+    @staticmethod
+    def _border(side):
+        if _attr(side, "val", "single") in ("nil", "none"):
+            return None
+        if _attr(side, "val", "single") != "single":
+            raise NativePdfUnsupported(f"{_attr(side, 'val')} border")
+        return max(float(_attr(side, "sz", "4")) / 8.0, 0.25), _rgb(_attr(side, "color"))
+
+    def _table_row(self, tr, columns, table_margins):
+        tr_pr = tr.find(w("trPr"))
+        if tr_pr is not None and any(tr_pr.find(w(tag)) is not None for tag in ("gridBefore", "gridAfter", "trHeight")):
+            raise NativePdfUnsupported("row with grid offsets or a fixed height")
+        header = tr_pr is not None and tr_pr.find(w("tblHeader")) is not None and _on(tr_pr.find(w("tblHeader")))
+        cells, line_height = [], 0.0
+        for tc in tr.findall(w("tc")):
+            tc_pr = tc.find(w("tcPr"))
+            margins, fill, valign, explicit = dict(table_margins), None, "top", {}
+            if tc_pr is not None:
+                if tc_pr.find(w("vMerge")) is not None or _attr(tc_pr.find(w("gridSpan")), "val", "1") != "1":
+                    raise NativePdfUnsupported("merged cells")
+                margins.update(self._sides(tc_pr.find(w("tcMar")), lambda side: _twips(_attr(side, "w"))))
+                fill = _rgb(_attr(tc_pr.find(w("shd")), "fill"))
+                valign = _attr(tc_pr.find(w("vAlign")), "val", "top")
+                explicit = self._sides(tc_pr.find(w("tcBorders")), self._border)
+
+            # Isi sel cukup teks polos: satu gaya dan satu perataan untuk semua paragrafnya
+            texts, styles, aligns = [], set(), set()
+            for child in tc:
+                tag = _local(child)
+                if tag == "p":
+                    paragraph = self.paragraph(child, in_table=True)
+                    if paragraph.anchors or paragraph.ppr["before"] or paragraph.ppr["after"] or \
+                            any(kind != "text" for kind, _, _ in paragraph.tokens):
+                        raise NativePdfUnsupported("formatted table cell")
+                    texts.append("".join(text for _, _, text in paragraph.tokens))
+                    runs = [style for _, style, _ in paragraph.tokens] or [paragraph.mark_style]
+                    styles.update(style.key() for style in runs)
+                    aligns.add(paragraph.ppr["jc"])
+                    line_height = max(line_height, paragraph.line_height(runs))
+                    style = runs[0]
+                elif tag not in ("tcPr", "bookmarkStart", "bookmarkEnd", "proofErr", None):
+                    raise NativePdfUnsupported(f"cell content {tag}")
+            if len(styles) != 1 or len(aligns) != 1 or aligns - set(_ALIGN):
+                raise NativePdfUnsupported("mixed formatting inside a table cell")
+            cells.append({
+                "text": "\n".join(texts), "style": style.font_face(fill), "align": _ALIGN[aligns.pop()],
+                "valign": _VALIGN.get(valign, "TOP"), "explicit": explicit,
+                "padding": (margins["top"], margins["right"], margins["bottom"], margins["left"]),
+            })
+        if len(cells) != columns:
+            raise NativePdfUnsupported("row that does not fill the table grid")
+        return {"cells": cells, "header": header, "line_height": line_height}
+
+    @staticmethod
+    def _cell_borders(rows, borders):
+        """Border of every cell side; a cell's own tcBorders win over its neighbour's and the table's"""
+        def side(row, column, name, neighbour, opposite, outer):
+            explicit = rows[row]["cells"][column]["explicit"]
+            if name in explicit:
+                return explicit[name]
+            if neighbour is not None:
+                other = rows[neighbour[0]]["cells"][neighbour[1]]["explicit"]
+                if opposite in other:
+                    return other[opposite]
+            inner = "insideV" if name in ("left", "right") else "insideH"
+            return borders.get(name if outer else inner)
+
+        result = []
+        for r, row in enumerate(rows):
+            last_column = len(row["cells"]) - 1
+            result.append([{
+                "left": side(r, c, "left", (r, c - 1) if c else None, "right", c == 0),
+                "right": side(r, c, "right", (r, c + 1) if c < last_column else None, "left", c == last_column),
+                "top": side(r, c, "top", (r - 1, c) if r else None, "bottom", r == 0),
+                "bottom": side(r, c, "bottom", (r + 1, c) if r < len(rows) - 1 else None, "top", r == len(rows) - 1),
+            } for c in range(len(row["cells"]))])
+        return result
+
+
+def docx_to_pdf(docx_content):
+    """Render a DOCX produced from the report template to PDF bytes"""
+    return Renderer(DocxPackage(docx_content)).render()
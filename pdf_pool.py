@@ -0,0 +1,487 @@
+"""
+Pool of warm headless LibreOffice workers for DOCX -> PDF conversion.
+
+Each worker owns a private LibreOffice profile (-env:UserInstallation), so
+parallel conversions never fight over the default profile. When the Python
+UNO bridge is available a worker keeps one soffice process running and
+converts through it; otherwise it runs `soffice --convert-to` per job against
+its already-initialised profile. Jobs are fed through a bounded queue, hung or
+crashed workers are restarted, and stats() reports the pool state for /status.
+
+Conversions do not touch persistent disk: the resident worker streams the
+DOCX in and the PDF out over the UNO bridge (private:stream), and the CLI
+worker, which needs real files, reuses one slot directory in the pool
+workspace. The workspace (profiles and slots) lives on tmpfs (/dev/shm) when
+available, or wherever PDF_WORKSPACE points.
+"""
+import atexit
+import functools
+import importlib.util
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+LIBREOFFICE_PATH = os.environ.get("LIBREOFFICE_PATH", "/usr/bin/libreoffice")
+# 0 = worker UNO tetap lewat file di slot workspace (untuk build LibreOffice yang bermasalah dengan stream)
+PDF_UNO_STREAM = os.environ.get("PDF_UNO_STREAM", "1") != "0"
+
+class PoolBusyError(Exception):
+    """Raised when the conversion queue is full"""
+
+
+class ConversionTimeout(Exception):
+    """Raised when a conversion does not finish in time"""
+
+
+class _Job:
+    def __init__(self, docx_content, base_filename):
+        self.docx_content = docx_content
+        self.base_filename = base_filename
+        self.enqueued_at = time.monotonic()
+        self.done = threading.Event()
+        self.cancelled = False
+        self.result = None
+        self.error = None
+
+
+def default_workspace():
+    """PDF_WORKSPACE, else /dev/shm when it is a usable tmpfs, else the system temp dir"""
+    configured = os.environ.get("PDF_WORKSPACE")
+    if configured:
+        return configured
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK | os.X_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+def filesystem_type(path):
+    """Filesystem of path from /proc/mounts (e.g. 'tmpfs'), None when unknown"""
+    path = os.path.realpath(path)
+    best, fs_type = "", None
+    try:
+        with open("/proc/mounts") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mount_point = parts[1].replace("\\040", " ")
+                inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+                if inside and len(mount_point) > len(best):
+                    best, fs_type = mount_point, parts[2]
+    except OSError:
+        return None
+    return fs_type
+
+
+@functools.lru_cache(maxsize=None)
+def _memory_output_stream_class():
+    import unohelper
+    from com.sun.star.io import XOutputStream
+
+    class MemoryOutputStream(unohelper.Base, XOutputStream):
+        """XOutputStream that keeps the exported PDF in memory"""
+
+        def __init__(self):
+            self.chunks = []
+
+        def writeBytes(self, data):
+            self.chunks.append(data.value)
+
+        def flush(self):
+            pass
+
+        def closeOutput(self):
+            pass
+
+        def getvalue(self):
+            return b"".join(self.chunks)
+
+    return MemoryOutputStream
+
+
+def _office_env():
+    env = os.environ.copy()
+    if 'HOME' not in env:
+        env['HOME'] = '/root'
+    return env
+
+
+class _Worker(threading.Thread):
+    def __init__(self, pool, index):
+        super().__init__(name=f"pdf-worker-{index}", daemon=True)
+        self.pool = pool
+        self.index = index
+        self.profile_dir = os.path.join(pool.base_dir, f"worker-{index}")
+        self.profile_url = Path(self.profile_dir).as_uri()
+        # Slot dipakai ulang untuk setiap job CLI; isinya dihapus setelah konversi
+        self.slot_dir = os.path.join(pool.base_dir, f"slot-{index}")
+        os.makedirs(self.slot_dir, exist_ok=True)
+        self.pipe_name = f"autoreport_{os.getpid()}_{index}"
+        self.process = None
+        self.context = None
+        self.desktop = None
+        self.busy_since = None
+        self.hung = False
+        self.state = "starting"
+        self.jobs = 0
+        self.failures = 0
+        self.restarts = 0
+
+    # -- lifecycle -------------------------------------------------------
+
+    def _office_args(self):
+        return [
+            LIBREOFFICE_PATH,
+            f"-env:UserInstallation={self.profile_url}",
+            '--headless', '--invisible', '--nologo', '--norestore', '--nodefault',
+        ]
+
+    def _start(self):
+        if self.pool.mode == "uno":
+            self._start_resident()
+        else:
+            # Inisialisasi profil sekali supaya konversi berikutnya tidak cold start
+            subprocess.run(
+                self._office_args() + ['--terminate_after_init'],
+                env=_office_env(), capture_output=True, timeout=self.pool.timeout
+            )
+        self.state = "idle"
+
+    def _start_resident(self):
+        import uno
+
+        accept = f"pipe,name={self.pipe_name};urp;StarOffice.ComponentContext"
+        self.process = subprocess.Popen(
+            self._office_args() + [f'--accept={accept}'],
+            env=_office_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context)
+        deadline = time.monotonic() + self.pool.timeout
+        while True:
+            try:
+                context = resolver.resolve(f"uno:{accept}")
+                break
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f"soffice worker {self.index} failed to start")
+                time.sleep(0.25)
+        self.context = context
+        self.desktop = context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.frame.Desktop", context)
+        logger.info(f"PDF worker {self.index} started soffice pid {self.process.pid}")
+
+    def kill(self):
+        """Kill the resident soffice process; a blocked conversion fails and the worker restarts"""
+        process = self.process
+        if process is not None and process.poll() is None:
+            process.kill()
+
+    def _restart(self):
+        self.kill()
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                pass
+        self.process = None
+        self.context = None
+        self.desktop = None
+        self.restarts += 1
+        self.state = "restarting"
+        logger.warning(f"Restarting PDF worker {self.index}")
+        self._start()
+
+    def run(self):
+        try:
+            self._start()
+        except Exception as e:
+            logger.error(f"PDF worker {self.index} failed to start: {str(e)}")
+            self.state = "failed"
+
+        while True:
+            job = self.pool.queue.get()
+            if job is None:
+                break
+            if job.cancelled:
+                continue
+            self._run_job(job)
+        self.kill()
+        self.state = "stopped"
+
+    def _run_job(self, job):
+        self.state = "busy"
+        self.hung = False
+        self.busy_since = time.monotonic()
+        try:
+            if self.pool.mode == "uno" and (self.process is None or self.process.poll() is not None):
+                self._restart()
+            job.result = self._convert(job)
+            self.jobs += 1
+        except Exception as e:
+            self.failures += 1
+            if self.hung:
+                job.error = ConversionTimeout("PDF conversion timed out. Try downloading as DOCX instead.")
+            else:
+                job.error = e
+            logger.error(f"PDF worker {self.index} conversion failed: {str(e)}")
+            if self.pool.mode == "uno":
+                try:
+                    self._restart()
+                except Exception as restart_error:
+                    logger.error(f"PDF worker {self.index} restart failed: {str(restart_error)}")
+                    self.state = "failed"
+        finally:
+            self.busy_since = None
+            if self.state == "busy":
+                self.state = "idle"
+            job.done.set()
+
+    # -- conversion ------------------------------------------------------
+
+    def _convert(self, job):
+        if self.pool.transfer == "stream":
+            return self._convert_stream(job.docx_content)
+
+        # Nama file tetap dari base_filename supaya hasilnya sama dengan konversi manual
+        docx_path = os.path.join(self.slot_dir, f"{job.base_filename}.docx")
+        pdf_path = os.path.join(self.slot_dir, f"{job.base_filename}.pdf")
+        try:
+            with open(docx_path, 'wb') as f:
+                f.write(job.docx_content)
+
+            if self.pool.mode == "uno":
+                self._convert_resident(docx_path, pdf_path)
+            else:
+                self._convert_cli(docx_path, self.slot_dir)
+
+            if not os.path.exists(pdf_path):
+                raise Exception("PDF file was not created after conversion")
+            with open(pdf_path, 'rb') as f:
+                return f.read()
+        finally:
+            self._clear_slot()
+
+    def _clear_slot(self):
+        for name in os.listdir(self.slot_dir):
+            path = os.path.join(self.slot_dir, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def _props(**values):
+        from com.sun.star.beans import PropertyValue
+
+        result = []
+        for name, value in values.items():
+            prop = PropertyValue()
+            prop.Name = name
+            prop.Value = value
+            result.append(prop)
+        return tuple(result)
+
+    def _convert_stream(self, docx_content):
+        import uno
+
+        input_stream = self.context.ServiceManager.createInstanceWithArgumentsAndContext(
+            "com.sun.star.io.SequenceInputStream", (uno.ByteSequence(docx_content),), self.context)
+        output_stream = _memory_output_stream_class()()
+        document = self.desktop.loadComponentFromURL(
+            "private:stream", "_blank", 0,
+            self._props(InputStream=input_stream, FilterName="MS Word 2007 XML", Hidden=True, ReadOnly=True))
+        if document is None:
+            raise Exception("LibreOffice could not load the DOCX stream")
+        try:
+            document.storeToURL("private:stream", self._props(FilterName="writer_pdf_Export", OutputStream=output_stream))
+        finally:
+            document.close(True)
+        pdf_content = output_stream.getvalue()
+        if not pdf_content:
+            raise Exception("PDF was not created after conversion")
+        return pdf_content
+
+    def _convert_resident(self, docx_path, pdf_path):
+        import uno
+
+        document = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(docx_path), "_blank", 0, self._props(Hidden=True, ReadOnly=True))
+        try:
+            document.storeToURL(uno.systemPathToFileUrl(pdf_path), self._props(FilterName="writer_pdf_Export"))
+        finally:
+            document.close(True)
+
+    def _convert_cli(self, docx_path, out_dir):
+        try:
+            process = subprocess.run(
+                self._office_args() + ['--convert-to', 'pdf', '--outdir', out_dir, docx_path],
+                env=_office_env(), capture_output=True, text=True, timeout=self.pool.timeout
+            )
+        except subprocess.TimeoutExpired:
+            self.hung = True
+            raise
+        if process.stderr:
+            logger.info(f"Command stderr: {process.stderr}")
+
+
+def uno_available():
+    """Whether the UNO bridge (python3-uno, shipped with LibreOffice) can be imported"""
+    return importlib.util.find_spec("uno") is not None
+
+
+class PdfWorkerPool:
+    """
+    size           number of workers (each with its own profile)
+    queue_size     conversions allowed to wait for a free worker
+    timeout        seconds a single conversion may take before its worker is killed
+    queue_timeout  seconds a job may wait in the queue before the caller gives up
+    workspace      directory for the worker profiles and conversion slots (default_workspace())
+    """
+
+    def __init__(self, size=2, queue_size=8, timeout=180, queue_timeout=60, base_dir=None, mode=None, workspace=None):
+        self.size = size
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        # UNO baru dicari saat pool dibuat, bukan saat modul di-import
+        self.mode = mode or ("uno" if uno_available() else "cli")
+        # Stream UNO tanpa file sama sekali; mode CLI butuh file, jadi memakai slot di workspace
+        self.transfer = "stream" if self.mode == "uno" and PDF_UNO_STREAM else "slot"
+        self.base_dir = base_dir or tempfile.mkdtemp(prefix="autoreport-soffice-", dir=workspace or default_workspace())
+        self.workspace_fs = filesystem_type(self.base_dir)
+        if self.transfer == "slot" and self.workspace_fs != "tmpfs":
+            logger.warning(f"PDF workspace {self.base_dir} is on {self.workspace_fs or 'unknown'}, not tmpfs; "
+                           f"conversions will write to disk")
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._stats = {"completed": 0, "failed": 0, "rejected": 0, "timeouts": 0}
+        self._closed = threading.Event()
+        self.workers = [_Worker(self, i) for i in range(size)]
+        for worker in self.workers:
+            worker.start()
+        self._watchdog = threading.Thread(target=self._watch, name="pdf-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Started PDF worker pool: {size} workers, mode={self.mode}, queue={queue_size}, "
+                    f"transfer={self.transfer}, workspace={self.base_dir} ({self.workspace_fs})")
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _watch(self):
+        while not self._closed.wait(1.0):
+            now = time.monotonic()
+            for worker in self.workers:
+                busy_since = worker.busy_since
+                if busy_since is not None and not worker.hung and now - busy_since > self.timeout:
+                    logger.error(f"PDF worker {worker.index} hung for {now - busy_since:.0f}s, killing it")
+                    worker.hung = True
+                    worker.kill()
+
+    def convert(self, docx_content, base_filename):
+        """Convert DOCX bytes to PDF bytes on a pool worker"""
+        job = _Job(docx_content, base_filename)
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            self._count("rejected")
+            raise PoolBusyError("Too many PDF conversions in progress. Try again shortly or download as DOCX.")
+
+        if not job.done.wait(self.queue_timeout + self.timeout):
+            job.cancelled = True
+            self._count("timeouts")
+            raise ConversionTimeout("PDF conversion timed out. Try downloading as DOCX instead.")
+        if job.error is not None:
+            self._count("timeouts" if isinstance(job.error, ConversionTimeout) else "failed")
+            raise job.error
+        self._count("completed")
+        return job.result
+
+    def idle_workers(self):
+        """Number of workers currently waiting for a job"""
+        return sum(1 for worker in self.workers if worker.state == "idle")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        now = time.monotonic()
+        stats.update({
+            "started": True,
+            "mode": self.mode,
+            "transfer": self.transfer,
+            "workspace": self.base_dir,
+            "workspace_fs": self.workspace_fs,
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "workers": [
+                {
+                    "index": worker.index,
+                    "state": worker.state,
+                    "pid": worker.process.pid if worker.process is not None else None,
+                    "jobs": worker.jobs,
+                    "failures": worker.failures,
+                    "restarts": worker.restarts,
+                    "busy_seconds": round(now - worker.busy_since, 1) if worker.busy_since else 0,
+                }
+                for worker in self.workers
+            ],
+        })
+        return stats
+
+    def shutdown(self):
+        self._closed.set()
+        for _ in self.workers:
+            try:
+                self.queue.put(None, timeout=1)
+            except queue.Full:
+                break
+        for worker in self.workers:
+            worker.kill()
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide pool, started on first use and sized from the PDF_* environment"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PdfWorkerPool(
+                size=int(os.environ.get("PDF_WORKERS", 2)),
+                queue_size=int(os.environ.get("PDF_QUEUE_SIZE", 8)),
+                timeout=float(os.environ.get("PDF_TIMEOUT", 180)),
+                queue_timeout=float(os.environ.get("PDF_QUEUE_TIMEOUT", 60)),
+            )
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def shutdown_pool():
+    """Stop the process-wide pool (if started) and its soffice processes"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def pool_stats():
+    pool = _pool
+    if pool is None:
+        return {"started": False}
+    return pool.stats()
@@ -0,0 +1,207 @@
+"""
+Background pre-rendering of recent reports.
+
+Most requests are for today or yesterday. A daemon thread polls every
+tenant's sheet (through the shared TTL cache) and, whenever a revision
+changes, renders the DOCX and PDF of a window of recent dates for that tenant
+into the rendered-report cache, so
+interactive requests for those dates are cache hits. Because the cache is
+content-addressed, days whose rows did not change cost only a lookup.
+
+Live traffic comes first: at most PRECOMPUTE_WORKERS days are rendered at a
+time, and a PDF is only converted while the PDF pool has an empty queue and
+more idle workers than PRECOMPUTE_PDF_RESERVE.
+
+With several processes (gunicorn workers) each one starts a Precomputer, but
+only the process holding the lock file renders; the others keep trying, so
+when the holder is recycled another worker takes over on its next check.
+"""
+import fcntl
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from pdf_pool import get_pool
+from report_pipeline import (
+    PDF_BACKEND, load_report_sheet, load_report_template, prepare_day, render_day_docx, render_pdf
+)
+from tenants import get_registry
+
+logger = logging.getLogger(__name__)
+
+
+class Precomputer:
+    """
+    interval      seconds between sheet revision checks
+    days          recent dates to render, counting back from today
+    ahead         upcoming dates to render after today
+    formats       formats to render per date ('docx', 'pdf')
+    workers       dates rendered at the same time
+    pdf_reserve   PDF pool workers kept free for live requests
+    max_wait      seconds to wait for a free PDF worker before retrying on the next check
+    lock_path     file lock that elects the one process that renders (None: always render)
+    """
+
+    def __init__(self, interval=60, days=2, ahead=0, formats=('docx', 'pdf'), workers=1,
+                 pdf_reserve=1, max_wait=30, lock_path=None):
+        self.interval = interval
+        self.days = days
+        self.ahead = ahead
+        self.formats = formats
+        self.workers = workers
+        self.pdf_reserve = pdf_reserve
+        self.max_wait = max_wait
+        self.lock_path = lock_path
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._revisions = {}
+        self._lock = threading.Lock()
+        self._stats = {"runs": 0, "rendered": 0, "skipped": 0, "deferred": 0, "errors": 0}
+        self._last_run = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="precompute", daemon=True)
+        self._thread.start()
+        logger.info(f"Precompute started: {self.days} recent + {self.ahead} upcoming dates, "
+                    f"{'+'.join(self.formats)}, every {self.interval}s")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def is_leader(self):
+        """True when this process holds the precompute lock (taking it if it is free)"""
+        if self.lock_path is None or self._lock_file is not None:
+            return True
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info(f"Precompute lock {self.lock_path} taken by process {os.getpid()}")
+        return True
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.is_leader():
+                    self.run_once()
+            except Exception as e:
+                self._count("errors")
+                logger.warning(f"Precompute check failed: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def window(self, today=None):
+        today = today or datetime.now()
+        today = today.replace(hour=0, minute=0, second=0, microsecond=0)
+        return [today + timedelta(days=offset) for offset in range(-(self.days - 1), self.ahead + 1)]
+
+    def run_once(self):
+        """Render the window of every tenant whose sheet revision changed since its last complete pass"""
+        rendered = False
+        for tenant in get_registry().all():
+            try:
+                rendered = self._run_tenant(tenant) or rendered
+            except Exception as e:
+                # Satu sheet yang gagal tidak menghentikan tenant lain
+                self._count("errors")
+                logger.warning(f"Precompute check for tenant '{tenant.id}' failed: {str(e)}")
+        return rendered
+
+    def _run_tenant(self, tenant):
+        window = self.window()
+        sheet = load_report_sheet(tenant=tenant, dates=[date.strftime("%Y-%m-%d") for date in window])
+        if sheet.revision == self._revisions.get(tenant.id):
+            return False
+        template = load_report_template(tenant.template_path)
+
+        started = time.perf_counter()
+        days = [day for day in (prepare_day(sheet, date, template, tenant) for date in window) if day is not None]
+        self._count("skipped", len(window) - len(days))
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="precompute-render") as executor:
+            complete = all(executor.map(lambda day: self._render(template, day), days))
+
+        self._count("runs")
+        self._last_run = {
+            "tenant": tenant.id,
+            "revision": sheet.revision[:12],
+            "dates": [day["date"] for day in days],
+            "complete": complete,
+            "seconds": round(time.perf_counter() - started, 2),
+        }
+        # Revisi baru dianggap selesai jika semua tanggal berhasil; sisanya dicoba lagi
+        if complete:
+            self._revisions[tenant.id] = sheet.revision
+        logger.info(f"Precompute pass for tenant '{tenant.id}' revision {sheet.revision[:12]}: {len(days)} dates, "
+                    f"complete={complete}, {self._last_run['seconds']}s")
+        return complete
+
+    def _render(self, template, day):
+        try:
+            docx_content = render_day_docx(template, day)
+            if 'pdf' in self.formats:
+                # Backend native tidak memakai pool LibreOffice (kecuali fallback)
+                if PDF_BACKEND == 'libreoffice' and not self._wait_for_pdf_capacity():
+                    self._count("deferred")
+                    logger.info(f"Precompute of {day['date']} PDF deferred, PDF pool busy with live requests")
+                    return False
+                render_pdf(day["report_key"], docx_content, day["base_filename"])
+            self._count("rendered")
+            return True
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"Precompute of {day['date']} failed: {str(e)}")
+            return False
+
+    def _wait_for_pdf_capacity(self):
+        pool = get_pool()
+        reserve = min(self.pdf_reserve, pool.size - 1)
+        deadline = time.monotonic() + self.max_wait
+        while not self._stop.is_set():
+            if pool.queue.qsize() == 0 and pool.idle_workers() > reserve:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.5)
+        return False
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            "enabled": True,
+            "leader": self.lock_path is None or self._lock_file is not None,
+            "revisions": {tenant_id: revision[:12] for tenant_id, revision in self._revisions.items()},
+            "last_run": self._last_run,
+        })
+        return stats
+
+
+def start_precomputer(lock_path=None):
+    """Start the precompute thread when PRECOMPUTE_ENABLED=1, return it (or None)"""
+    if os.environ.get("PRECOMPUTE_ENABLED", "0") != "1":
+        return None
+    formats = tuple(fmt.strip() for fmt in os.environ.get("PRECOMPUTE_FORMATS", "docx,pdf").split(",") if fmt.strip())
+    return Precomputer(
+        interval=float(os.environ.get("PRECOMPUTE_INTERVAL", 60)),
+        days=int(os.environ.get("PRECOMPUTE_DAYS", 2)),
+        ahead=int(os.environ.get("PRECOMPUTE_AHEAD", 0)),
+        formats=formats,
+        workers=int(os.environ.get("PRECOMPUTE_WORKERS", 1)),
+        pdf_reserve=int(os.environ.get("PRECOMPUTE_PDF_RESERVE", 1)),
+        max_wait=float(os.environ.get("PRECOMPUTE_MAX_WAIT", 30)),
+        lock_path=lock_path,
+    ).start()
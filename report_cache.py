@@ -0,0 +1,198 @@
+"""
+Content-addressed cache of rendered reports.
+
+A report is fully determined by the rows of its date, the template file and
+the output format, so the finished DOCX/PDF bytes are stored under a hash of
+exactly those inputs. Entries live in a size-bounded in-memory LRU; when a
+spill directory is configured, entries evicted from memory are written there
+(itself capped in size) instead of being thrown away.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_template_digests = {}
+
+
+def template_digest(path):
+    """sha256 of the template file, recomputed only when its mtime/size change"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "builtin"
+    signature = (st.st_mtime_ns, st.st_size)
+    cached = _template_digests.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    _template_digests[path] = (signature, digest)
+    return digest
+
+
+def report_key(rows, template_hash, *extra):
+    """Digest of the filtered rows (values and columns), the template hash and any extra inputs"""
+    import pandas as pd
+    
+    h = hashlib.sha256()
+    h.update("\x1f".join(map(str, rows.columns)).encode())
+    h.update(pd.util.hash_pandas_object(rows.astype(str), index=False).to_numpy().tobytes())
+    h.update(template_hash.encode())
+    for value in extra:
+        h.update(b"\x1e" + str(value).encode())
+    return h.hexdigest()
+
+
+def cache_key(digest, format_type):
+    return f"{digest}.{format_type}"
+
+
+class RenderedReportCache:
+    """
+    max_bytes        memory budget for cached files
+    max_entries      maximum number of files kept in memory
+    spill_dir        optional directory receiving entries evicted from memory
+    spill_max_bytes  size cap of spill_dir; oldest files are removed first
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entries=256, spill_dir=None,
+                 spill_max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "spills": 0}
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._scan_spill_dir()
+
+    def _scan_spill_dir(self):
+        files = []
+        for name in os.listdir(self.spill_dir):
+            path = os.path.join(self.spill_dir, name)
+            if name.endswith(".tmp") or not os.path.isfile(path):
+                continue
+            st = os.stat(path)
+            files.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(files):
+            self._disk[name] = size
+            self._disk_bytes += size
+
+    def get(self, key):
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return content
+            on_disk = key in self._disk
+
+        if on_disk:
+            content = self._read_spilled(key)
+            if content is not None:
+                with self._lock:
+                    self._stats["disk_hits"] += 1
+                self.put(key, content, count=False)
+                return content
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def contains(self, key):
+        """Whether key is cached in memory or on disk, without touching the statistics"""
+        with self._lock:
+            return key in self._entries or key in self._disk
+
+    def put(self, key, content, count=True):
+        if len(content) > self.max_bytes:
+            return
+        spilled = []
+        with self._lock:
+            if count:
+                self._stats["stores"] += 1
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = content
+            self._bytes += len(content)
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                old_key, old_content = self._entries.popitem(last=False)
+                self._bytes -= len(old_content)
+                self._stats["evictions"] += 1
+                spilled.append((old_key, old_content))
+
+        if self.spill_dir:
+            for old_key, old_content in spilled:
+                self._spill(old_key, old_content)
+
+    def _spill(self, key, content):
+        with self._lock:
+            # Isi kunci yang sama pasti identik, cukup tandai sebagai baru dipakai
+            if key in self._disk:
+                self._disk.move_to_end(key)
+                return
+        path = os.path.join(self.spill_dir, key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Error spilling report to disk: {str(e)}")
+            return
+
+        to_remove = []
+        with self._lock:
+            self._stats["spills"] += 1
+            self._disk_bytes -= self._disk.pop(key, 0)
+            self._disk[key] = len(content)
+            self._disk_bytes += len(content)
+            while self._disk_bytes > self.spill_max_bytes and self._disk:
+                old_key, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                to_remove.append(old_key)
+        for old_key in to_remove:
+            try:
+                os.remove(os.path.join(self.spill_dir, old_key))
+            except OSError:
+                pass
+
+    def _read_spilled(self, key):
+        try:
+            with open(os.path.join(self.spill_dir, key), 'rb') as f:
+                return f.read()
+        except OSError:
+            with self._lock:
+                self._disk_bytes -= self._disk.pop(key, 0)
+            return None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            })
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+rendered_reports = RenderedReportCache(
+    max_bytes=int(float(os.environ.get("REPORT_CACHE_MAX_MB", 64)) * 1024 * 1024),
+    max_entries=int(os.environ.get("REPORT_CACHE_MAX_ENTRIES", 256)),
+    spill_dir=os.environ.get("REPORT_CACHE_DIR") or None,
+    spill_max_bytes=int(float(os.environ.get("REPORT_CACHE_DIR_MAX_MB", 512)) * 1024 * 1024),
+)
@@ -0,0 +1,277 @@
+"""
+Background report jobs.
+
+POST /jobs hands the pipeline to a bounded thread pool and returns at once;
+the browser then polls the job for its current stage and downloads the file
+when it is done, so a slow PDF never holds a web worker.
+
+Job state lives in a SQLite file and finished reports in files next to it
+(REPORT_JOB_DIR), so every gunicorn worker can answer a poll or a download
+for a job another worker is running. A job whose worker process is gone
+before it finished (recycled, killed) is marked failed instead of staying
+queued forever.
+"""
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+STAGES = ["queued", "download", "parse", "render", "convert", "done"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    error TEXT,
+    file_name TEXT,
+    mimetype TEXT,
+    size INTEGER,
+    owner INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+"""
+COLUMNS = ("id", "params", "status", "stage", "error", "file_name", "mimetype", "size", "owner",
+           "created_at", "started_at", "finished_at")
+PENDING = ("queued", "running")
+
+
+def default_job_dir():
+    return os.environ.get("REPORT_JOB_DIR") or os.path.join(tempfile.gettempdir(), "autoreport-jobs")
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting"""
+
+
+class Job:
+    def __init__(self, params, id=None, status="queued", stage="queued", error=None, file_name=None,
+                 mimetype=None, size=None, owner=None, created_at=None, started_at=None, finished_at=None):
+        self.id = id or uuid.uuid4().hex
+        self.params = params
+        self.status = status
+        self.stage = stage
+        self.error = error
+        self.file_name = file_name
+        self.mimetype = mimetype
+        self.size = size
+        self.owner = owner if owner is not None else os.getpid()
+        self.created_at = created_at if created_at is not None else time.time()
+        self.started_at = started_at
+        self.finished_at = finished_at
+
+    @classmethod
+    def from_row(cls, row):
+        values = dict(zip(COLUMNS, row))
+        values["params"] = json.loads(values["params"])
+        return cls(**values)
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def to_dict(self):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(STAGES.index(self.stage) / (len(STAGES) - 1), 2),
+            "params": self.params,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.error:
+            data["error"] = self.error
+        if self.status == "done":
+            data["file_name"] = self.file_name
+            data["size"] = self.size
+        return data
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """Jobs in a SQLite file and their results as files in the same directory, shared by processes"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "jobs.sqlite3")
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # Koneksi per operasi: aman dipakai lintas thread dan setelah fork
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def result_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.out")
+
+    def insert(self, job, max_pending):
+        """Add a queued job unless max_pending jobs of any process are queued or running"""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                pending = conn.execute(
+                    f"SELECT COUNT(*) FROM jobs WHERE status IN ({','.join('?' * len(PENDING))})", PENDING
+                ).fetchone()[0]
+                if pending >= max_pending:
+                    raise JobQueueFull(f"Terlalu banyak laporan dalam antrean ({pending}). Coba lagi sebentar lagi.")
+                conn.execute(
+                    f"INSERT INTO jobs ({','.join(COLUMNS)}) VALUES ({','.join('?' * len(COLUMNS))})",
+                    (job.id, json.dumps(job.params), job.status, job.stage, job.error, job.file_name, job.mimetype,
+                     job.size, job.owner, job.created_at, job.started_at, job.finished_at)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def update(self, job_id, **fields):
+        with closing(self._connect()) as conn:
+            conn.execute(f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+                         (*fields.values(), job_id))
+
+    def get(self, job_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute(f"SELECT {','.join(COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def write_result(self, job_id, content):
+        path = self.result_path(job_id)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=f".{job_id}-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def prune(self, ttl):
+        """Delete finished jobs older than ttl with their files, fail jobs of processes that are gone"""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            owners = [owner for (owner,) in conn.execute(
+                f"SELECT DISTINCT owner FROM jobs WHERE status IN ({','.join('?' * len(PENDING))})", PENDING
+            )]
+            for owner in owners:
+                if owner != os.getpid() and not _process_alive(owner):
+                    conn.execute(
+                        f"UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                        f"WHERE owner = ? AND status IN ({','.join('?' * len(PENDING))})",
+                        ("Worker berhenti sebelum laporan selesai. Silakan coba lagi.", now, owner, *PENDING)
+                    )
+            expired = [job_id for (job_id,) in conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (now - ttl,)
+            )]
+            if expired:
+                conn.execute(f"DELETE FROM jobs WHERE id IN ({','.join('?' * len(expired))})", expired)
+        for job_id in expired:
+            try:
+                os.unlink(self.result_path(job_id))
+            except FileNotFoundError:
+                pass
+
+    def counts(self):
+        with closing(self._connect()) as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+class JobManager:
+    """
+    run_fn(params, progress) must return (file_name, mimetype, bytes) or raise.
+
+    store           JobStore shared by every process serving the app
+    max_workers     reports rendered at the same time in this process
+    max_pending     jobs of all processes allowed to be queued or running before submit() refuses
+    ttl             seconds a finished job (and its file) is kept for download
+    prune_interval  seconds between clean-ups triggered by polls (get, stats);
+                    submit() always cleans up first
+    """
+
+    def __init__(self, run_fn, store, max_workers=4, max_pending=32, ttl=3600, prune_interval=30):
+        self.run_fn = run_fn
+        self.store = store
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report-job")
+        self._prune_lock = threading.Lock()
+        self._pruned_at = 0.0
+
+    def submit(self, params):
+        self._prune(force=True)
+        job = Job(params)
+        self.store.insert(job, self.max_pending)
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        # Poll juga membersihkan job kedaluwarsa, walau tidak ada submit baru
+        self._prune()
+        return self.store.get(job_id)
+
+    def result_path(self, job):
+        return self.store.result_path(job.id)
+
+    def _run(self, job):
+        store = self.store
+        store.update(job.id, status="running", started_at=time.time())
+
+        def progress(stage):
+            logger.info(f"Job {job.id}: {stage}")
+            store.update(job.id, stage=stage)
+
+        try:
+            file_name, mimetype, content = self.run_fn(job.params, progress)
+            # File ditulis lengkap dulu; worker lain baru melihat status done setelahnya
+            store.write_result(job.id, content)
+            store.update(job.id, stage="done", status="done", file_name=file_name, mimetype=mimetype,
+                         size=len(content), finished_at=time.time())
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            logger.debug(traceback.format_exc())
+            store.update(job.id, status="failed", error=str(e), finished_at=time.time())
+
+    def _prune(self, force=False):
+        if not force and time.monotonic() - self._pruned_at < self.prune_interval:
+            return
+        # Satu pembersihan per proses pada satu waktu sudah cukup
+        if not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            self._pruned_at = time.monotonic()
+            self.store.prune(self.ttl)
+        except sqlite3.Error as e:
+            logger.warning(f"Pruning report jobs failed: {str(e)}")
+        finally:
+            self._prune_lock.release()
+
+    def stats(self):
+        self._prune()
+        return {"jobs": self.store.counts(), "max_pending": self.max_pending, "dir": self.store.directory}
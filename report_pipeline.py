@@ -0,0 +1,604 @@
+"""
+Report pipeline shared by the Flask app, the Streamlit app and the CLI:
+fetch the sheet, pick a date's rows, fill the template and convert to PDF.
+Nothing here depends on a web framework. Every step takes an optional
+tenant (see tenants.py); without one the default tenant is used.
+
+pandas, numpy, python-docx and the native PDF renderer are imported on first
+use, so importing this module (the web app, the CLI) stays fast.
+"""
+from datetime import date, datetime, timedelta
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+import io
+import hashlib
+import os
+import logging
+import threading
+import traceback
+
+from admission import AdmissionRejected, admit, check
+from metrics import span
+from pdf_pool import ConversionTimeout, PoolBusyError, get_pool
+from report_cache import cache_key, rendered_reports, report_key
+from sheet_data import load_sheet, parse_day_csv
+from sheet_source import SHEET_SOURCE, SheetFetchError, fetch_sheet, fetch_sheets, sheet_queries, snapshot_from_file
+from sheet_store import get_store
+from singleflight import SingleFlight
+from tenants import ALL_TENANTS, DEFAULT_NAME, DEFAULT_TEMPLATE_PATH, UnknownTenantError, get_registry
+from zip_stream import stream_zip
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_PATH = DEFAULT_TEMPLATE_PATH
+DOCX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+MAX_RANGE_DAYS = int(os.environ.get('MAX_RANGE_DAYS', 366))
+
+# 'libreoffice' (default) atau 'native' (render PDF di proses sendiri, fallback ke LibreOffice)
+PDF_BACKEND = os.environ.get('PDF_BACKEND', 'libreoffice')
+_backend_counts = {"native": 0, "fallback": 0, "libreoffice": 0}
+_backend_lock = threading.Lock()
+
+# Request identik (tanggal, format, revisi sheet, template) yang datang bersamaan berbagi satu render
+_report_flight = SingleFlight()
+_coalesce_counts = {"renders": 0, "coalesced": 0}
+_coalesce_lock = threading.Lock()
+# Callback progress setiap pemanggil yang menunggu render yang sama, per kunci
+_flight_progress = {}
+
+# Render per hari untuk laporan rentang tanggal berjalan paralel di sini
+RANGE_WORKERS = int(os.environ.get('RANGE_WORKERS', 4))
+range_executor = ThreadPoolExecutor(
+    max_workers=RANGE_WORKERS,
+    thread_name_prefix="range-render"
+)
+
+# Dictionary untuk hari dan bulan dalam bahasa Indonesia
+hari = {
+    'Monday': 'Senin', 'Tuesday': 'Selasa', 'Wednesday': 'Rabu', 'Thursday': 'Kamis',
+    'Friday': 'Jumat', 'Saturday': 'Sabtu', 'Sunday': 'Minggu'
+}
+bulan = {
+    'January': 'Januari', 'February': 'Februari', 'March': 'Maret', 'April': 'April',
+    'May': 'Mei', 'June': 'Juni', 'July': 'Juli', 'August': 'Agustus',
+    'September': 'September', 'October': 'Oktober', 'November': 'November', 'December': 'Desember'
+}
+
+# Nama bulan per nomor bulan (indeks 0 tidak dipakai)
+NAMA_BULAN = [""] + list(bulan.values())
+
+def _date_part(value):
+    # Hanya bagian sebelum spasi pertama yang dibaca (nilai 'YYYY-MM-DD HH:MM:SS')
+    parts = str(value).split(maxsplit=1)
+    return parts[0] if parts else ""
+
+def format_tanggal_column(values):
+    """'DD <bulan> YYYY' for every value, '' where it is not a date"""
+    import numpy as np
+    import pandas as pd
+
+    # Tanggal di satu kolom banyak yang sama, jadi cukup parse dan format nilai uniknya
+    codes, uniques = pd.factorize(values)
+    if isinstance(uniques, pd.DatetimeIndex):
+        dt = uniques
+    else:
+        dt = pd.to_datetime([_date_part(value) for value in uniques], format="%Y-%m-%d", errors="coerce")
+
+    # Slot terakhir ("") untuk sel kosong (kode -1 dari factorize)
+    formatted = np.full(len(uniques) + 1, "", dtype=object)
+    valid = ~np.asarray(dt.isna())
+    dt = dt[valid]
+    formatted[:-1][valid] = [
+        f"{day:02d} {NAMA_BULAN[month]} {year}"
+        for day, month, year in zip(dt.day, dt.month, dt.year)
+    ]
+    return formatted[codes]
+
+def report_rows(frame, no_keterangan="-"):
+    """Table rows (No, Pekerjaan, Batas Waktu, Status, Diselesaikan Pada) and the joined Keterangan of one day"""
+    import pandas as pd
+
+    def text_or_blank(column):
+        values = frame[column].to_numpy(dtype=object, copy=True)
+        values[pd.isna(values)] = ""
+        return values.tolist()
+
+    rows = list(zip(
+        range(1, len(frame) + 1),
+        text_or_blank('Pekerjaan'),
+        format_tanggal_column(frame['Batas Waktu']),
+        text_or_blank('Status'),
+        format_tanggal_column(frame['Diselesaikan Pada'])
+    ))
+
+    keterangan_list = [text for text in (str(value).strip() for value in frame['Keterangan'].tolist()) if text]
+    return rows, "\n".join(keterangan_list) if keterangan_list else no_keterangan
+
+class ReportError(Exception):
+    """Raised when a report cannot be generated (no data, download failure, ...)"""
+
+def report_names(sekarang, name=DEFAULT_NAME):
+    """Waktu Laporan text, filter date (YYYY-MM-DD) and base file name for one report date"""
+    nama_hari = hari[sekarang.strftime("%A")]
+    nama_bulan = bulan[sekarang.strftime("%B")]
+    tanggal = sekarang.strftime("%d")
+    tahun = sekarang.strftime("%Y")
+    waktu_laporan = f"{nama_hari}, {tanggal} {nama_bulan} {tahun}"
+    base_filename = f"{tanggal} {nama_bulan} {tahun}_Daily Report {name}"
+    return waktu_laporan, sekarang.strftime("%Y-%m-%d"), base_filename
+
+def resolve_tenant(tenant_id=None):
+    """Tenant from the registry (default tenant when empty), ReportError when unknown"""
+    try:
+        return get_registry().get(tenant_id)
+    except UnknownTenantError as e:
+        raise ReportError(str(e))
+
+def load_report_sheet(progress=None, xlsx_path=None, tenant=None, dates=None):
+    """
+    Fetch (TTL cache) and parse (per-revision cache) the tenant's sheet, raise
+    ReportError on failure. xlsx_path reads a local workbook instead of Google
+    Sheets. dates (YYYY-MM-DD) are the dates the caller needs; the streaming
+    reader (SHEET_READER=stream) reads only those, and with SHEET_SOURCE=query
+    a single date is fetched as a filtered CSV when the endpoint allows it.
+    """
+    progress = progress or (lambda stage: None)
+    tenant = tenant or resolve_tenant()
+
+    if SHEET_SOURCE == 'query' and not xlsx_path and dates is not None and len(dates) == 1:
+        sheet = load_query_day(tenant, dates[0], progress)
+        if sheet is not None:
+            return sheet
+
+    # Unduh file Excel dari Google Sheets (lewat cache bersama)
+    try:
+        progress("download")
+        with span("download"):
+            if xlsx_path:
+                snapshot = snapshot_from_file(xlsx_path)
+            else:
+                snapshot = fetch_sheet(tenant.file_id)
+        if snapshot.stale:
+            logger.warning("Using stale spreadsheet copy, Google Sheets is unreachable")
+
+        # Sheet hanya di-parse sekali per revisi; dengan SHEET_STORE_PATH hanya
+        # tanggal yang berubah ditulis ulang dan laporan membaca satu partisi
+        progress("parse")
+        with span("parse"):
+            store = get_store(None if get_registry().is_default(tenant) else tenant.id, tenant.sheet_name)
+            if store is not None:
+                return store.sync(snapshot)
+            return load_sheet(snapshot, tenant.sheet_name, dates)
+    except SheetFetchError as e:
+        raise ReportError(str(e))
+    except Exception as e:
+        error_msg = f"Gagal mengunduh file: {str(e)}"
+        logger.error(error_msg)
+        logger.error(traceback.format_exc())
+        raise ReportError(error_msg)
+
+def load_query_day(tenant, tanggal, progress):
+    """One date's rows from the filtered CSV export, None when the caller should use the xlsx export"""
+    if not sheet_queries.available():
+        return None
+    try:
+        progress("download")
+        with span("download"):
+            snapshot = sheet_queries.fetch(tenant.file_id, tenant.sheet_name, tanggal)
+    except SheetFetchError:
+        return None
+
+    progress("parse")
+    try:
+        with span("parse"):
+            return parse_day_csv(snapshot, tanggal, sheet_queries.date_column)
+    except ValueError as e:
+        sheet_queries.reject(tenant.file_id, tenant.sheet_name, tanggal, str(e))
+        return None
+
+def load_report_template(template_path=None):
+    """Normalised template, loaded once and reloaded only when the file changes"""
+    from report_template import get_template
+
+    try:
+        with span("template"):
+            return get_template(template_path or TEMPLATE_PATH)
+    except Exception as e:
+        error_msg = f"Gagal membuka template dokumen: {str(e)}"
+        logger.error(error_msg)
+        logger.error(traceback.format_exc())
+        raise ReportError(error_msg)
+
+def prepare_day(sheet, sekarang, template, tenant=None):
+    """Rows and cache key of one report date, or None when the date has no rows"""
+    name = tenant.name if tenant else DEFAULT_NAME
+    waktu_laporan, filter_tanggal, base_filename = report_names(sekarang, name)
+
+    # Filter data berdasarkan tanggal
+    logger.info(f"Filtering data for date: {filter_tanggal}")
+    with span("filter"):
+        df_filtered = sheet.rows_for(filter_tanggal).fillna('')
+        logger.info(f"Filtered data shape: {df_filtered.shape}")
+        if df_filtered.empty:
+            return None
+        day_key = report_key(df_filtered, template.digest, waktu_laporan, name)
+
+    return {
+        "date": filter_tanggal,
+        "waktu_laporan": waktu_laporan,
+        "base_filename": base_filename,
+        "frame": df_filtered,
+        "report_key": day_key
+    }
+
+def build_day_document(template, day):
+    """Fill a fresh copy of the template with one day's rows"""
+    df_filtered = day["frame"]
+
+    # Baris tabel dan keterangan disiapkan per kolom, bukan per baris
+    with span("rows"):
+        data_baru, keterangan = report_rows(df_filtered)
+
+    with span("fill"):
+        # Salin template yang sudah dinormalisasi (tanpa Catatan dan baris contoh)
+        report = template.new_document()
+        report.waktu_paragraph.text = f"Waktu Laporan\t: {day['waktu_laporan']}"
+
+        # Tambahkan data baru ke tabel yang ada (sekaligus, garis dari definisi tabel)
+        logger.info(f"Adding {len(data_baru)} rows to table")
+        report.fill_table(data_baru)
+
+        # Tambahkan Keterangan setelah tabel
+        report.add_paragraph(f"{keterangan}")
+    return report
+
+def render_day_docx(template, day):
+    """DOCX bytes of one day, served from the rendered-report cache when the inputs are unchanged"""
+    key = cache_key(day["report_key"], 'docx')
+    cached_docx = rendered_reports.get(key)
+    if cached_docx is not None:
+        logger.info(f"Serving DOCX for {day['date']} from rendered-report cache")
+        return cached_docx
+
+    report = build_day_document(template, day)
+
+    # Simpan ke BytesIO
+    logger.info("Saving document to memory")
+    docx_io = io.BytesIO()
+    with span("save"):
+        report.save(docx_io)
+    rendered_reports.put(key, docx_io.getvalue())
+    logger.info("Document saved successfully")
+    return docx_io.getvalue()
+
+def report_cache_key(report_digest, format_type):
+    """Rendered-report cache key of one format of a report"""
+    if format_type == 'pdf':
+        # PDF dari backend berbeda tidak identik, jadi tidak berbagi entri cache
+        return cache_key(report_digest, 'pdf' if PDF_BACKEND == 'libreoffice' else f'{PDF_BACKEND}.pdf')
+    return cache_key(report_digest, format_type)
+
+def render_pdf(report_digest, docx_content, base_filename, progress=None):
+    """PDF bytes for a rendered DOCX, converted only on a rendered-report cache miss"""
+    pdf_key = report_cache_key(report_digest, 'pdf')
+    pdf_bytes = rendered_reports.get(pdf_key)
+    if pdf_bytes is not None:
+        logger.info("Serving PDF from rendered-report cache")
+        return pdf_bytes
+    if progress:
+        progress("convert")
+    pdf_bytes = convert_to_pdf(docx_content, base_filename).getvalue()
+    rendered_reports.put(pdf_key, pdf_bytes)
+    return pdf_bytes
+
+def report_dates(start_date, end_date):
+    """Every date from start_date to end_date inclusive"""
+    if end_date < start_date:
+        raise ReportError("Tanggal akhir harus setelah tanggal awal")
+    count = (end_date - start_date).days + 1
+    if count > MAX_RANGE_DAYS:
+        raise ReportError(f"Rentang tanggal maksimal {MAX_RANGE_DAYS} hari")
+    return [start_date + timedelta(days=i) for i in range(count)]
+
+def prepare_range(start_date, end_date, progress=None, xlsx_path=None, tenant=None):
+    """Download/parse once and prepare every date of a range that has rows, return (template, days, range_name)"""
+    dates = report_dates(start_date, end_date)
+    tenant = tenant or resolve_tenant()
+    logger.info(f"Preparing reports for {dates[0]:%Y-%m-%d} - {dates[-1]:%Y-%m-%d}, tenant '{tenant.id}'")
+
+    sheet = load_report_sheet(progress, xlsx_path, tenant, [sekarang.strftime("%Y-%m-%d") for sekarang in dates])
+    template = load_report_template(tenant.template_path)
+
+    # Satu index per revisi sheet: tanggal tanpa data dilewati
+    days = [day for day in (prepare_day(sheet, sekarang, template, tenant) for sekarang in dates) if day is not None]
+    if not days:
+        raise ReportError(f"Tidak ada data untuk tanggal {dates[0]:%Y-%m-%d} sampai {dates[-1]:%Y-%m-%d}")
+
+    range_name = f"{report_names(dates[0])[2].split('_')[0]} - {report_names(dates[-1], tenant.name)[2]}"
+    return template, days, range_name
+
+def iter_day_files(template, days, formats, errors=None):
+    """
+    Yield (file name, bytes) for every day and format in date order. Days render
+    in parallel but at most RANGE_WORKERS * 2 ahead of the consumer, so memory
+    does not grow with the length of the range. With an errors list, failed
+    days are recorded there and skipped instead of raising.
+    """
+    def render(day):
+        # Rentang tidak ditolak di tengah jalan; setiap tanggal menunggu slot admission
+        with admit('pdf' if 'pdf' in formats else 'docx', block=True):
+            docx_content = render_day_docx(template, day)
+            files = []
+            if 'docx' in formats:
+                files.append((f"{day['base_filename']}.docx", docx_content))
+            if 'pdf' in formats:
+                files.append((f"{day['base_filename']}.pdf",
+                              render_pdf(day["report_key"], docx_content, day["base_filename"])))
+        return files
+
+    remaining = iter(days)
+    pending = deque((day, range_executor.submit(render, day)) for day in islice(remaining, RANGE_WORKERS * 2))
+    try:
+        while pending:
+            day, future = pending.popleft()
+            try:
+                files = future.result()
+            except Exception as e:
+                if errors is None:
+                    raise
+                logger.error(f"Failed to render report for {day['date']}: {str(e)}")
+                errors.append(f"{day['date']}: {str(e)}")
+                files = []
+            for day_next in islice(remaining, 1):
+                pending.append((day_next, range_executor.submit(render, day_next)))
+            yield from files
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+def generate_report_range(start_date, end_date, format_type='docx', mode='zip', progress=None, tenant=None):
+    """
+    Reports for every date in a range from a single download/parse, return
+    (download_name, mimetype, bytes). mode='combined' gives one document with a
+    section per day, mode='zip' a zip of per-day files. Days render in parallel.
+    """
+    if format_type not in ('docx', 'pdf'):
+        raise ReportError(f"Format tidak dikenal: {format_type}")
+    if mode not in ('zip', 'combined'):
+        raise ReportError(f"Mode tidak dikenal: {mode}")
+    progress = progress or (lambda stage: None)
+    template, days, range_name = prepare_range(start_date, end_date, progress, tenant=tenant)
+    progress("render")
+
+    if mode == 'combined':
+        combined_digest = hashlib.sha256("".join(day["report_key"] for day in days).encode()).hexdigest()
+        key = cache_key(combined_digest, 'docx')
+        docx_content = rendered_reports.get(key)
+        if docx_content is None:
+            from report_template import combine_reports
+
+            # Dokumen per tanggal dibuat tanpa slot admission: tugas di range_executor juga
+            # menunggu slot, jadi slot tidak boleh dipegang sambil menunggu executor
+            documents = list(range_executor.map(lambda day: build_day_document(template, day), days))
+            with admit('docx', block=True):
+                docx_io = io.BytesIO()
+                combine_reports(documents).save(docx_io)
+            docx_content = docx_io.getvalue()
+            rendered_reports.put(key, docx_content)
+        if format_type == 'pdf':
+            with admit('pdf', block=True):
+                pdf_bytes = render_pdf(combined_digest, docx_content, range_name, progress)
+            return f"{range_name}.pdf", 'application/pdf', pdf_bytes
+        return f"{range_name}.docx", DOCX_MIMETYPE, docx_content
+
+    if format_type == 'pdf':
+        progress("convert")
+    archive = b"".join(stream_zip(iter_day_files(template, days, [format_type])))
+    return f"{range_name}.zip", 'application/zip', archive
+
+def _count_backend(name):
+    with _backend_lock:
+        _backend_counts[name] += 1
+
+def pdf_backend_stats():
+    with _backend_lock:
+        return {"backend": PDF_BACKEND, **_backend_counts}
+
+def convert_to_pdf(docx_content, base_filename, backend=None):
+    """
+    Convert DOCX content to PDF, natively in-process when the backend is 'native'
+    and the document is supported, otherwise on the warm LibreOffice worker pool
+    """
+    backend = backend or PDF_BACKEND
+    if backend == 'native':
+        from pdf_native import NativePdfUnsupported, docx_to_pdf
+
+        try:
+            with span("convert_native"):
+                pdf_bytes = docx_to_pdf(docx_content)
+            _count_backend("native")
+            logger.info("PDF rendered natively")
+            return io.BytesIO(pdf_bytes)
+        except NativePdfUnsupported as e:
+            _count_backend("fallback")
+            logger.info(f"Native PDF not possible for {base_filename} ({str(e)}), using LibreOffice")
+        except Exception as e:
+            _count_backend("fallback")
+            logger.warning(f"Native PDF failed for {base_filename}: {str(e)}, using LibreOffice")
+            logger.debug(traceback.format_exc())
+
+    logger.info("Starting PDF conversion")
+    try:
+        with span("convert"):
+            pdf_bytes = get_pool().convert(docx_content, base_filename)
+    except (PoolBusyError, ConversionTimeout) as e:
+        logger.error(f"PDF conversion failed: {str(e)}")
+        raise
+    except Exception as e:
+        logger.error(f"PDF conversion failed: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise
+    _count_backend("libreoffice")
+
+    pdf_content = io.BytesIO(pdf_bytes)
+    pdf_content.seek(0)
+    logger.info("PDF conversion finished")
+    return pdf_content
+
+def build_report(filter_date, format_type='docx', progress=None, tenant=None, block=False):
+    """
+    Run the whole pipeline for one date, return (download_name, mimetype, bytes).
+    Concurrent identical requests share one render and get the same bytes, and
+    each one's progress sees its stages. Only that render, on a rendered-report
+    cache miss, takes an admission slot: AdmissionRejected when none is free in
+    time, or with block=True it waits in the background queue.
+    """
+    if format_type not in ('docx', 'pdf'):
+        raise ReportError(f"Format tidak dikenal: {format_type}")
+
+    logger.info(f"Generating report for date: {filter_date}")
+    sekarang = filter_date if filter_date else datetime.now()
+    tenant = tenant or resolve_tenant()
+    sheet = load_report_sheet(progress, tenant=tenant, dates=[sekarang.strftime("%Y-%m-%d")])
+    template = load_report_template(tenant.template_path)
+
+    # block ikut kunci: job yang bersedia menunggu tidak boleh mewarisi penolakan request biasa
+    key = (tenant.id, sekarang.strftime("%Y-%m-%d"), format_type, sheet.revision, template.digest, block)
+    with _coalesce_lock:
+        listeners = _flight_progress.setdefault(key, [])
+        if progress is not None:
+            listeners.append(progress)
+    try:
+        report, shared = _report_flight.do(key, _render_report, sheet, template, sekarang, format_type,
+                                           lambda stage: _broadcast_progress(key, stage), tenant, block)
+    finally:
+        with _coalesce_lock:
+            if progress is not None:
+                listeners.remove(progress)
+            if not listeners and _flight_progress.get(key) is listeners:
+                del _flight_progress[key]
+    with _coalesce_lock:
+        _coalesce_counts["coalesced" if shared else "renders"] += 1
+    if shared:
+        logger.info(f"Joined in-flight {format_type} render for {key[1]}, tenant '{tenant.id}'")
+    return report
+
+def _broadcast_progress(key, stage):
+    with _coalesce_lock:
+        listeners = list(_flight_progress.get(key, ()))
+    for progress in listeners:
+        progress(stage)
+
+def _render_report(sheet, template, sekarang, format_type, progress, tenant, block=False):
+    day = prepare_day(sheet, sekarang, template, tenant)
+    if day is None:
+        error_msg = f"Tidak ada data untuk tanggal {sekarang.strftime('%Y-%m-%d')}"
+        logger.warning(error_msg)
+        raise ReportError(error_msg)
+
+    base_filename = day["base_filename"]
+    logger.info(f"Preparing to send file: {base_filename}.{format_type}")
+    # File yang sudah ada di cache tidak perlu slot admission
+    cached = rendered_reports.contains(report_cache_key(day["report_key"], format_type))
+    with nullcontext() if cached else admit(format_type, block):
+        progress = progress or (lambda stage: None)
+        progress("render")
+        docx_content = render_day_docx(template, day)
+        if format_type == 'pdf':
+            pdf_bytes = render_pdf(day["report_key"], docx_content, base_filename, progress)
+            return f"{base_filename}.pdf", 'application/pdf', pdf_bytes
+        return f"{base_filename}.docx", DOCX_MIMETYPE, docx_content
+
+def coalescing_stats():
+    """Single-date renders run vs. requests that joined an identical in-flight render"""
+    with _coalesce_lock:
+        stats = dict(_coalesce_counts)
+    stats["in_flight"] = _report_flight.in_flight()
+    return stats
+
+def build_batch_report(filter_date, format_type='docx', progress=None):
+    """
+    One date for every tenant as a zip, return (download_name, mimetype, bytes).
+    All sheets are fetched at once over the shared keep-alive session, then the
+    tenants render in parallel; tenants without rows for the date are listed in
+    ERRORS.txt instead of failing the batch.
+    """
+    if format_type not in ('docx', 'pdf'):
+        raise ReportError(f"Format tidak dikenal: {format_type}")
+    progress = progress or (lambda stage: None)
+    sekarang = filter_date if filter_date else datetime.now()
+    tenants = get_registry().all()
+    logger.info(f"Generating {format_type} batch for {sekarang:%Y-%m-%d}, {len(tenants)} tenant(s)")
+
+    progress("download")
+    with span("download"):
+        fetched = fetch_sheets([tenant.file_id for tenant in tenants])
+
+    def render(tenant):
+        # Sheet sudah ada di cache TTL, jadi build_report tidak mengunduh ulang
+        if isinstance(fetched[tenant.file_id], Exception):
+            raise fetched[tenant.file_id]
+        return build_report(sekarang, format_type, tenant=tenant, block=True)
+
+    progress("render")
+    futures = [(tenant, range_executor.submit(render, tenant)) for tenant in tenants]
+    files, errors = [], []
+    for tenant, future in futures:
+        try:
+            download_name, _, content = future.result()
+            files.append((download_name, content))
+        except (ReportError, SheetFetchError, AdmissionRejected) as e:
+            logger.warning(f"Batch report for tenant '{tenant.id}' failed: {str(e)}")
+            errors.append(f"{tenant.id} ({tenant.name}): {str(e)}")
+    if not files:
+        raise ReportError(f"Tidak ada laporan untuk tanggal {sekarang:%Y-%m-%d}: " + "; ".join(errors))
+    if errors:
+        files.append(("ERRORS.txt", "\n".join(errors).encode()))
+
+    batch_name = f"{report_names(sekarang)[2].split('_')[0]}_Daily Report Semua Tenant"
+    return f"{batch_name}.zip", 'application/zip', b"".join(stream_zip(iter(files)))
+
+def parse_iso_week(iso_week):
+    """'2026-W42' -> (Monday, Sunday) of that ISO week"""
+    try:
+        year, week = iso_week.upper().split('-W')
+        monday = datetime.combine(date.fromisocalendar(int(year), int(week), 1), datetime.min.time())
+    except ValueError:
+        raise ReportError(f"Format minggu tidak valid: {iso_week} (contoh: 2026-W42)")
+    return monday, monday + timedelta(days=6)
+
+def build_report_from_params(params, progress=None, block=False):
+    """
+    Single date (filter_date) or date range (start_date/end_date or iso_week,
+    with range_mode zip/combined) from request parameters, for one tenant
+    (tenant, default tenant when empty) or every tenant (tenant=all, single date only).
+    block=True waits for admission slots instead of raising AdmissionRejected.
+    """
+    format_type = params.get('format_type') or 'docx'
+    multi = params.get('tenant') == ALL_TENANTS or params.get('iso_week') or params.get('end_date')
+    if multi and not block:
+        # Rentang dan batch menunggu slot per laporan; ditolak di depan hanya bila antrean sudah penuh
+        check(format_type)
+    if params.get('tenant') == ALL_TENANTS:
+        if params.get('iso_week') or params.get('end_date'):
+            raise ReportError("Laporan semua tenant hanya untuk satu tanggal")
+        return build_batch_report(parse_filter_date(params.get('filter_date')), format_type, progress)
+    tenant = resolve_tenant(params.get('tenant'))
+    if params.get('iso_week'):
+        start_date, end_date = parse_iso_week(params['iso_week'])
+    elif params.get('end_date'):
+        start_date = parse_filter_date(params.get('start_date') or params.get('filter_date'))
+        end_date = parse_filter_date(params['end_date'])
+    else:
+        return build_report(parse_filter_date(params.get('filter_date')), format_type, progress, tenant, block)
+    return generate_report_range(start_date, end_date, format_type, params.get('range_mode') or 'zip', progress, tenant)
+
+def parse_filter_date(filter_date_str):
+    """Parse YYYY-MM-DD, falling back to today like the form always has"""
+    try:
+        return datetime.strptime(filter_date_str, "%Y-%m-%d")
+    except Exception as e:
+        logger.warning(f"Invalid date format: {str(e)}. Using current date.")
+        return datetime.now()
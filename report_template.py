@@ -0,0 +1,315 @@
+"""
+Report template loaded once and cloned per request.
+
+Opening the .docx (unzip + XML parse) and cleaning out the sample rows used to
+happen on every report. The template is now loaded once, normalised (Catatan
+paragraphs removed, sample data rows stripped, "Waktu Laporan" paragraph and
+target table located) and reloaded only when the file changes on disk. Each
+report works on a deep copy of the main document XML; all other package parts
+(styles, images, ...) are shared read-only and written out unchanged.
+"""
+import copy
+import logging
+import os
+import re
+import threading
+from xml.sax.saxutils import escape
+
+from docx import Document
+from docx.document import Document as DocumentObject
+from docx.opc.oxml import serialize_part_xml
+from docx.opc.pkgwriter import PackageWriter
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+
+from report_cache import template_digest
+
+logger = logging.getLogger(__name__)
+
+TABLE_HEADERS = ["No", "Pekerjaan", "Batas Waktu", "Status", "Diselesaikan Pada"]
+
+# Garis hitam tipis, sama dengan yang dulu dipasang per sel
+BORDER_ATTRS = {'w:val': 'single', 'w:sz': '4', 'w:space': '0', 'w:color': '000000'}
+
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_RUN_SPECIALS = re.compile('(\t|\r\n|\n|\r)')
+
+
+def _border_element(tag, names, attrs):
+    borders = OxmlElement(tag)
+    for name in names:
+        border = OxmlElement(f'w:{name}')
+        for key, value in attrs.items():
+            border.set(qn(key), value)
+        borders.append(border)
+    return borders
+
+
+def _has_borders(borders):
+    return borders is not None and any(border.get(qn('w:val')) not in ('nil', 'none') for border in borders)
+
+
+def _table_has_borders(tbl, styles=None):
+    """True when the table draws borders of its own (tblBorders) or through its table style"""
+    if _has_borders(tbl.tblPr.find(qn('w:tblBorders'))):
+        return True
+    style_id, seen = tbl.tblPr.style, set()
+    while styles is not None and style_id and style_id not in seen:
+        seen.add(style_id)
+        style = styles.get_by_id(style_id)
+        if style is None:
+            break
+        if _has_borders(style.find(f"{qn('w:tblPr')}/{qn('w:tblBorders')}")):
+            return True
+        based_on = style.find(qn('w:basedOn'))
+        style_id = based_on.get(qn('w:val')) if based_on is not None else None
+    return False
+
+
+def apply_table_borders(tbl, styles=None):
+    """
+    Put one black border definition on the table itself (tblBorders) instead of
+    a tcBorders copy in every data cell. When the template's header row had no
+    borders (no tcBorders, tblBorders or bordered table style in styles), it
+    keeps that look through explicit nil borders on its own cells.
+    """
+    tblPr = tbl.tblPr
+    bordered = _table_has_borders(tbl, styles)
+    for old in tblPr.findall(qn('w:tblBorders')):
+        tblPr.remove(old)
+    tblPr.insert_element_before(
+        _border_element('w:tblBorders', ['top', 'left', 'bottom', 'right', 'insideH', 'insideV'], BORDER_ATTRS),
+        'w:shd', 'w:tblLayout', 'w:tblCellMar', 'w:tblLook', 'w:tblCaption', 'w:tblDescription', 'w:tblPrChange'
+    )
+
+    header = tbl.tr_lst[0] if tbl.tr_lst else None
+    if header is None or bordered:
+        return
+    for tc in header.tc_lst:
+        tcPr = tc.get_or_add_tcPr()
+        if tcPr.find(qn('w:tcBorders')) is not None:
+            continue
+        tcPr.insert_element_before(
+            _border_element('w:tcBorders', ['top', 'left', 'right'], {'w:val': 'nil'}),
+            'w:shd', 'w:noWrap', 'w:tcMar', 'w:textDirection', 'w:tcFitText', 'w:vAlign', 'w:hideMark',
+            'w:headers', 'w:cellIns', 'w:cellDel', 'w:cellMerge', 'w:tcPrChange'
+        )
+
+
+def _run_xml(text):
+    """w:r content for text, with tabs and line breaks as w:tab / w:br like python-docx"""
+    text = _INVALID_XML_CHARS.sub('', text)
+    if not text:
+        return '<w:r/>'
+    parts = []
+    for piece in _RUN_SPECIALS.split(text):
+        if not piece:
+            continue
+        if piece == '\t':
+            parts.append('<w:tab/>')
+        elif piece in ('\n', '\r', '\r\n'):
+            parts.append('<w:br/>')
+        elif piece[0].isspace() or piece[-1].isspace():
+            parts.append(f'<w:t xml:space="preserve">{escape(piece)}</w:t>')
+        else:
+            parts.append(f'<w:t>{escape(piece)}</w:t>')
+    return '<w:r>' + ''.join(parts) + '</w:r>'
+
+
+def fill_table(tbl, rows):
+    """
+    Append all rows to tbl in one pass.
+
+    The w:tr markup for every row is built as one string and parsed once, so the
+    cost is linear in the number of rows; borders come from the table-level
+    definition set by apply_table_borders().
+    """
+    widths = [gridCol.get(qn('w:w')) for gridCol in tbl.tblGrid.gridCol_lst]
+    cell_open = [
+        f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr><w:p>' if width is not None
+        else '<w:tc><w:tcPr/><w:p>'
+        for width in widths
+    ]
+    markup = []
+    for row in rows:
+        markup.append('<w:tr>')
+        for opening, value in zip(cell_open, row):
+            markup.append(opening)
+            markup.append(_run_xml(str(value)))
+            markup.append('</w:p></w:tc>')
+        markup.append('</w:tr>')
+    if not markup:
+        return
+    fragment = parse_xml(f'<w:tbl {nsdecls("w")}>' + ''.join(markup) + '</w:tbl>')
+    tbl.extend(list(fragment))
+
+
+def _builtin_template():
+    doc = Document()
+    doc.add_heading('Daily Report', 0)
+    doc.add_paragraph("Waktu Laporan\t: ")
+    table = doc.add_table(rows=1, cols=5)
+    table.style = 'Table Grid'
+    header_cells = table.rows[0].cells
+    for i, header in enumerate(TABLE_HEADERS):
+        header_cells[i].text = header
+    return doc
+
+
+class _DocumentPartCopy:
+    """Stand-in for the main document part when writing a cloned report"""
+
+    def __init__(self, part, element):
+        self.partname = part.partname
+        self.content_type = part.content_type
+        self.rels = part.rels
+        self.blob = serialize_part_xml(element)
+
+
+class ReportDocument:
+    """A per-request copy of the template's document XML"""
+
+    def __init__(self, template, element):
+        self.template = template
+        self.element = element
+        self.document = DocumentObject(element, template.part)
+        body = element.body
+        self.waktu_paragraph = Paragraph(body[template.waktu_index], self.document._body)
+        self.table = Table(body[template.table_index], self.document._body)
+
+    def fill_table(self, rows):
+        fill_table(self.table._tbl, rows)
+
+    def add_paragraph(self, text):
+        return self.document.add_paragraph(text)
+
+    def save(self, stream):
+        parts = [
+            _DocumentPartCopy(part, self.element) if part is self.template.part else part
+            for part in self.template.package.iter_parts()
+        ]
+        PackageWriter.write(stream, self.template.package.rels, parts)
+
+
+class ReportTemplate:
+    def __init__(self, path):
+        self.path = path
+        self.digest = template_digest(path)
+        if os.path.exists(path):
+            logger.info(f"Loading template file: {path}")
+            doc = Document(path)
+        else:
+            logger.warning(f"Template file '{path}' not found. Using a simple built-in template.")
+            doc = _builtin_template()
+        self._normalise(doc)
+
+        self.part = doc.part
+        self.package = doc.part.package
+        for part in self.package.iter_parts():
+            part.before_marshal()
+        self.element = doc.element
+
+    def _normalise(self, doc):
+        # Hapus paragraf Catatan jika ada
+        for para in list(doc.paragraphs):
+            if "Catatan" in para.text:
+                doc.element.body.remove(para._element)
+
+        for para in doc.paragraphs:
+            if "Waktu Laporan" in para.text:
+                waktu_paragraph = para
+                break
+        else:
+            waktu_paragraph = doc.add_paragraph("Waktu Laporan\t: ")
+
+        if not doc.tables:
+            logger.warning("No table found in template, creating one")
+            table = doc.add_table(rows=1, cols=5)
+            table.style = 'Table Grid'
+            for cell, header in zip(table.rows[0].cells, TABLE_HEADERS):
+                cell.text = header
+        else:
+            table = doc.tables[0]
+
+        # Pertahankan baris header, hapus semua baris data sekaligus
+        tbl = table._tbl
+        for tr in tbl.tr_lst[1:]:
+            tbl.remove(tr)
+
+        apply_table_borders(tbl, doc.styles.element)
+
+        body = doc.element.body
+        self.waktu_index = body.index(waktu_paragraph._element)
+        self.table_index = body.index(tbl)
+
+    def new_document(self):
+        """Fresh ReportDocument backed by a deep copy of the normalised XML"""
+        return ReportDocument(self, copy.deepcopy(self.element))
+
+
+_W14_IDS = ('{http://schemas.microsoft.com/office/word/2010/wordml}paraId',
+            '{http://schemas.microsoft.com/office/word/2010/wordml}textId')
+_DOCPR = '{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}docPr'
+
+
+def combine_reports(reports):
+    """
+    Merge per-day ReportDocuments into the first one, each day in its own
+    section (starting on a new page). Identifiers that must be unique in a
+    document (drawing ids, paragraph ids, bookmarks) are fixed up on the copies.
+    """
+    first = reports[0]
+    body = first.element.body
+    final_sectPr = body.sectPr
+    next_id = max([int(el.get('id', 0)) for el in first.element.iter(_DOCPR)] + [0]) + 1
+
+    for report in reports[1:]:
+        # Paragraf penutup section sebelumnya (ganti halaman)
+        separator = OxmlElement('w:p')
+        if final_sectPr is not None:
+            separator.get_or_add_pPr().append(copy.deepcopy(final_sectPr))
+        else:
+            separator.append(parse_xml(f'<w:r {nsdecls("w")}><w:br w:type="page"/></w:r>'))
+        body.insert_element_before(separator, 'w:sectPr')
+
+        for child in list(report.element.body):
+            if child.tag == qn('w:sectPr'):
+                continue
+            for el in child.iter():
+                for attr in _W14_IDS:
+                    if attr in el.attrib:
+                        del el.attrib[attr]
+                if el.tag == _DOCPR:
+                    el.set('id', str(next_id))
+                    next_id += 1
+            for bookmark in child.xpath('.//w:bookmarkStart | .//w:bookmarkEnd'):
+                bookmark.getparent().remove(bookmark)
+            body.insert_element_before(child, 'w:sectPr')
+    return first
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+
+def get_template(path):
+    """Normalised ReportTemplate for path, reloaded when the file changes"""
+    signature = _signature(path)
+    with _templates_lock:
+        entry = _templates.get(path)
+        if entry is None or entry[0] != signature:
+            if entry is not None:
+                logger.info(f"Template file changed, reloading: {path}")
+            entry = (signature, ReportTemplate(path))
+            _templates[path] = entry
+        return entry[1]
@@ -0,0 +1,330 @@
+"""
+Parsed "New Format" sheets, cached per workbook revision.
+
+read_excel is the slowest CPU step of a report, so each downloaded revision is
+parsed once and kept in memory. The rows are sorted by Tanggal and indexed by
+date, so pulling one day's rows is a slice instead of a scan over the history.
+pandas and numpy are imported on first parse.
+
+With SHEET_READER=stream the workbook is instead streamed row by row through
+openpyxl's read-only mode: only the columns the report uses are kept, and
+when the caller names the dates it needs, only those dates' rows are kept, so
+peak memory follows the size of the report instead of the whole history.
+Dates already read for a revision are kept, later requests only stream the
+dates that are missing.
+
+parse_day_csv() reads the small CSV that the filtered export (see SheetQuery
+in sheet_source.py) returns for a single date.
+"""
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+SHEET_NAME = "New Format"
+
+# Kolom yang dipakai laporan; pembaca streaming hanya menyimpan kolom ini
+REPORT_COLUMNS = ("Tanggal", "Pekerjaan", "Batas Waktu", "Status", "Diselesaikan Pada", "Keterangan")
+
+# 'pandas' (read_excel seluruh sheet, sekali per revisi) atau 'stream' (baca per baris, hanya tanggal yang diminta)
+SHEET_READER = os.environ.get("SHEET_READER", "pandas")
+
+# Kolom tanggal; di ekspor CSV isinya teks sesuai tampilan sel di Google Sheets
+DATE_COLUMNS = ("Tanggal", "Batas Waktu", "Diselesaikan Pada")
+QUERY_DATE_FORMAT = os.environ.get("SHEET_QUERY_DATE_FORMAT", "%d/%m/%Y")
+
+# Teks yang oleh read_excel dibaca sebagai sel kosong (na_values bawaan pandas)
+NA_STRINGS = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+})
+
+
+def _tanggal_key(value):
+    """Normalise one Tanggal cell to the YYYY-MM-DD string used for filtering"""
+    import pandas as pd
+    
+    if isinstance(value, (datetime, date)) and not pd.isna(value):
+        return value.strftime("%Y-%m-%d")
+    if value is None or pd.isna(value):
+        return None
+    text = str(value).strip()
+    return text or None
+
+
+def tanggal_keys(series):
+    """Vectorised _tanggal_key for a whole Tanggal column"""
+    import pandas as pd
+    
+    if pd.api.types.is_datetime64_any_dtype(series):
+        keys = series.dt.strftime("%Y-%m-%d")
+        return keys.where(series.notna(), None)
+    return series.map(_tanggal_key)
+
+
+class ParsedSheet:
+    """One parsed revision of the sheet with a Tanggal -> row-range index"""
+
+    def __init__(self, revision, df):
+        import numpy as np
+        import pandas as pd
+        
+        self.revision = revision
+        keys = tanggal_keys(df['Tanggal']) if 'Tanggal' in df.columns else pd.Series([None] * len(df))
+        present = keys.notna().to_numpy()
+        keys = keys[present].to_numpy(dtype=object)
+        df = df[present]
+
+        order = np.argsort(keys, kind="stable")
+        self.frame = df.iloc[order].reset_index(drop=True)
+        sorted_keys = keys[order]
+
+        self.index = {}
+        if len(sorted_keys):
+            dates, starts = np.unique(sorted_keys, return_index=True)
+            stops = np.append(starts[1:], len(sorted_keys))
+            self.index = {d: (int(a), int(b)) for d, a, b in zip(dates, starts, stops)}
+
+    def rows_for(self, tanggal):
+        """Rows whose Tanggal equals tanggal (YYYY-MM-DD), in sheet order"""
+        start, stop = self.index.get(tanggal, (0, 0))
+        return self.frame.iloc[start:stop]
+
+    def dates(self):
+        return sorted(self.index)
+
+    def __len__(self):
+        return len(self.frame)
+
+
+class StreamedSheet:
+    """
+    Dates of one revision streamed in several passes, kept as they were read
+    (dtypes are those of each pass) behind the read side of ParsedSheet
+    """
+
+    def __init__(self, revision, parts):
+        self.revision = revision
+        self._parts = parts
+        self._empty = next(iter(parts.values())).iloc[0:0]
+
+    def rows_for(self, tanggal):
+        return self._parts.get(tanggal, self._empty)
+
+    def dates(self):
+        return sorted(self._parts)
+
+    def __len__(self):
+        return sum(len(rows) for rows in self._parts.values())
+
+
+def _cell_value(value):
+    """An openpyxl cell value the way read_excel returns it"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value in NA_STRINGS:
+        return None
+    return value
+
+
+def _cell_tanggal(value):
+    """_tanggal_key for a raw cell value, without pandas"""
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%Y-%m-%d")
+    value = _cell_value(value)
+    if value is None:
+        return None
+    text = str(value).strip()
+    return text or None
+
+
+def stream_sheet(content, sheet_name=SHEET_NAME, dates=None, columns=REPORT_COLUMNS):
+    """
+    DataFrame of `columns` read row by row from xlsx bytes in read-only mode,
+    keeping only rows whose Tanggal is one of dates (every dated row when None).
+    Only the kept rows are ever held in memory.
+    """
+    import openpyxl
+    import pandas as pd
+    
+    wanted = set(dates) if dates is not None else None
+    workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        if sheet_name not in workbook.sheetnames:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        positions = {}
+        for position, name in enumerate(next(rows, ())):
+            if name is not None:
+                positions.setdefault(str(name), position)
+        present = [column for column in columns if column in positions]
+        picks = [positions[column] for column in present]
+        tanggal_at = positions.get("Tanggal")
+
+        kept = []
+        if tanggal_at is not None:
+            for row in rows:
+                key = _cell_tanggal(row[tanggal_at]) if tanggal_at < len(row) else None
+                if key is None or (wanted is not None and key not in wanted):
+                    continue
+                kept.append(tuple(_cell_value(row[at]) if at < len(row) else None for at in picks))
+    finally:
+        workbook.close()
+    return pd.DataFrame.from_records(kept, columns=present)
+
+
+def parse_sheet(snapshot, sheet_name=SHEET_NAME, dates=None):
+    """
+    Read one worksheet ("New Format" by default) of a snapshot into a ParsedSheet
+    (uncached). dates (or SHEET_READER=stream) selects the streaming reader.
+    """
+    import pandas as pd
+    
+    if dates is None and SHEET_READER != "stream":
+        logger.info(f"Parsing sheet '{sheet_name}' for revision {snapshot.revision[:12]}")
+        df = pd.read_excel(io.BytesIO(snapshot.content), sheet_name=sheet_name)
+    else:
+        scope = "all dates" if dates is None else f"{len(dates)} date(s)"
+        logger.info(f"Streaming sheet '{sheet_name}' for revision {snapshot.revision[:12]}, {scope}")
+        df = stream_sheet(snapshot.content, sheet_name, dates)
+    sheet = ParsedSheet(snapshot.revision, df)
+    logger.info(f"Sheet parsed, shape: {df.shape}, {len(sheet.index)} dates indexed")
+    return sheet
+
+
+def _csv_dates(series):
+    """Date text of a CSV column as datetimes; text that is not a date stays as it is"""
+    import pandas as pd
+    
+    parsed = pd.to_datetime(series, format=QUERY_DATE_FORMAT, errors="coerce")
+    with_time = pd.to_datetime(series[parsed.isna()], format=f"{QUERY_DATE_FORMAT} %H:%M:%S", errors="coerce")
+    parsed = parsed.fillna(with_time)
+    if parsed.notna().sum() == series.notna().sum():
+        return parsed.astype("datetime64[us]")
+    # Sel teks (mis. 'belum') tetap teks, seperti di kolom campuran hasil read_excel
+    return series.astype(object).where(parsed.isna(), parsed.astype(object))
+
+
+def parse_day_csv(snapshot, tanggal, date_column=None):
+    """
+    ParsedSheet of one date from a filtered CSV export whose rows the server
+    already selected by date_column (a column letter). Raises ValueError when
+    the response is not the sheet's CSV, Tanggal is not date_column, or its
+    values do not read as tanggal (SHEET_QUERY_DATE_FORMAT).
+    """
+    import pandas as pd
+    from openpyxl.utils import get_column_letter
+    
+    try:
+        df = pd.read_csv(io.BytesIO(snapshot.content), dtype=str)
+    except pd.errors.EmptyDataError:
+        raise ValueError("empty CSV export")
+    if "Tanggal" not in df.columns:
+        raise ValueError("CSV export has no Tanggal column")
+    # Query menyaring per huruf kolom; kolom yang salah berarti hasil kosong, bukan error
+    actual = get_column_letter(df.columns.get_loc("Tanggal") + 1)
+    if date_column is not None and actual != date_column.upper():
+        raise ValueError(f"Tanggal is column {actual} but the query filtered column {date_column}")
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            df[column] = _csv_dates(df[column])
+    if not (tanggal_keys(df["Tanggal"]) == tanggal).all():
+        raise ValueError(f"CSV export has rows not dated {tanggal}")
+    sheet = ParsedSheet(snapshot.revision, df)
+    logger.info(f"Filtered CSV for {tanggal} parsed, shape: {df.shape}")
+    return sheet
+
+
+class ParsedSheetCache:
+    """
+    Keep the parsed sheets of the most recent `size` (revision, worksheet)
+    pairs, parsing each one at most once.
+
+    A sheet streamed for some dates only (SHEET_READER=stream) is filled in
+    lazily: a later request streams just the dates that are not in it yet and
+    merges them, so every date of a revision is read from the workbook once.
+    The entry grows with the dates asked for, at most to the whole sheet.
+    """
+
+    def __init__(self, size=2):
+        self.size = size
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        # (revision, worksheet) -> (ParsedSheet, tanggal yang sudah dibaca; None = semua)
+        self._sheets = OrderedDict()
+        self._stats = {"hits": 0, "parses": 0}
+
+    def get(self, snapshot, sheet_name=SHEET_NAME, dates=None):
+        key = (snapshot.revision, sheet_name)
+        wanted = frozenset(dates) if dates is not None else None
+        with self._lock:
+            entry = self._sheets.get(key)
+            covered = entry[1] if entry is not None else frozenset()
+            if entry is not None and (covered is None or (wanted is not None and wanted <= covered)):
+                self._sheets.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[0]
+            missing = wanted - covered if wanted is not None else None
+
+        flight_key = key + (tuple(sorted(missing)) if missing is not None else None,)
+        sheet, shared = self._flight.do(flight_key, self._parse, key, snapshot, missing)
+        if shared:
+            with self._lock:
+                self._stats["hits"] += 1
+        return sheet
+
+    def ensure_size(self, size):
+        """Grow the cache to hold at least size sheets (e.g. two revisions per tenant)"""
+        with self._lock:
+            self.size = max(self.size, size)
+
+    def _parse(self, key, snapshot, dates):
+        revision, sheet_name = key
+        sheet = parse_sheet(snapshot, sheet_name, sorted(dates) if dates is not None else None)
+        with self._lock:
+            self._stats["parses"] += 1
+            entry = self._sheets.get(key)
+            if dates is None or entry is None:
+                covered = dates
+            elif entry[1] is None:
+                # Sheet lengkap sudah tersimpan selagi tanggal ini dibaca
+                return entry[0]
+            else:
+                sheet, covered = self._merge(revision, entry, sheet), entry[1] | dates
+            self._sheets[key] = (sheet, covered)
+            self._sheets.move_to_end(key)
+            while len(self._sheets) > self.size:
+                self._sheets.popitem(last=False)
+        return sheet
+
+    @staticmethod
+    def _merge(revision, entry, sheet):
+        """Sheet with the dates of entry plus the dates of sheet that entry does not cover yet"""
+        old, covered = entry
+        parts = {tanggal: sheet.rows_for(tanggal) for tanggal in sheet.dates() if tanggal not in covered}
+        if not parts:
+            return old
+        return StreamedSheet(revision, {**{tanggal: old.rows_for(tanggal) for tanggal in old.dates()}, **parts})
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["revisions"] = [revision[:12] for revision, _ in self._sheets]
+        return stats
+
+
+parsed_sheets = ParsedSheetCache(size=int(os.environ.get("SHEET_PARSED_CACHE_SIZE", 2)))
+
+
+def load_sheet(snapshot, sheet_name=SHEET_NAME, dates=None):
+    """
+    ParsedSheet for a SheetSnapshot, parsed at most once per revision. With
+    SHEET_READER=stream and dates, only those dates are read (and cached).
+    """
+    return parsed_sheets.get(snapshot, sheet_name, dates if SHEET_READER == "stream" else None)
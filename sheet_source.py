@@ -0,0 +1,389 @@
+"""
+Shared, cached access to the Google Sheets xlsx export.
+
+Every report needs the same workbook, so instead of downloading it on every
+request we keep the last good copy in memory and only go back to Google when
+the copy is older than the TTL. Revalidation is conditional (ETag /
+Last-Modified), concurrent refreshes are collapsed into one request, and when
+Google is unreachable the last good copy can keep being served. All sources
+share one keep-alive HTTP session, so fetching several tenants' sheets at
+once reuses pooled connections.
+
+SheetQuery is the alternative for single-date reports: it asks the gviz query
+endpoint for only the rows of one date as CSV, and steps aside (so callers use
+the full xlsx export) for a while after the endpoint fails.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from urllib.parse import quote
+
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Sheet default untuk laporan harian
+DEFAULT_FILE_ID = "1wJlAUerJDxpaBRxMOLxOmcSzG5LdwUz4K8HJ3uc1v0s"
+GOOGLE_BASE_URL = "https://docs.google.com"
+
+# 'xlsx' (seluruh workbook) atau 'query' (hanya baris satu tanggal lewat gviz CSV, xlsx sebagai cadangan)
+SHEET_SOURCE = os.environ.get("SHEET_SOURCE", "xlsx")
+
+
+class SheetFetchError(Exception):
+    """Raised when the spreadsheet cannot be downloaded and no usable copy is cached"""
+
+
+@dataclass(frozen=True)
+class SheetSnapshot:
+    content: bytes
+    revision: str
+    etag: str = None
+    last_modified: str = None
+    validated_at: float = 0.0
+    stale: bool = False
+
+    @property
+    def age(self):
+        return time.monotonic() - self.validated_at
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        logger.warning(f"Invalid value for {name}, using {default}")
+        return float(default)
+
+
+def _base_url():
+    return os.environ.get("SHEET_EXPORT_BASE_URL", GOOGLE_BASE_URL).rstrip("/")
+
+
+def sheet_export_url(file_id, fmt="xlsx"):
+    """Export URL for a sheet; SHEET_EXPORT_BASE_URL points it at a local stand-in"""
+    return f"{_base_url()}/spreadsheets/d/{file_id}/export?format={fmt}"
+
+
+def sheet_query_url(file_id, sheet_name, query):
+    """gviz URL that returns the rows of one worksheet matching query, as CSV with a header row"""
+    return (
+        f"{_base_url()}/spreadsheets/d/{file_id}/gviz/tq?tqx=out:csv&headers=1"
+        f"&sheet={quote(sheet_name)}&tq={quote(query)}"
+    )
+
+
+class SheetSource:
+    """
+    TTL cache with conditional revalidation in front of one export URL.
+
+    ttl            seconds a downloaded copy is served without asking Google
+    serve_stale    keep serving the last good copy when a refresh fails
+    max_stale      how old (seconds) a copy may get before it is no longer served
+    error_backoff  seconds to wait after a failed refresh before trying again
+    """
+
+    def __init__(self, url, ttl=60, timeout=30, serve_stale=True, max_stale=3600,
+                 error_backoff=10, session=None):
+        self.url = url
+        self.ttl = ttl
+        self.timeout = timeout
+        self.serve_stale = serve_stale
+        self.max_stale = max_stale
+        self.error_backoff = error_backoff
+        if session is None:
+            import requests
+            
+            session = requests.Session()
+        self.session = session
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._snapshot = None
+        self._retry_at = 0.0
+        self._stats = {
+            "hits": 0,
+            "downloads": 0,
+            "not_modified": 0,
+            "coalesced": 0,
+            "stale_served": 0,
+            "errors": 0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, force=False):
+        """Return a SheetSnapshot, refreshing it first if it is older than the TTL"""
+        snapshot = self._snapshot
+        if snapshot is not None and not force:
+            if snapshot.age < self.ttl:
+                self._count("hits")
+                return snapshot
+            if time.monotonic() < self._retry_at and self._usable_stale(snapshot):
+                self._count("stale_served")
+                return replace(snapshot, stale=True)
+
+        snapshot, shared = self._flight.do(self.url, self._refresh)
+        if shared:
+            self._count("coalesced")
+        return snapshot
+
+    def _usable_stale(self, snapshot):
+        return self.serve_stale and snapshot.age < self.max_stale
+
+    def _refresh(self):
+        cached = self._snapshot
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        try:
+            logger.info(f"Fetching spreadsheet export: {self.url}")
+            response = self.session.get(self.url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and cached is not None:
+                logger.info("Spreadsheet not modified, reusing cached copy")
+                self._count("not_modified")
+                snapshot = replace(cached, validated_at=time.monotonic(), stale=False)
+            elif response.status_code == 200:
+                content = response.content
+                snapshot = SheetSnapshot(
+                    content=content,
+                    revision=hashlib.sha256(content).hexdigest(),
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                    validated_at=time.monotonic(),
+                )
+                self._count("downloads")
+                logger.info(f"Spreadsheet downloaded, {len(content)} bytes, revision {snapshot.revision[:12]}")
+            else:
+                raise SheetFetchError(f"Gagal mengunduh file: status code {response.status_code}")
+        except Exception as e:
+            self._count("errors")
+            self._retry_at = time.monotonic() + self.error_backoff
+            if not isinstance(e, SheetFetchError):
+                e = SheetFetchError(f"Gagal mengunduh file: {str(e)}")
+            if cached is not None and self._usable_stale(cached):
+                logger.warning(f"{e}; serving cached copy from {cached.age:.0f}s ago")
+                self._count("stale_served")
+                return replace(cached, stale=True)
+            logger.error(str(e))
+            raise e
+
+        self._snapshot = snapshot
+        self._retry_at = 0.0
+        return snapshot
+
+    def invalidate(self):
+        """Drop the cached copy so the next get() downloads the workbook again"""
+        self._snapshot = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        snapshot = self._snapshot
+        stats["url"] = self.url
+        stats["cached"] = snapshot is not None
+        if snapshot is not None:
+            stats["revision"] = snapshot.revision
+            stats["age_seconds"] = round(snapshot.age, 1)
+        stats["in_flight"] = self._flight.in_flight()
+        return stats
+
+
+_sources = {}
+_sources_lock = threading.Lock()
+_session = None
+
+
+def _new_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+    
+    # Satu koneksi keep-alive per sheet yang diunduh bersamaan
+    pool_size = int(_env_float("SHEET_HTTP_POOL_SIZE", 16))
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def shared_session():
+    """The keep-alive session every SheetSource from get_source() downloads through"""
+    global _session
+    with _sources_lock:
+        if _session is None:
+            _session = _new_session()
+        return _session
+
+
+def _new_source(url, session):
+    return SheetSource(
+        url,
+        ttl=_env_float("SHEET_CACHE_TTL", 60),
+        timeout=_env_float("SHEET_FETCH_TIMEOUT", 30),
+        serve_stale=os.environ.get("SHEET_SERVE_STALE", "1") != "0",
+        max_stale=_env_float("SHEET_MAX_STALE", 3600),
+        session=session,
+    )
+
+
+def get_source(url):
+    """Process-wide SheetSource for url, configured from the SHEET_* environment"""
+    session = shared_session()
+    with _sources_lock:
+        source = _sources.get(url)
+        if source is None:
+            source = _new_source(url, session)
+            _sources[url] = source
+        return source
+
+
+def reset_sessions():
+    """
+    Give every source a fresh shared HTTP session. Needed in a forked worker:
+    pooled keep-alive sockets inherited from the parent must not be shared.
+    """
+    global _session
+    session = _new_session()
+    with _sources_lock:
+        _session = session
+        sources = list(_sources.values())
+    for source in sources + sheet_queries.sources():
+        source.session = session
+
+
+def fetch_sheet(file_id=DEFAULT_FILE_ID):
+    """Return the cached SheetSnapshot for file_id"""
+    return get_source(sheet_export_url(file_id)).get()
+
+
+def fetch_sheets(file_ids, max_workers=None):
+    """
+    Fetch several sheets at once over the shared session, return
+    {file_id: SheetSnapshot or SheetFetchError} in the order of file_ids
+    """
+    file_ids = list(dict.fromkeys(file_ids))
+    if not file_ids:
+        return {}
+    max_workers = max_workers or int(_env_float("SHEET_FETCH_WORKERS", 8))
+
+    def fetch(file_id):
+        try:
+            return fetch_sheet(file_id)
+        except SheetFetchError as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(file_ids)), thread_name_prefix="sheet-fetch") as executor:
+        return dict(zip(file_ids, executor.map(fetch, file_ids)))
+
+
+def snapshot_from_file(path):
+    """SheetSnapshot for a local xlsx file, for offline runs"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    return SheetSnapshot(
+        content=content,
+        revision=hashlib.sha256(content).hexdigest(),
+        validated_at=time.monotonic(),
+    )
+
+
+def source_stats():
+    with _sources_lock:
+        sources = list(_sources.values())
+    return [source.stats() for source in sources]
+
+
+class SheetQuery:
+    """
+    Filtered CSV exports (gviz query) of single dates, each behind its own
+    TTL-cached SheetSource; only the most recent `size` dates are kept.
+
+    date_column  column letter of Tanggal, the query filters on it
+    backoff      seconds the endpoint is skipped after it failed, so reports
+                 go straight to the full xlsx export instead of waiting twice
+    """
+
+    def __init__(self, size=64, backoff=60, date_column="A"):
+        self.size = size
+        self.backoff = backoff
+        self.date_column = date_column
+        self._lock = threading.Lock()
+        self._sources = OrderedDict()
+        self._retry_at = 0.0
+        self._stats = {"queries": 0, "fallbacks": 0, "skipped": 0}
+
+    def day_query(self, tanggal):
+        return f"select * where {self.date_column} = date '{tanggal}'"
+
+    def available(self):
+        """False while backing off after a failure (counted as skipped)"""
+        if time.monotonic() >= self._retry_at:
+            return True
+        with self._lock:
+            self._stats["skipped"] += 1
+        return False
+
+    def _source(self, url):
+        with self._lock:
+            source = self._sources.get(url)
+            if source is None:
+                source = _new_source(url, shared_session())
+                self._sources[url] = source
+                while len(self._sources) > self.size:
+                    self._sources.popitem(last=False)
+            self._sources.move_to_end(url)
+            return source
+
+    def fetch(self, file_id, sheet_name, tanggal):
+        """SheetSnapshot of the CSV rows of one date, SheetFetchError when the endpoint fails"""
+        url = sheet_query_url(file_id, sheet_name, self.day_query(tanggal))
+        try:
+            snapshot = self._source(url).get()
+        except SheetFetchError as e:
+            self._reject(url, str(e))
+            raise
+        with self._lock:
+            self._stats["queries"] += 1
+        return snapshot
+
+    def reject(self, file_id, sheet_name, tanggal, reason):
+        """Drop a response that could not be used (e.g. not the expected CSV) and back off"""
+        self._reject(sheet_query_url(file_id, sheet_name, self.day_query(tanggal)), reason)
+
+    def _reject(self, url, reason):
+        with self._lock:
+            source = self._sources.pop(url, None)
+            self._stats["fallbacks"] += 1
+            self._retry_at = time.monotonic() + self.backoff
+        if source is not None:
+            source.invalidate()
+        logger.warning(f"Filtered sheet export unusable ({reason}), using the xlsx export for {self.backoff:.0f}s")
+
+    def sources(self):
+        with self._lock:
+            return list(self._sources.values())
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["dates_cached"] = len(self._sources)
+        stats["backing_off"] = time.monotonic() < self._retry_at
+        return stats
+
+
+sheet_queries = SheetQuery(
+    size=int(_env_float("SHEET_QUERY_CACHE_SIZE", 64)),
+    backoff=_env_float("SHEET_QUERY_BACKOFF", 60),
+    date_column=os.environ.get("SHEET_QUERY_DATE_COLUMN", "A"),
+)
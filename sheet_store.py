@@ -0,0 +1,398 @@
+"""
+Local copy of the "New Format" sheet, partitioned by Tanggal.
+
+The workbook keeps growing, but a report only needs the rows of one date. When
+SHEET_STORE_PATH is set, every new revision of the workbook is ingested once
+into a SQLite file with one partition per date. A partition holds the date's
+columns themselves (values and dtype per column, as JSON), so the file does not
+depend on the pandas version that wrote it, and it is stored under a hash of
+its rows: an ingest only writes the dates whose rows actually changed, while
+each revision keeps its own list of dates. Reports then read a single
+partition of the revision they started with instead of holding the whole
+parsed history. A file written in another layout (STORE_FORMAT) is rebuilt.
+"""
+import datetime
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from sheet_data import SHEET_NAME, load_sheet, parse_sheet
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Naikkan bila tata letak tabel atau payload berubah; file lama di-ingest ulang
+STORE_FORMAT = 2
+# Revisi lama tetap dibaca selama laporan yang sudah memegangnya berjalan
+KEEP_REVISIONS = int(os.environ.get("SHEET_STORE_REVISIONS", 3))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value BLOB);
+CREATE TABLE IF NOT EXISTS revisions (
+    revision TEXT PRIMARY KEY,
+    empty_frame TEXT NOT NULL,
+    ingested_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS partitions (
+    revision TEXT NOT NULL,
+    tanggal TEXT NOT NULL,
+    row_hash TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    PRIMARY KEY (revision, tanggal)
+);
+CREATE TABLE IF NOT EXISTS payloads (
+    row_hash TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+TABLES = ("meta", "revisions", "partitions", "payloads")
+
+
+class PartitionUnavailable(Exception):
+    """The revision is no longer in the store, or a partition cannot be decoded"""
+
+
+def partition_hashes(sheet):
+    """{tanggal: sha256} over the rows (values, columns and dtypes) of every date in a ParsedSheet"""
+    import pandas as pd
+    
+    frame = sheet.frame
+    schema = "\x1f".join(f"{column}:{dtype}" for column, dtype in frame.dtypes.items()).encode()
+    row_hashes = pd.util.hash_pandas_object(frame.astype(str), index=False).to_numpy()
+    hashes = {}
+    for tanggal, (start, stop) in sheet.index.items():
+        h = hashlib.sha256(schema)
+        h.update(row_hashes[start:stop].tobytes())
+        hashes[tanggal] = h.hexdigest()
+    return hashes
+
+
+def _encode_value(value):
+    import pandas as pd
+    
+    if value is None or value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, datetime.datetime):
+        return {"datetime": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"date": value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {"time": value.isoformat()}
+    if isinstance(value, datetime.timedelta):
+        return {"timedelta": value.total_seconds()}
+    if hasattr(value, "item"):
+        # Skalar numpy
+        return _encode_value(value.item())
+    return str(value)
+
+
+def _decode_value(value):
+    import pandas as pd
+    
+    if not isinstance(value, dict):
+        return value
+    if "datetime" in value:
+        return pd.Timestamp(value["datetime"])
+    if "date" in value:
+        return datetime.date.fromisoformat(value["date"])
+    if "time" in value:
+        return datetime.time.fromisoformat(value["time"])
+    return pd.Timedelta(seconds=value["timedelta"])
+
+
+def encode_frame(frame):
+    """JSON of a DataFrame as columns (name, dtype, values), readable without pickle or a given pandas"""
+    import numpy as np
+    
+    columns = []
+    for name, series in frame.items():
+        dtype = series.dtype
+        if dtype.kind == "M" and isinstance(dtype, np.dtype):
+            # Tanggal tanpa zona waktu: bilangan bulat dalam satuan dtype, NaT tetap NaT
+            values = series.to_numpy().view("int64").tolist()
+        elif dtype.kind in "biuf" and isinstance(dtype, np.dtype):
+            values = series.tolist()
+        else:
+            values = [_encode_value(value) for value in series.tolist()]
+        columns.append({"name": _encode_value(name), "dtype": str(dtype), "values": values})
+    return json.dumps({"columns": columns}, separators=(",", ":"))
+
+
+def decode_frame(payload):
+    """DataFrame back from encode_frame(); a dtype this pandas does not know becomes object"""
+    import numpy as np
+    import pandas as pd
+    
+    data = {}
+    for column in json.loads(payload)["columns"]:
+        name, dtype, values = _decode_value(column["name"]), column["dtype"], column["values"]
+        if dtype.startswith("datetime64[") and dtype.endswith("]"):
+            data[name] = pd.Series(np.array(values, dtype="int64").view(dtype))
+            continue
+        values = [_decode_value(value) for value in values]
+        try:
+            data[name] = pd.Series(values, dtype=dtype)
+        except (TypeError, ValueError):
+            data[name] = pd.Series(values, dtype=object)
+    return pd.DataFrame(data)
+
+
+class StoredSheet:
+    """Read-only view of one ingested revision, with the same rows_for() as ParsedSheet"""
+
+    def __init__(self, store, snapshot):
+        self.store = store
+        self.snapshot = snapshot
+        self.revision = snapshot.revision
+
+    def rows_for(self, tanggal):
+        """Rows whose Tanggal equals tanggal (YYYY-MM-DD), in sheet order"""
+        try:
+            return self.store.read_partition(tanggal, self.revision)
+        except PartitionUnavailable as e:
+            # Tetap revisi yang sama: baca dari snapshot-nya, bukan dari revisi yang lebih baru
+            logger.warning(f"Sheet store cannot serve {tanggal} of revision {self.revision[:12]} ({str(e)}), "
+                           f"reading the snapshot")
+            return load_sheet(self.snapshot, self.store.sheet_name, [tanggal]).rows_for(tanggal)
+
+    def dates(self):
+        return self.store.dates(self.revision)
+
+
+class SheetStore:
+    """SQLite file holding one partition per Tanggal for the latest KEEP_REVISIONS revisions"""
+
+    def __init__(self, path, sheet_name=SHEET_NAME, keep_revisions=KEEP_REVISIONS):
+        self.path = path
+        self.sheet_name = sheet_name
+        self.keep_revisions = max(1, keep_revisions)
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._revision = None
+        self._empty = {}
+        self._stats = {"ingests": 0, "written": 0, "deleted": 0, "unchanged": 0, "reads": 0,
+                       "read_errors": 0}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._check_format(conn)
+
+    def _connect(self):
+        # Koneksi per operasi: aman dipakai dari banyak thread dan proses
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _meta(self, conn, key):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _check_format(self, conn):
+        """Create the tables, or drop and recreate them when the file has another STORE_FORMAT"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            stored = self._meta(conn, "format") if "meta" in tables else None
+            if tables and str(stored) != str(STORE_FORMAT):
+                logger.warning(f"Sheet store {self.path} has format {stored}, expected {STORE_FORMAT}; rebuilding")
+                for table in TABLES:
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('format', ?)", (str(STORE_FORMAT),))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def sync(self, snapshot):
+        """Ingest snapshot if it is not the stored revision yet, return a StoredSheet pinned to it"""
+        if self._revision != snapshot.revision:
+            self._flight.do(snapshot.revision, self._ingest, snapshot)
+        return StoredSheet(self, snapshot)
+
+    def _ingest(self, snapshot):
+        with closing(self._connect()) as conn:
+            if conn.execute("SELECT 1 FROM revisions WHERE revision = ?", (snapshot.revision,)).fetchone():
+                # Sudah di-ingest (mis. oleh proses lain)
+                self._revision = snapshot.revision
+                return
+
+        started = time.perf_counter()
+        sheet = parse_sheet(snapshot, self.sheet_name)
+        hashes = partition_hashes(sheet)
+
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                latest = conn.execute("SELECT revision FROM revisions ORDER BY ingested_at DESC LIMIT 1").fetchone()
+                previous = dict(conn.execute("SELECT tanggal, row_hash FROM partitions WHERE revision = ?",
+                                             (latest[0],))) if latest else {}
+                changed = [tanggal for tanggal, row_hash in hashes.items() if previous.get(tanggal) != row_hash]
+                removed = [tanggal for tanggal in previous if tanggal not in hashes]
+
+                now = time.time()
+                for tanggal in changed:
+                    start, stop = sheet.index[tanggal]
+                    rows = sheet.frame.iloc[start:stop].reset_index(drop=True)
+                    conn.execute(
+                        "INSERT OR IGNORE INTO payloads (row_hash, payload, updated_at) VALUES (?, ?, ?)",
+                        (hashes[tanggal], encode_frame(rows), now)
+                    )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO partitions (revision, tanggal, row_hash, row_count) VALUES (?, ?, ?, ?)",
+                    [(snapshot.revision, tanggal, row_hash, sheet.index[tanggal][1] - sheet.index[tanggal][0])
+                     for tanggal, row_hash in hashes.items()]
+                )
+                conn.execute("INSERT OR REPLACE INTO revisions (revision, empty_frame, ingested_at) VALUES (?, ?, ?)",
+                             (snapshot.revision, encode_frame(sheet.frame.iloc[:0]), now))
+
+                # Revisi terlama dan partisi yang tidak lagi dipakai revisi mana pun dibuang
+                expired = [row[0] for row in conn.execute(
+                    "SELECT revision FROM revisions ORDER BY ingested_at DESC LIMIT -1 OFFSET ?",
+                    (self.keep_revisions,)
+                )]
+                for revision in expired:
+                    conn.execute("DELETE FROM partitions WHERE revision = ?", (revision,))
+                    conn.execute("DELETE FROM revisions WHERE revision = ?", (revision,))
+                conn.execute("DELETE FROM payloads WHERE row_hash NOT IN (SELECT row_hash FROM partitions)")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        with self._lock:
+            self._stats["ingests"] += 1
+            self._stats["written"] += len(changed)
+            self._stats["deleted"] += len(removed)
+            self._stats["unchanged"] += len(hashes) - len(changed)
+            self._revision = snapshot.revision
+        logger.info(f"Sheet revision {snapshot.revision[:12]} ingested in {time.perf_counter() - started:.2f}s: "
+                    f"{len(changed)} dates written, {len(removed)} removed, {len(hashes) - len(changed)} unchanged")
+
+    def read_partition(self, tanggal, revision):
+        """
+        DataFrame of one date's rows in revision (empty frame with the sheet's
+        columns when there are none); PartitionUnavailable when the revision is
+        gone from the store or its partition cannot be read
+        """
+        with self._lock:
+            self._stats["reads"] += 1
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    "SELECT revisions.empty_frame, partitions.row_hash, payloads.payload FROM revisions "
+                    "LEFT JOIN partitions ON partitions.revision = revisions.revision AND partitions.tanggal = ? "
+                    "LEFT JOIN payloads ON payloads.row_hash = partitions.row_hash "
+                    "WHERE revisions.revision = ?",
+                    (tanggal, revision)
+                ).fetchone()
+        except sqlite3.Error as e:
+            self._count_read_error()
+            raise PartitionUnavailable(str(e)) from e
+        if row is None:
+            raise PartitionUnavailable("revision no longer stored")
+
+        empty_frame, row_hash, payload = row
+        try:
+            if payload is not None:
+                return decode_frame(payload)
+            if row_hash is not None:
+                raise ValueError("partition without payload")
+            empty = self._empty.get(revision)
+            if empty is None:
+                empty = decode_frame(empty_frame)
+                with self._lock:
+                    self._empty = {revision: empty}
+            return empty
+        except Exception as e:
+            self._count_read_error()
+            self._discard(revision, row_hash)
+            raise PartitionUnavailable(f"{type(e).__name__}: {str(e)}") from e
+
+    def _count_read_error(self):
+        with self._lock:
+            self._stats["read_errors"] += 1
+
+    def _discard(self, revision, row_hash):
+        """Forget a revision with an unreadable partition so the next sync ingests it again"""
+        logger.error(f"Discarding unreadable revision {revision[:12]} from sheet store {self.path}")
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM partitions WHERE revision = ?", (revision,))
+                conn.execute("DELETE FROM revisions WHERE revision = ?", (revision,))
+                if row_hash is not None:
+                    conn.execute("DELETE FROM payloads WHERE row_hash = ?", (row_hash,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        with self._lock:
+            if self._revision == revision:
+                self._revision = None
+
+    def dates(self, revision=None):
+        with closing(self._connect()) as conn:
+            return [row[0] for row in conn.execute(
+                "SELECT tanggal FROM partitions WHERE revision = ? ORDER BY tanggal", (revision or self._revision,)
+            )]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["path"] = self.path
+        stats["revision"] = self._revision[:12] if self._revision else None
+        with closing(self._connect()) as conn:
+            stats["partitions"], stats["rows"] = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(row_count), 0) FROM partitions WHERE revision = ?", (self._revision,)
+            ).fetchone()
+            stats["revisions"] = conn.execute("SELECT COUNT(*) FROM revisions").fetchone()[0]
+            stats["payloads"] = conn.execute("SELECT COUNT(*) FROM payloads").fetchone()[0]
+        return stats
+
+
+_stores = {}
+_store_lock = threading.Lock()
+
+
+def store_path(base_path, name=None):
+    """SHEET_STORE_PATH for the default sheet, 'sheet.<name>.sqlite' next to it for other tenants"""
+    if not name:
+        return base_path
+    root, ext = os.path.splitext(base_path)
+    return f"{root}.{name}{ext or '.sqlite'}"
+
+
+def get_store(name=None, sheet_name=SHEET_NAME):
+    """
+    Process-wide SheetStore under SHEET_STORE_PATH, or None when the store is
+    disabled. name selects a tenant's own file (None for the default sheet).
+    """
+    base_path = os.environ.get("SHEET_STORE_PATH")
+    if not base_path:
+        return None
+    path = store_path(base_path, name)
+    with _store_lock:
+        store = _stores.get(name)
+        if store is None or store.path != path or store.sheet_name != sheet_name:
+            store = _stores[name] = SheetStore(path, sheet_name)
+        return store
+
+
+def store_stats():
+    with _store_lock:
+        stores = dict(_stores)
+    if not stores:
+        return {"enabled": False}
+    if list(stores) == [None]:
+        return stores[None].stats()
+    return {"enabled": True, "stores": {name or "default": store.stats() for name, store in stores.items()}}
@@ -0,0 +1,137 @@
+"""
+Tenant registry: whose reports this process renders.
+
+Each tenant is one person with their own Google Sheet, worksheet, template
+and the name that goes into the file names. The registry is read from the
+JSON file at TENANTS_FILE:
+
+    {
+      "default": "wildan",
+      "tenants": {
+        "wildan": {
+          "name": "Wildan Dzaky Ramadhani",
+          "file_id": "1wJlAUerJDxpaBRxMOLxOmcSzG5LdwUz4K8HJ3uc1v0s",
+          "sheet_name": "New Format",
+          "template": "Weekly Daily Report Wildan Dzaky Ramadhani.docx"
+        }
+      }
+    }
+
+sheet_name and template are optional. Relative template paths are resolved
+against the directory of the file. Without TENANTS_FILE there is a single
+tenant, "default", with the settings the app always had. The file is read
+again when it changes.
+"""
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+
+from sheet_data import SHEET_NAME, parsed_sheets
+from sheet_source import DEFAULT_FILE_ID
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT_ID = "default"
+DEFAULT_NAME = "Wildan Dzaky Ramadhani"
+DEFAULT_TEMPLATE_PATH = "Weekly Daily Report Wildan Dzaky Ramadhani.docx"
+
+# Nilai parameter tenant untuk laporan semua tenant sekaligus
+ALL_TENANTS = "all"
+
+
+class UnknownTenantError(Exception):
+    """Raised for a tenant id that is not in the registry"""
+
+
+@dataclass(frozen=True)
+class Tenant:
+    id: str
+    name: str
+    file_id: str
+    sheet_name: str = SHEET_NAME
+    template_path: str = DEFAULT_TEMPLATE_PATH
+
+
+class TenantRegistry:
+    def __init__(self, tenants, default_id=None):
+        if not tenants:
+            raise ValueError("tenant registry is empty")
+        self.tenants = {tenant.id: tenant for tenant in tenants}
+        self.default_id = default_id or tenants[0].id
+        if self.default_id not in self.tenants:
+            raise ValueError(f"default tenant '{self.default_id}' is not defined")
+
+    def get(self, tenant_id=None):
+        """Tenant by id, the default tenant when tenant_id is empty"""
+        tenant = self.tenants.get(tenant_id or self.default_id)
+        if tenant is None:
+            raise UnknownTenantError(f"Tenant tidak dikenal: {tenant_id}")
+        return tenant
+
+    def is_default(self, tenant):
+        return tenant.id == self.default_id
+
+    def all(self):
+        """Every tenant, default first"""
+        return [self.tenants[self.default_id]] + [
+            tenant for tenant_id, tenant in self.tenants.items() if tenant_id != self.default_id
+        ]
+
+    def __len__(self):
+        return len(self.tenants)
+
+
+def default_registry():
+    return TenantRegistry([Tenant(DEFAULT_TENANT_ID, DEFAULT_NAME, DEFAULT_FILE_ID)])
+
+
+def load_registry(path):
+    """TenantRegistry from a JSON file (format in the module docstring)"""
+    with open(path) as f:
+        config = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    tenants = []
+    for tenant_id, entry in config.get("tenants", {}).items():
+        if tenant_id == ALL_TENANTS:
+            raise ValueError(f"'{ALL_TENANTS}' is reserved and cannot be a tenant id")
+        template_path = entry.get("template", DEFAULT_TEMPLATE_PATH)
+        if not os.path.isabs(template_path):
+            template_path = os.path.relpath(os.path.join(base_dir, template_path))
+        tenants.append(Tenant(
+            id=tenant_id,
+            name=entry["name"],
+            file_id=entry["file_id"],
+            sheet_name=entry.get("sheet_name", SHEET_NAME),
+            template_path=template_path,
+        ))
+    return TenantRegistry(tenants, config.get("default"))
+
+
+_registry = None
+_registry_mtime = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Process-wide registry from TENANTS_FILE, reloaded when the file changes"""
+    global _registry, _registry_mtime
+    path = os.environ.get("TENANTS_FILE")
+    with _registry_lock:
+        if not path:
+            if _registry is None or _registry_mtime is not None:
+                _registry, _registry_mtime = default_registry(), None
+            return _registry
+        mtime = os.stat(path).st_mtime
+        if _registry is None or mtime != _registry_mtime:
+            _registry, _registry_mtime = load_registry(path), mtime
+            # Dua revisi per tenant supaya tenant tidak saling mengusir sheet dari cache
+            parsed_sheets.ensure_size(2 * len(_registry))
+            logger.info(f"Loaded {len(_registry)} tenant(s) from {path}, default '{_registry.default_id}'")
+        return _registry
+
+
+def get_tenant(tenant_id=None):
+    """Tenant by id from the process-wide registry (default tenant when empty)"""
+    return get_registry().get(tenant_id)
@@ -0,0 +1,27 @@
+"""
+benchmarks/load_test.py at a small scale: gunicorn with two workers, a burst
+of POST / requests and background jobs polled with a new connection each
+time, so polls and downloads reach workers other than the one running the
+job. Every request and job must succeed.
+"""
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("gunicorn")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import load_test  # noqa: E402
+
+
+def test_two_workers_serve_requests_and_shared_jobs(tmp_path):
+    args = load_test.parse_args([
+        "--workers", "2", "--threads", "2", "--concurrency", "4", "--requests", "16", "--jobs", "8",
+        "--rows", "300", "--days", "14", "--workdir", str(tmp_path),
+    ])
+    results = load_test.run(args)
+
+    assert load_test.check(results, args) == []
+    assert results[0]["jobs"] == 8 and results[0]["requests"] == 16
@@ -0,0 +1,50 @@
+"""
+Startup budget based on `python -X importtime`.
+
+Each entry module is imported in a fresh interpreter (best of RUNS) and must
+stay under its budget, and must not pull in the heavy dependencies that are
+meant to load lazily on first use. On a slower machine scale every budget
+with IMPORT_BUDGET_SCALE (e.g. 2).
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Milidetik kumulatif per modul entry, diukur dengan -X importtime
+BUDGETS_MS = {
+    "report_pipeline": 150,
+    "autoreport": 200,
+    "app": 350,
+    "wsgi": 400,
+}
+LAZY_MODULES = ("pandas", "numpy", "docx", "openpyxl", "lxml", "requests")
+RUNS = 3
+SCALE = float(os.environ.get("IMPORT_BUDGET_SCALE", 1))
+
+
+def import_profile(module):
+    """(cumulative ms of module, loaded module names) for one fresh import of module"""
+    code = f"import sys, {module}; print(' '.join(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=REPO_DIR, capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=REPO_DIR))
+    assert result.returncode == 0, f"import {module} failed:\n{result.stderr[-2000:]}"
+    elapsed = None
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if name == module:
+            elapsed = int(cumulative) / 1000
+    return elapsed, set(result.stdout.split())
+
+
+@pytest.mark.parametrize("module", BUDGETS_MS)
+def test_import_budget(module):
+    elapsed, loaded = min((import_profile(module) for _ in range(RUNS)), key=lambda run: run[0])
+
+    assert not [name for name in LAZY_MODULES if name in loaded]
+    assert elapsed <= BUDGETS_MS[module] * SCALE, f"{module}: {elapsed:.0f} ms"
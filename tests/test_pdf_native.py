@@ -0,0 +1,52 @@
+"""
+Native PDF rendering of text outside Latin-1: it must not be drawn as "?",
+convert_to_pdf falls back to LibreOffice instead.
+"""
+import io
+
+import docx
+import pytest
+
+import report_pipeline
+from pdf_native import NativePdfUnsupported, docx_to_pdf, encode_text
+
+NON_LATIN = "Rapat → klien “selesai” ✓ 会议 ğ"
+
+
+def make_docx(text):
+    document = docx.Document()
+    document.add_paragraph(text)
+    content = io.BytesIO()
+    document.save(content)
+    return content.getvalue()
+
+
+class FakePool:
+    def __init__(self):
+        self.converted = []
+
+    def convert(self, docx_content, base_filename):
+        self.converted.append(base_filename)
+        return b"%PDF-libreoffice"
+
+
+def test_latin1_text_renders_natively():
+    pdf = docx_to_pdf(make_docx("Rapat klien café, Jürgen & Søren ±5°"))
+    assert pdf.startswith(b"%PDF")
+
+
+def test_non_latin1_text_is_unsupported():
+    with pytest.raises(NativePdfUnsupported):
+        encode_text(NON_LATIN)
+    with pytest.raises(NativePdfUnsupported):
+        docx_to_pdf(make_docx(NON_LATIN))
+
+
+def test_non_latin1_text_falls_back_to_libreoffice(monkeypatch):
+    pool = FakePool()
+    monkeypatch.setattr(report_pipeline, "get_pool", lambda: pool)
+
+    pdf = report_pipeline.convert_to_pdf(make_docx(NON_LATIN), "laporan", backend="native")
+
+    assert pdf.getvalue() == b"%PDF-libreoffice"
+    assert pool.converted == ["laporan"]
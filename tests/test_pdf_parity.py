@@ -0,0 +1,111 @@
+"""
+Visual parity of the native PDF backend against LibreOffice.
+
+Every day of a small workbook (one of them long enough for the table to run
+over several pages) plus the combined document of the range is converted by
+both backends. The PDFs must have the same page count, nearly the same text
+and overlapping ink: intersection-over-union of dark pixels after a small
+dilation, so sub-point font metric differences do not count.
+
+Skipped when LibreOffice (LIBREOFFICE_PATH) is not installed. Run it after
+changing the template.
+"""
+import difflib
+import io
+import shutil
+from datetime import datetime
+
+import numpy as np
+import openpyxl
+import pytest
+
+import pdf_pool
+import report_pipeline
+from pdf_native import docx_to_pdf
+from report_template import combine_reports
+from sheet_data import SHEET_NAME
+
+pymupdf = pytest.importorskip("pymupdf")
+
+pytestmark = pytest.mark.skipif(shutil.which(pdf_pool.LIBREOFFICE_PATH) is None,
+                                reason="LibreOffice not installed")
+
+DATES = ["2026-10-01", "2026-10-02", "2026-10-03"]
+ROWS_PER_DAY = [3, 12, 60]
+DPI = 60
+TOLERANCE = 2
+MIN_TEXT = 0.97
+MIN_IOU = 0.85
+
+
+def write_workbook(path):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = SHEET_NAME
+    sheet.append(["Tanggal", "Pekerjaan", "Batas Waktu", "Status", "Diselesaikan Pada", "Keterangan"])
+    for tanggal, rows in zip(DATES, ROWS_PER_DAY):
+        date = datetime.strptime(tanggal, "%Y-%m-%d")
+        for i in range(rows):
+            done = i % 3 == 0
+            sheet.append([
+                date, f"Pekerjaan {i}: menyiapkan laporan dan data pendukung untuk klien", date.replace(hour=17),
+                "Done" if done else "On Progress", date.replace(hour=15) if done else None,
+                "Menunggu review dari tim" if i % 4 == 1 else None,
+            ])
+    workbook.save(path)
+
+
+@pytest.fixture(scope="module")
+def documents(tmp_path_factory):
+    """(name, docx bytes) of every day and of the combined range"""
+    xlsx = tmp_path_factory.mktemp("parity") / "sheet.xlsx"
+    write_workbook(xlsx)
+    start, end = (datetime.strptime(tanggal, "%Y-%m-%d") for tanggal in (DATES[0], DATES[-1]))
+    template, days, range_name = report_pipeline.prepare_range(start, end, xlsx_path=str(xlsx))
+    result = {day["base_filename"]: report_pipeline.render_day_docx(template, day) for day in days}
+    combined = io.BytesIO()
+    combine_reports([report_pipeline.build_day_document(template, day) for day in days]).save(combined)
+    result["combined"] = combined.getvalue()
+    yield result
+    pdf_pool.shutdown_pool()
+
+
+def page_text(pdf):
+    return "\n".join(" ".join(line.split()) for page in pdf for line in page.get_text().splitlines() if line.strip())
+
+
+def page_ink(page):
+    pixmap = page.get_pixmap(dpi=DPI, colorspace=pymupdf.csGRAY)
+    return np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.width) < 160
+
+
+def dilate(mask, radius):
+    out = mask.copy()
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            out |= np.roll(np.roll(mask, dy, axis=0), dx, axis=1)
+    return out
+
+
+def ink_iou(a, b):
+    height, width = min(a.shape[0], b.shape[0]), min(a.shape[1], b.shape[1])
+    a, b = a[:height, :width], b[:height, :width]
+    if not a.any() and not b.any():
+        return 1.0
+    # Tinta yang jatuh di dekat tinta dokumen lain dianggap sama
+    matched = (a & dilate(b, TOLERANCE)).sum() + (b & dilate(a, TOLERANCE)).sum()
+    return matched / float(a.sum() + b.sum())
+
+
+def test_native_pdf_matches_libreoffice(documents):
+    for name, docx_content in documents.items():
+        reference = pymupdf.open(stream=report_pipeline.convert_to_pdf(
+            docx_content, name, backend='libreoffice').getvalue())
+        native = pymupdf.open(stream=docx_to_pdf(docx_content))
+
+        assert len(native) == len(reference), name
+        text_ratio = difflib.SequenceMatcher(None, page_text(reference), page_text(native)).ratio()
+        assert text_ratio >= MIN_TEXT, f"{name}: text {text_ratio:.3f}"
+        for number, (a, b) in enumerate(zip(reference, native), 1):
+            iou = ink_iou(page_ink(a), page_ink(b))
+            assert iou >= MIN_IOU, f"{name} page {number}: ink {iou:.3f}"
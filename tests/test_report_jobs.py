@@ -0,0 +1,91 @@
+"""
+Report jobs shared by processes: a job run by one process is visible, with
+its file, to another one using the same REPORT_JOB_DIR, a job whose
+process died is failed instead of staying queued, and expired jobs are
+removed by polls as well as by submits.
+"""
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from report_jobs import Job, JobManager, JobQueueFull, JobStore
+
+
+def render(params, progress):
+    progress("render")
+    if params.get("fail"):
+        raise ValueError("gagal")
+    return "laporan.docx", "application/octet-stream", b"isi laporan " + params["filter_date"].encode()
+
+
+def run_in_child(directory, params, queue):
+    manager = JobManager(render, JobStore(directory))
+    job = manager.submit(params)
+    queue.put(job.id)
+    manager._executor.shutdown(wait=True)
+
+
+def wait_finished(manager, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job.finished:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_job_of_another_process_is_visible(tmp_path):
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    child = context.Process(target=run_in_child, args=(str(tmp_path), {"filter_date": "2026-10-03"}, queue))
+    child.start()
+    job_id = queue.get(timeout=10)
+    child.join(timeout=10)
+
+    manager = JobManager(render, JobStore(str(tmp_path)))
+    job = wait_finished(manager, job_id)
+    assert job.status == "done" and job.stage == "done"
+    assert job.to_dict()["size"] == job.size
+    with open(manager.result_path(job), "rb") as f:
+        assert f.read() == b"isi laporan 2026-10-03"
+
+
+def test_failed_job_keeps_error(tmp_path):
+    manager = JobManager(render, JobStore(str(tmp_path)))
+    job = wait_finished(manager, manager.submit({"filter_date": "2026-10-03", "fail": True}).id)
+    assert job.status == "failed" and job.error == "gagal"
+
+
+def test_job_of_dead_process_is_failed(tmp_path):
+    context = multiprocessing.get_context("fork")
+    child = context.Process(target=os._exit, args=(0,))
+    child.start()
+    child.join()
+
+    store = JobStore(str(tmp_path))
+    # Job yang tertinggal dari worker yang sudah berhenti tetap dihitung sampai dibersihkan
+    orphan = Job({"filter_date": "2026-10-03"}, owner=child.pid)
+    store.insert(orphan, max_pending=1)
+    with pytest.raises(JobQueueFull):
+        store.insert(Job({}), max_pending=1)
+
+    manager = JobManager(render, store, max_pending=1)
+    wait_finished(manager, manager.submit({"filter_date": "2026-10-04"}).id)
+    failed = store.get(orphan.id)
+    assert failed.status == "failed" and "Worker" in failed.error
+
+
+def test_poll_removes_expired_jobs(tmp_path):
+    manager = JobManager(render, JobStore(str(tmp_path)), ttl=0, prune_interval=0)
+    job = manager.submit({"filter_date": "2026-10-03"})
+    manager._executor.shutdown(wait=True)
+    path = manager.result_path(job)
+    assert os.path.exists(path)
+
+    # Tanpa submit baru: poll job lain atau stats tetap membuang hasil yang kedaluwarsa
+    assert manager.get("lain") is None
+    assert manager.store.get(job.id) is None and not os.path.exists(path)
+    assert manager.stats()["jobs"] == {}
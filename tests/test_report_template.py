@@ -0,0 +1,47 @@
+"""
+Table borders of the normalised template: the header row of a borderless
+template stays borderless, a header that had borders (Table Grid style or
+tblBorders of its own, as in the built-in fallback) keeps them.
+"""
+import docx
+import pytest
+from docx.oxml.ns import qn
+
+from report_template import BORDER_ATTRS, TABLE_HEADERS, ReportTemplate, _border_element
+
+
+def write_template(path, style=None, borders=False):
+    document = docx.Document()
+    document.add_paragraph("Waktu Laporan\t: ")
+    table = document.add_table(rows=2, cols=len(TABLE_HEADERS))
+    if style:
+        table.style = style
+    if borders:
+        table._tbl.tblPr.append(_border_element('w:tblBorders', ['top', 'bottom', 'insideH'], BORDER_ATTRS))
+    for cell, header in zip(table.rows[0].cells, TABLE_HEADERS):
+        cell.text = header
+    document.save(path)
+
+
+def header_borders(template):
+    tbl = template.element.body.find(qn('w:tbl'))
+    return [tc.tcPr.find(qn('w:tcBorders')) if tc.tcPr is not None else None for tc in tbl.tr_lst[0].tc_lst]
+
+
+@pytest.mark.parametrize("style, borders, nil_header", [
+    (None, False, True),
+    ("Table Grid", False, False),
+    (None, True, False),
+])
+def test_header_borders_follow_template(tmp_path, style, borders, nil_header):
+    path = tmp_path / "template.docx"
+    write_template(path, style, borders)
+    template = ReportTemplate(str(path))
+
+    assert all((cell is not None) == nil_header for cell in header_borders(template))
+    assert len(template.element.body.find(qn('w:tbl')).tr_lst) == 1
+
+
+def test_builtin_template_keeps_grid_header(tmp_path):
+    template = ReportTemplate(str(tmp_path / "missing.docx"))
+    assert header_borders(template) == [None] * len(TABLE_HEADERS)
@@ -0,0 +1,69 @@
+"""
+ParsedSheetCache with streamed dates: one entry per revision that is filled
+in lazily, streaming each date of the workbook at most once.
+"""
+from datetime import datetime
+
+import openpyxl
+import pytest
+
+import sheet_data
+from sheet_data import SHEET_NAME, ParsedSheet, ParsedSheetCache, stream_sheet
+from sheet_source import snapshot_from_file
+
+DATES = ["2026-10-01", "2026-10-02", "2026-10-03"]
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = SHEET_NAME
+    sheet.append(["Tanggal", "Pekerjaan", "Batas Waktu", "Status", "Diselesaikan Pada", "Keterangan"])
+    # Tanggal sengaja diselang-seling agar urutan baris per tanggal ikut diuji
+    for i in range(9):
+        date = datetime.strptime(DATES[i % 3], "%Y-%m-%d")
+        sheet.append([date, f"Pekerjaan nomor {i}", date.replace(hour=17), "Done", None, None])
+    workbook.save(tmp_path / "sheet.xlsx")
+    return snapshot_from_file(tmp_path / "sheet.xlsx")
+
+
+@pytest.fixture
+def streamed(monkeypatch):
+    """Dates argument of every parse_sheet call"""
+    calls = []
+    parse_sheet = sheet_data.parse_sheet
+
+    def recording(snapshot, sheet_name=SHEET_NAME, dates=None):
+        calls.append(dates)
+        return parse_sheet(snapshot, sheet_name, dates)
+
+    monkeypatch.setattr(sheet_data, "parse_sheet", recording)
+    return calls
+
+
+def assert_rows(sheet, snapshot, tanggal):
+    expected = ParsedSheet(snapshot.revision, stream_sheet(snapshot.content, dates=[tanggal])).rows_for(tanggal)
+    assert sheet.rows_for(tanggal).reset_index(drop=True).equals(expected.reset_index(drop=True))
+
+
+def test_streamed_dates_are_read_once_per_revision(snapshot, streamed, monkeypatch):
+    monkeypatch.setattr(sheet_data, "SHEET_READER", "stream")
+    cache = ParsedSheetCache(size=1)
+
+    cache.get(snapshot, dates=[DATES[0]])
+    sheet = cache.get(snapshot, dates=[DATES[1], DATES[0], "2026-09-30"])
+    assert streamed == [[DATES[0]], ["2026-09-30", DATES[1]]]
+    for tanggal in DATES[:2]:
+        assert_rows(sheet, snapshot, tanggal)
+
+    # Tanggal yang sudah dibaca (juga yang kosong) tidak dibaca ulang
+    assert cache.get(snapshot, dates=["2026-09-30", DATES[1]]) is sheet
+    assert cache.stats()["hits"] == 1
+
+    full = cache.get(snapshot)
+    assert streamed[-1] is None
+    assert cache.get(snapshot, dates=[DATES[2]]) is full
+    for tanggal in DATES:
+        assert_rows(full, snapshot, tanggal)
+    assert cache.stats() == {"hits": 2, "parses": 3, "revisions": [snapshot.revision[:12]]}
@@ -0,0 +1,239 @@
+"""
+Sheet sources against mock_sheet_server.py: the filtered CSV export
+(SHEET_SOURCE=query) and its fallbacks to the xlsx export, and the TTL,
+coalesced downloads, conditional revalidation and stale copies of SheetSource.
+"""
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import openpyxl
+import pytest
+import requests
+
+import report_pipeline
+from sheet_data import SHEET_NAME, parse_day_csv
+from sheet_source import DEFAULT_FILE_ID, SheetFetchError, SheetQuery, SheetSource
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATES = ["2026-10-01", "2026-10-02", "2026-10-03"]
+DEFAULT_CONFIG = {"fail_status": None, "query_fail_status": None, "delay": 0, "csv_date_format": "%d/%m/%Y"}
+
+
+def write_workbook(path):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = SHEET_NAME
+    sheet.append(["Tanggal", "Pekerjaan", "Batas Waktu", "Status", "Diselesaikan Pada", "Keterangan"])
+    for day, tanggal in enumerate(DATES):
+        date = datetime.strptime(tanggal, "%Y-%m-%d")
+        for i in range(day + 2):
+            done = i % 2 == 0
+            sheet.append([
+                date, f"Pekerjaan {tanggal} nomor {i}", date.replace(hour=17), "Done" if done else "On Progress",
+                date.replace(hour=15, minute=30) if done else None, "Rapat klien" if i == 1 else None,
+            ])
+    workbook.save(path)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    """Base URL of a mock_sheet_server.py serving a small three-day workbook"""
+    xlsx = tmp_path_factory.mktemp("sheet") / "sheet.xlsx"
+    write_workbook(xlsx)
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "mock_sheet_server.py", "--xlsx", str(xlsx), "--port", str(port)],
+        cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                requests.get(f"{base_url}/_admin/stats", timeout=1)
+                break
+            except requests.ConnectionError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("mock_sheet_server.py did not start")
+                time.sleep(0.1)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def configure(server, **config):
+    requests.post(f"{server}/_admin/config", json=config, timeout=5).raise_for_status()
+
+
+def server_stats(server):
+    return requests.get(f"{server}/_admin/stats", timeout=5).json()
+
+
+@pytest.fixture
+def query_source(server, monkeypatch):
+    """SHEET_SOURCE=query against the mock server, with a fresh SheetQuery"""
+    monkeypatch.setenv("SHEET_EXPORT_BASE_URL", server)
+    monkeypatch.setattr(report_pipeline, "SHEET_SOURCE", "query")
+    queries = SheetQuery(backoff=60)
+    monkeypatch.setattr(report_pipeline, "sheet_queries", queries)
+    yield queries
+    configure(server, **DEFAULT_CONFIG)
+
+
+def day_rows(sheet, tanggal):
+    return sheet.rows_for(tanggal).fillna('').reset_index(drop=True)
+
+
+@pytest.mark.parametrize("tanggal", DATES)
+def test_query_matches_xlsx(query_source, tanggal):
+    template = report_pipeline.load_report_template()
+    tenant = report_pipeline.resolve_tenant()
+    sekarang = datetime.strptime(tanggal, "%Y-%m-%d")
+
+    sheet = report_pipeline.load_report_sheet(tenant=tenant, dates=[tanggal])
+    assert query_source.stats()["queries"] == 1
+    assert query_source.stats()["fallbacks"] == 0
+    xlsx = report_pipeline.load_report_sheet(tenant=tenant, dates=None)
+
+    assert len(sheet) == len(sheet.rows_for(tanggal)) < len(xlsx)
+    assert day_rows(sheet, tanggal).equals(day_rows(xlsx, tanggal))
+    query_day = report_pipeline.prepare_day(sheet, sekarang, template, tenant)
+    xlsx_day = report_pipeline.prepare_day(xlsx, sekarang, template, tenant)
+    assert query_day["report_key"] == xlsx_day["report_key"]
+
+
+def assert_xlsx_fallback(sheet, query_source, tanggal):
+    assert len(sheet) > len(sheet.rows_for(tanggal)) > 0
+    assert query_source.stats()["fallbacks"] == 1
+    assert query_source.stats()["backing_off"]
+
+
+def test_query_404_falls_back_to_xlsx(server, query_source):
+    configure(server, query_fail_status=404)
+
+    sheet = report_pipeline.load_report_sheet(dates=[DATES[0]])
+    assert_xlsx_fallback(sheet, query_source, DATES[0])
+
+    # Selama backoff endpoint query tidak dicoba lagi
+    queries = server_stats(server)["queries"]
+    report_pipeline.load_report_sheet(dates=[DATES[1]])
+    assert server_stats(server)["queries"] == queries
+    assert query_source.stats()["skipped"] == 1
+
+
+def test_unsupported_query_falls_back_to_xlsx(query_source, monkeypatch):
+    # Server menjawab 400 untuk query yang tidak dikenalnya
+    monkeypatch.setattr(query_source, "day_query", lambda tanggal: f"select A, B where A = '{tanggal}'")
+
+    sheet = report_pipeline.load_report_sheet(dates=[DATES[0]])
+    assert_xlsx_fallback(sheet, query_source, DATES[0])
+
+
+@pytest.mark.parametrize("date_column, csv_date_format", [
+    # Tanggal ada di kolom A; hasil query yang menyaring kolom B tidak bisa dipakai
+    ("B", DEFAULT_CONFIG["csv_date_format"]),
+    # Tanggal di CSV tidak terbaca dengan SHEET_QUERY_DATE_FORMAT
+    ("A", "%Y/%m/%d"),
+])
+def test_unparseable_csv_falls_back_to_xlsx(server, query_source, date_column, csv_date_format):
+    query_source.date_column = date_column
+    configure(server, csv_date_format=csv_date_format)
+    with pytest.raises(ValueError):
+        parse_day_csv(query_source.fetch(DEFAULT_FILE_ID, SHEET_NAME, DATES[2]), DATES[2], date_column)
+
+    sheet = report_pipeline.load_report_sheet(dates=[DATES[2]])
+    assert_xlsx_fallback(sheet, query_source, DATES[2])
+
+
+def test_ttl_hit_makes_no_request(server):
+    source = SheetSource(f"{server}/spreadsheets/d/ttl/export?format=xlsx", ttl=60)
+    before = server_stats(server)
+
+    first = source.get()
+    second = source.get()
+
+    assert second is first
+    assert source.stats()["downloads"] == 1
+    assert source.stats()["hits"] == 1
+    assert server_stats(server)["requests"] - before["requests"] == 1
+
+
+def test_concurrent_gets_share_one_download(server):
+    source = SheetSource(f"{server}/spreadsheets/d/concurrent/export?format=xlsx", ttl=60)
+    callers = 8
+    barrier = threading.Barrier(callers)
+    snapshots = []
+
+    def get():
+        barrier.wait()
+        snapshots.append(source.get())
+
+    before = server_stats(server)
+    # Download yang lambat memastikan semua pemanggil datang selagi download berjalan
+    configure(server, delay=0.5)
+    try:
+        threads = [threading.Thread(target=get) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+    finally:
+        configure(server, **DEFAULT_CONFIG)
+
+    assert len(snapshots) == callers
+    assert len({snapshot.revision for snapshot in snapshots}) == 1
+    assert source.stats()["downloads"] == 1
+    assert source.stats()["coalesced"] == callers - 1
+    assert server_stats(server)["requests"] - before["requests"] == 1
+
+
+def test_revalidation_uses_etag(server):
+    source = SheetSource(f"{server}/spreadsheets/d/etag/export?format=xlsx", ttl=0)
+    before = server_stats(server)
+
+    first = source.get()
+    second = source.get()
+
+    assert first.etag and second.revision == first.revision
+    assert source.stats()["downloads"] == 1
+    assert source.stats()["not_modified"] == 1
+    after = server_stats(server)
+    assert after["full"] - before["full"] == 1
+    assert after["not_modified"] - before["not_modified"] == 1
+
+
+def test_stale_copy_served_when_export_fails(server):
+    source = SheetSource(f"{server}/spreadsheets/d/stale/export?format=xlsx", ttl=0, error_backoff=60)
+    strict = SheetSource(f"{server}/spreadsheets/d/strict/export?format=xlsx", ttl=0, serve_stale=False)
+    good = source.get()
+    strict.get()
+    try:
+        configure(server, fail_status=503)
+
+        stale = source.get()
+        assert stale.stale and stale.revision == good.revision
+        # Selama backoff salinan lama langsung dipakai tanpa request baru
+        failed = server_stats(server)["failed"]
+        assert source.get().stale
+        assert server_stats(server)["failed"] == failed
+        assert source.stats()["stale_served"] == 2
+
+        with pytest.raises(SheetFetchError):
+            strict.get()
+    finally:
+        configure(server, **DEFAULT_CONFIG)
+
+    fresh = source.get(force=True)
+    assert not fresh.stale and fresh.revision == good.revision
@@ -0,0 +1,75 @@
+"""
+WSGI entry point for production serving with gunicorn:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gunicorn.conf.py loads this module once in the master (preload_app) and calls
+preload() before forking, so the template and the parsed sheet are built once
+and shared copy-on-write by every worker. Things that own threads, child
+processes or sockets (PDF pool, precompute thread, HTTP sessions) cannot
+survive a fork; start_worker() starts them in each worker and stop_worker()
+shuts them down when the worker is recycled. Precompute runs in one worker at
+a time, whichever holds its file lock.
+"""
+import logging
+import os
+import tempfile
+import time
+
+import app as app_module
+from pdf_pool import get_pool, shutdown_pool
+from precompute import start_precomputer
+from report_pipeline import PDF_BACKEND, ReportError, load_report_sheet, load_report_template
+from sheet_data import SHEET_READER
+from sheet_source import fetch_sheets, reset_sessions
+from tenants import get_registry
+
+logger = logging.getLogger(__name__)
+
+app_module.configure_logging()
+# Thread precompute dijalankan per worker oleh start_worker(), bukan di master
+app = app_module.create_app(start_background=False)
+
+
+def preload():
+    """Build the shared state in the master process, before workers are forked"""
+    started = time.perf_counter()
+    app_module.ensure_index_template()
+    tenants = get_registry().all()
+    for tenant in tenants:
+        try:
+            load_report_template(tenant.template_path)
+        except ReportError as e:
+            logger.warning(f"Template of tenant '{tenant.id}' not preloaded: {str(e)}")
+    # Sheet gagal diunduh bukan alasan untuk tidak start; worker akan mencoba lagi
+    if os.environ.get('PRELOAD_SHEET', '1') != '0':
+        # Semua sheet diunduh bersamaan, lalu di-parse dari cache
+        fetch_sheets([tenant.file_id for tenant in tenants])
+        # Pembaca streaming hanya membaca tanggal yang diminta, jadi tidak ada yang di-parse di depan
+        if SHEET_READER != 'stream':
+            for tenant in tenants:
+                try:
+                    load_report_sheet(tenant=tenant)
+                except ReportError as e:
+                    logger.warning(f"Sheet of tenant '{tenant.id}' not preloaded: {str(e)}")
+    logger.info(f"Preload of {len(tenants)} tenant(s) finished in {time.perf_counter() - started:.2f}s")
+
+
+def start_worker():
+    """Per-worker services, called right after fork"""
+    reset_sessions()
+    if PDF_BACKEND == 'libreoffice' and os.environ.get('PDF_POOL_PRESTART', '1') != '0':
+        # Pool dibuat sekarang supaya request PDF pertama tidak menunggu soffice start
+        get_pool()
+    # Hanya worker yang memegang lock ini yang melakukan precompute (lock per master)
+    lock_path = os.environ.get("PRECOMPUTE_LOCK") or os.path.join(
+        tempfile.gettempdir(), f"autoreport-precompute-{os.getppid()}.lock"
+    )
+    app_module.precomputer = start_precomputer(lock_path)
+
+
+def stop_worker():
+    """Release per-worker services when the worker exits (recycled or shut down)"""
+    if app_module.precomputer is not None:
+        app_module.precomputer.stop()
+    shutdown_pool()
@@ -0,0 +1,44 @@
+"""
+Write a ZIP archive as a stream of chunks.
+
+zipfile can write to a non-seekable file object (it then uses data
+descriptors), so the archive is written into a small sink that is drained
+after every member. Only the member being added and the central directory are
+ever held in memory, however many members the archive has.
+"""
+import io
+import zipfile
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable buffer that hands out what was written so far"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries, compression=zipfile.ZIP_DEFLATED):
+    """Yield the bytes of a ZIP archive of (name, content) entries as they arrive"""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression) as archive:
+        for name, content in entries:
+            archive.writestr(name, content)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    chunk = sink.drain()
+    if chunk:
+        yield chunk